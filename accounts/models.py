@@ -1,6 +1,8 @@
 import hashlib
 from django.utils import timezone
 from django.db import models
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import OpClass
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager
 
 
@@ -56,6 +58,12 @@ class User(AbstractBaseUser):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta:
+        indexes = [
+            # Поиск публикаций по началу email автора: UPPER(email) LIKE 'AIGERIM%' (istartswith)
+            models.Index(OpClass(Upper('email'), name='text_pattern_ops'), name='user_email_prefix_idx'),
+        ]
+
     def has_perm(self, perm, obj=None):
         return self.is_superuser
 
@@ -1,8 +1,26 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from .models import Comment
+from publications.models import Publication
+from publications.services.feed_cache import bump_feed_version
 from notifications.utils import notify_user
 
+
+@receiver(post_save, sender=Comment)
+def increment_comments_count(sender, instance, created, **kwargs):
+    if created:
+        Publication.adjust_counters(instance.publication_id, comments_count=1)
+        bump_feed_version(instance.publication.category)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comments_count(sender, instance, origin=None, **kwargs):
+    if Publication.deleted_with_publication(origin):
+        return
+    Publication.adjust_counters(instance.publication_id, comments_count=-1)
+    bump_feed_version(instance.publication.category)
+
+
 @receiver(post_save, sender=Comment)
 def notify_new_comment(sender, instance, created, **kwargs):
     if created:
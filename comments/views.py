@@ -1,12 +1,14 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from demeu.db_router import read_from_replica
 from .models import Comment
 from .serializers import CommentSerializer
 
 
 @api_view(['GET', 'POST', 'PUT', 'DELETE'])
 @permission_classes([permissions.IsAuthenticatedOrReadOnly])
+@read_from_replica
 def comment_list_create(request, publication_id):
     if request.method == 'GET':
         comments = Comment.objects.filter(publication_id=publication_id).order_by('-created_at')
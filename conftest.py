@@ -0,0 +1,25 @@
+import pytest
+from django.conf import settings
+from django.core.cache import cache
+
+from publications.services import view_events
+
+# Локальная схема с двумя БД: 'replica' — тестовое зеркало default (отдельное соединение к той же БД).
+# Маршрутизацию на неё включают только тесты реплик (settings.DB_REPLICAS), остальным она не мешает.
+settings.DATABASES.setdefault('replica', {**settings.DATABASES['default'], 'TEST': {'MIRROR': 'default'}})
+
+
+@pytest.fixture(autouse=True)
+def local_backends(settings, monkeypatch):
+    # Тесты не зависят от Redis: кэш в памяти процесса, чистый для каждого теста
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    # События просмотров — в локальный буфер процесса, без Redis
+    settings.VIEW_EVENTS_REDIS_URL = ''
+    # Буфер сбрасывают сами тесты (flush_view_events), фоновый поток сброса не запускается
+    monkeypatch.setattr(view_events, 'ensure_local_flusher', lambda: None)
+    settings.DB_REPLICAS = []
+    cache.clear()
+    view_events._local_events.clear()
+    yield
+    cache.clear()
+    view_events._local_events.clear()
@@ -1,5 +1,6 @@
 import os
 from celery import Celery
+from celery.signals import worker_init
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'demeu.settings')
 
@@ -7,4 +8,20 @@ app = Celery('demeu')
 
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
-app.autodiscover_tasks()
\ No newline at end of file
+app.autodiscover_tasks()
+
+
+@worker_init.connect
+def preload_ocr_models(sender, **kwargs):
+    """
+    Воркер, слушающий очередь OCR, загружает модели NER в главном процессе до создания пула:
+    дочерние процессы получают их через fork (copy-on-write), а не грузят каждый заново.
+    """
+    from django.conf import settings
+
+    queues = sender.app.amqp.queues
+    if settings.OCR_QUEUE in (queues.consume_from or queues):
+        from verification.services.ner import load_models
+
+        load_models()
+        print(f"[🧠] Модели NER загружены до запуска пула ({settings.OCR_QUEUE})")
\ No newline at end of file
@@ -0,0 +1,96 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.request import Request
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Алиас реплики для чтений текущего запроса; None — всё идёт в основную БД
+_read_db = ContextVar('read_db', default=None)
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтения уходят на реплику только внутри use_replica() (безопасные GET-эндпоинты с @read_from_replica),
+    остальные — в default. Записи всегда в default, в том числе для объектов, прочитанных с реплики.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_db.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # реплики содержат те же данные
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'  # реплики получают схему через репликацию
+
+
+def pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_primary(user_id):
+    """После записи пользователь DB_PRIMARY_PIN_SECONDS читает из default: реплика может отставать."""
+    if user_id and settings.DB_REPLICAS:
+        cache.set(pin_key(user_id), 1, settings.DB_PRIMARY_PIN_SECONDS)
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.id)) is not None
+
+
+@contextmanager
+def use_replica():
+    token = _read_db.set(random.choice(settings.DB_REPLICAS) if settings.DB_REPLICAS else None)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Внутри @read_from_replica: чтения, результат которых переживает запрос (общий кэш), — из default."""
+    token = _read_db.set(None)
+    try:
+        yield
+    finally:
+        _read_db.reset(token)
+
+
+def read_from_replica(handler):
+    """
+    Декоратор обработчика DRF (под @api_view или метод get класса): безопасные запросы читают с реплики,
+    если пользователь не закреплён за основной БД после недавней записи.
+    """
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        if request.method not in SAFE_METHODS or not settings.DB_REPLICAS or is_pinned(request.user):
+            return handler(*args, **kwargs)
+        with use_replica():
+            return handler(*args, **kwargs)
+    return wrapper
+
+
+class PrimaryPinMiddleware:
+    """Успешный изменяющий запрос закрепляет пользователя за основной БД (read-after-write)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            # DRF проставляет аутентифицированного (JWT) пользователя и в исходный HttpRequest
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_primary(user.id)
+        return response
@@ -11,7 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 import os
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 from datetime import timedelta
 from celery.schedules import crontab
 
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     'rest_framework_simplejwt',
     'rest_framework',
@@ -86,6 +87,7 @@ MIDDLEWARE = [
 
     'allauth.account.middleware.AccountMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'demeu.db_router.PrimaryPinMiddleware',
 ]
 
 
@@ -107,6 +109,10 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Keyset-пагинация ленты публикаций (?page_size= ограничен сверху)
+PUBLICATIONS_PAGE_SIZE = config('PUBLICATIONS_PAGE_SIZE', default=20, cast=int)
+PUBLICATIONS_MAX_PAGE_SIZE = config('PUBLICATIONS_MAX_PAGE_SIZE', default=100, cast=int)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -190,23 +196,142 @@ DATABASES = {
     }
 }
 
+# Соединения с БД: 'persistent' — постоянное соединение на поток (CONN_MAX_AGE) с проверкой перед запросом,
+# 'pool' — пул psycopg 3 на процесс, 'pgbouncer' — постоянные соединения к PgBouncer (transaction mode)
+DB_CONN_MODE = config('DB_CONN_MODE', default='persistent')
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=600, cast=int)
+# Размер пула задаётся отдельно для веба и воркеров Celery (PROCESS_TYPE=worker в окружении воркера)
+PROCESS_TYPE = config('PROCESS_TYPE', default='web')
+DB_POOL_MIN_SIZE = config(f'DB_POOL_MIN_SIZE_{PROCESS_TYPE.upper()}', default=2 if PROCESS_TYPE == 'web' else 1,
+                          cast=int)
+DB_POOL_MAX_SIZE = config(f'DB_POOL_MAX_SIZE_{PROCESS_TYPE.upper()}', default=10 if PROCESS_TYPE == 'web' else 2,
+                          cast=int)
+DB_POOL_TIMEOUT = config('DB_POOL_TIMEOUT', default=10, cast=int)  # ожидание свободного соединения, с
+
+# Проверка соединения перед использованием: для пула — при выдаче соединения из пула
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+if DB_CONN_MODE == 'pool':
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+            'timeout': DB_POOL_TIMEOUT,
+            'max_idle': 300,
+        },
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = DB_CONN_MAX_AGE
+    # В transaction mode PgBouncer именованные курсоры не переживают границу транзакции
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = DB_CONN_MODE == 'pgbouncer'
+
+# Реплики только для чтения: DB_REPLICA_HOSTS=replica1:5432,replica2 (те же имя БД и учётные данные)
+for index, replica_host in enumerate(config('DB_REPLICA_HOSTS', default='', cast=Csv())):
+    replica_hostname, _, replica_port = replica_host.partition(':')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': replica_hostname,
+        'PORT': replica_port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['demeu.db_router.PrimaryReplicaRouter']
+# Реплики, на которые @read_from_replica отправляет чтения; пусто — всё читается из default
+DB_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Сколько секунд после записи пользователь читает из default (отставание реплики)
+DB_PRIMARY_PIN_SECONDS = config('DB_PRIMARY_PIN_SECONDS', default=5, cast=int)
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Отдача медиа через прокси: '' — FileResponse (sendfile через wsgi.file_wrapper),
+# 'x-accel-redirect' — nginx (internal location MEDIA_OFFLOAD_PREFIX -> MEDIA_ROOT), 'x-sendfile' — Apache/lighttpd
+MEDIA_OFFLOAD = config('MEDIA_OFFLOAD', default='')
+MEDIA_OFFLOAD_PREFIX = config('MEDIA_OFFLOAD_PREFIX', default='/protected-media/')
+
+# OCR документов: poppler для PDF (пусто — из PATH), DPI растеризации, сколько страниц читать максимум
+# и сколько страниц распознавать одновременно
+POPPLER_PATH = config('POPPLER_PATH', default='')
+OCR_PDF_DPI = config('OCR_PDF_DPI', default=300, cast=int)
+OCR_PDF_MAX_PAGES = config('OCR_PDF_MAX_PAGES', default=10, cast=int)
+OCR_WORKERS = config('OCR_WORKERS', default=2, cast=int)
+
+# Почти-дубликаты документов: минимальное сходство Жаккара текстов (MinHash) и максимальное расстояние
+# Хэмминга pHash изображений (не больше 7 — см. verification/services/near_duplicates.py)
+NEAR_DUPLICATE_JACCARD = config('NEAR_DUPLICATE_JACCARD', default=0.8, cast=float)
+NEAR_DUPLICATE_HAMMING = config('NEAR_DUPLICATE_HAMMING', default=6, cast=int)
+
+# Большие файлы загружаются частями (publications/uploads/); в multipart-запросах файлы больше
+# FILE_UPLOAD_MAX_MEMORY_SIZE Django пишет во временный файл, а не держит в памяти воркера
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10485760  # 10 MB (без учёта файлов)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5 MB
+# Те же обработчики, что по умолчанию, но sha256 файла считается прямо при приёме (кэш OCR по содержимому)
+FILE_UPLOAD_HANDLERS = [
+    'publications.upload_handlers.HashingMemoryFileUploadHandler',
+    'publications.upload_handlers.HashingTemporaryFileUploadHandler',
+]
+
+# Загрузки частями: каталог для недокачанных файлов, лимит размера и срок жизни незавершённых загрузок
+UPLOAD_TEMP_DIR = config('UPLOAD_TEMP_DIR', default=os.path.join(BASE_DIR, 'upload_parts'))
+UPLOAD_MAX_SIZE = config('UPLOAD_MAX_SIZE', default=52428800, cast=int)  # 50 MB, как validate_file_size
+UPLOAD_EXPIRE_HOURS = config('UPLOAD_EXPIRE_HOURS', default=24, cast=int)
+# Через сколько минут публикация в processing считается застрявшей и её обработка ставится заново
+PUBLICATION_PROCESSING_TIMEOUT_MINUTES = config('PUBLICATION_PROCESSING_TIMEOUT_MINUTES', default=30, cast=int)
 
-# Увеличиваем лимит памяти Django для файлов
-DATA_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50 MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 52428800  # 50 MB
+# Кэш ответов (анонимная лента публикаций); в тестах подменяется на locmem в conftest.py
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_REDIS_URL', default='redis://localhost:6379/1'),
+    }
+}
+PUBLICATIONS_FEED_CACHE_TIMEOUT = config('PUBLICATIONS_FEED_CACHE_TIMEOUT', default=300, cast=int)
 
 # Celery и Redis
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_RESULT_BACKEND = 'redis://localhost:6379/0'
 CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
+# Проверка документов (OCR, NER) идёт в отдельную очередь: её воркеры загружают модели до fork,
+# остальные воркеры и веб их не импортируют
+OCR_QUEUE = config('OCR_QUEUE', default='ocr')
+CELERY_TASK_ROUTES = {
+    'verification.tasks.process_document_verification': {'queue': OCR_QUEUE},
+}
+
+# Как часто пересчитывается материализованный рейтинг top_publications
+PUBLICATION_RANKING_REFRESH_MINUTES = config('PUBLICATION_RANKING_REFRESH_MINUTES', default=15, cast=int)
+# Сколько рекомендаций хранится и отдаётся на пользователя (ночной пересчёт)
+RECOMMENDATIONS_TOP_K = config('RECOMMENDATIONS_TOP_K', default=20, cast=int)
+# Очередь событий просмотра (write-behind); пустое значение — только локальный буфер процесса
+VIEW_EVENTS_REDIS_URL = config('VIEW_EVENTS_REDIS_URL', default='redis://localhost:6379/2')
+VIEW_EVENTS_FLUSH_SECONDS = config('VIEW_EVENTS_FLUSH_SECONDS', default=10, cast=int)
 
 CELERY_BEAT_SCHEDULE = {
     'check-publication-status-daily': {
         'task': 'publications.tasks.check_publication_status',
         'schedule': crontab(hour=0, minute=0),  # каждый день в полночь
     },
+    'refresh-publication-ranking': {
+        'task': 'publications.tasks.refresh_publication_ranking',
+        'schedule': timedelta(minutes=PUBLICATION_RANKING_REFRESH_MINUTES),
+    },
+    'build-publication-recommendations-nightly': {
+        'task': 'publications.tasks.build_publication_recommendations',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'notify-expiring-publications-hourly': {
+        'task': 'publications.tasks.notify_expiring_publications',
+        'schedule': crontab(minute=0),  # каждый час; повторов нет благодаря expiry_notice_stage
+    },
+    'flush-view-events': {
+        'task': 'publications.tasks.flush_view_events',
+        'schedule': timedelta(seconds=VIEW_EVENTS_FLUSH_SECONDS),
+    },
+    'purge-stale-uploads-hourly': {
+        'task': 'publications.tasks.purge_stale_uploads',
+        'schedule': crontab(minute=30),
+    },
+    'recover-stuck-publications': {
+        'task': 'publications.tasks.recover_stuck_publications',
+        'schedule': timedelta(minutes=15),
+    },
 }
 
 # Password validation
@@ -14,10 +14,10 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
-from django.conf.urls.static import static
 from donations.stripe_webhooks import stripe_webhook
+from publications.media import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -34,6 +34,8 @@ urlpatterns = [
     path('api/stripe/webhook/', stripe_webhook),
 ]
 
-# Добавляем маршруты для обработки медиафайлов (например, аватары)
-if settings.DEBUG:  # Только для отладки. В продакшене используем Nginx или другой сервер для медиа.
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
+# Медиафайлы: Range-запросы, кэш-заголовки и проверка доступа к документам.
+# Сами байты в продакшене отдаёт прокси через X-Accel-Redirect / X-Sendfile (MEDIA_OFFLOAD).
+urlpatterns += [
+    re_path(rf'^{settings.MEDIA_URL.lstrip("/")}(?P<path>.+)$', serve_media, name='media'),
+]
\ No newline at end of file
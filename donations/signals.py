@@ -1,9 +1,48 @@
-from django.db.models.signals import post_save
+from decimal import Decimal
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from donations.models import Donation
 from publications.models import Publication
+from publications.services.counters import actual_counters
+from publications.services.feed_cache import bump_feed_version
 from notifications.utils import notify_user, notify_top_donor
-from django.db.models import Sum
+from django.db.models import F, Sum
+
+
+def has_other_donations(donation):
+    return Donation.objects.filter(
+        publication_id=donation.publication_id, donor_id=donation.donor_id
+    ).exclude(pk=donation.pk).exists()
+
+
+# Счётчики должны обновиться раньше остальных обработчиков post_save
+@receiver(post_save, sender=Donation)
+def increment_donation_counters(sender, instance, created, **kwargs):
+    if not created:
+        return
+
+    # Stripe-вебхук передаёт сумму как float
+    deltas = {'donated_total': Decimal(str(instance.donor_amount))}
+    if instance.donor_id and not has_other_donations(instance):
+        deltas['donors_count'] = 1
+    Publication.adjust_counters(instance.publication_id, **deltas)
+    # Следующие обработчики читают хранимые счётчики, а не агрегат по пожертвованиям
+    instance.publication.refresh_from_db(fields=['donated_total', 'donors_count'])
+    bump_feed_version(instance.publication.category)
+
+
+@receiver(post_delete, sender=Donation)
+def decrement_donation_counters(sender, instance, origin=None, **kwargs):
+    if Publication.deleted_with_publication(origin):
+        return
+    # При удалении пачкой (QuerySet.delete, каскад от пользователя) post_delete приходит, когда удалены уже все
+    # строки: другие пожертвования того же донора тоже не видны. Поэтому число доноров пересчитываем по таблице
+    Publication.objects.filter(pk=instance.publication_id).update(
+        donated_total=F('donated_total') - Decimal(str(instance.donor_amount)),
+        donors_count=actual_counters()['donors_count'],
+    )
+    bump_feed_version(instance.publication.category)
+
 
 @receiver(post_save, sender=Donation)
 def check_publication_funding(sender, instance, created, **kwargs):
@@ -11,7 +50,7 @@ def check_publication_funding(sender, instance, created, **kwargs):
         return
 
     publication = instance.publication
-    total = publication.total_donated()
+    total = publication.donated_total
 
     if total >= publication.amount and publication.status != 'successful':
         publication.status = 'successful'
@@ -56,7 +95,7 @@ def notify_half_goal_reached(sender, instance, created, **kwargs):
 
     publication = instance.publication
     author = publication.author
-    total_donated = publication.total_donated()
+    total_donated = publication.donated_total
     goal = publication.amount
 
     if goal > 0 and 45 <= (total_donated / goal) * 100 < 55:
@@ -74,7 +113,7 @@ def notify_goal_reached(sender, instance, created, **kwargs):
 
     publication = instance.publication
     author = publication.author
-    total_donated = publication.total_donated()
+    total_donated = publication.donated_total
 
     if total_donated >= publication.amount and publication.status != 'successful':
         notify_user(
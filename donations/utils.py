@@ -15,6 +15,7 @@ from donations.signals import (
 )
 from donations.tasks import send_donation_email_task
 from .receipt import generate_donation_receipt
+from demeu.db_router import pin_primary
 
 def handle_donation_created(donation):
     """
@@ -26,6 +27,8 @@ def handle_donation_created(donation):
     notify_goal_reached(type(donation), donation, created=True)
     notify_new_donation(type(donation), donation, created=True)
     send_donation_email_task.delay(donation.id)
+    # Донор сразу открывает историю пожертвований: читаем её из основной БД, пока реплика догоняет
+    pin_primary(donation.donor_id)
 
 
 def send_donation_email(donor, donation):
@@ -3,6 +3,7 @@ from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from django.db.models import Sum
+from demeu.db_router import read_from_replica
 from .models import Donation
 from .serializers import DonationSerializer
 from publications.models import Publication
@@ -77,6 +78,7 @@ def top_donors(request, publication_id):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def donation_history(request):
     #Получение истории пожертвований пользователя.
     donations = Donation.objects.filter(donor=request.user).order_by('-created_at')
@@ -2,9 +2,11 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status, permissions
+from django.db.models import Prefetch
 from .models import FavoritePublication, FavoriteUser
 from .serializers import FavoritePublicationSerializer, FavoriteUserSerializer
 from publications.models import Publication
+from publications.serializers import PublicationCardSerializer
 from accounts.models import User
 
 
@@ -12,8 +14,9 @@ from accounts.models import User
 @permission_classes([IsAuthenticated])
 def favorite_publication_list_create(request):
     if request.method == 'GET':
-        favorites = FavoritePublication.objects.filter(user=request.user)
-        serializer = FavoritePublicationSerializer(favorites, many=True)
+        favorites = FavoritePublication.objects.filter(user=request.user).prefetch_related(
+            Prefetch('publication', queryset=PublicationCardSerializer.setup_eager_loading(Publication.objects.all())))
+        serializer = FavoritePublicationSerializer(favorites, many=True, context={'request': request})
         return Response(serializer.data)
 
     elif request.method == 'POST':
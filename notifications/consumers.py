@@ -21,3 +21,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
 
     async def send_notification(self, event):
         await self.send(text_data=json.dumps(event['content']))
+
+    async def send_notifications(self, event):
+        # Пачка уведомлений одному получателю: клиенту уходят те же отдельные сообщения
+        for content in event['contents']:
+            await self.send(text_data=json.dumps(content))
@@ -1,5 +1,7 @@
+from collections import defaultdict
 from channels.layers import get_channel_layer
 from asgiref.sync import async_to_sync
+from django.db import transaction
 from .models import Notification
 from .serializers import NotificationSerializer
 
@@ -21,6 +23,34 @@ def notify_user(user, verb, target=None, url=None):
             "content": serializer.data
         }
     )
+
+
+def notify_users_bulk(notifications):
+    """
+    Создаёт уведомления одним INSERT и отправляет их в WebSocket одним сообщением на получателя
+    (после коммита транзакции).
+    """
+    notifications = Notification.objects.bulk_create(notifications)
+
+    by_recipient = defaultdict(list)
+    for notification in notifications:
+        by_recipient[notification.recipient_id].append(NotificationSerializer(notification).data)
+
+    def push():
+        channel_layer = get_channel_layer()
+        for recipient_id, contents in by_recipient.items():
+            async_to_sync(channel_layer.group_send)(
+                f"user_{recipient_id}",
+                {
+                    "type": "send_notifications",
+                    "contents": contents
+                }
+            )
+
+    transaction.on_commit(push)
+    return notifications
+
+
 def notify_top_donor(user, publication):
     notify_user(
         user=user,
@@ -6,7 +6,7 @@ from favorites.serializers import FavoritePublicationSerializer
 from donations.models import Donation
 from .models import Profile
 from accounts.models import User
-from publications.serializers import PublicationSerializer
+from publications.serializers import PublicationCardSerializer
 from publications.serializers import DonationSerializer
 from datetime import date
 
@@ -19,7 +19,7 @@ class ProfileSerializer(serializers.ModelSerializer):
     age = serializers.SerializerMethodField()
     avatar = serializers.ImageField(required=False)
     date_joined = serializers.DateTimeField(source='user.date_joined', read_only=True)
-    publications = PublicationSerializer(many=True, read_only=True, source="user.publications")
+    publications = PublicationCardSerializer(many=True, read_only=True, source="user.publications")
     latest_donations = serializers.SerializerMethodField()
     total_profile_views = serializers.SerializerMethodField()
     total_publications = serializers.SerializerMethodField()
@@ -84,7 +84,7 @@ class ProfileSerializer(serializers.ModelSerializer):
 
     def get_favorite_publications(self, obj):
         favorites = FavoritePublication.objects.filter(user=obj.user)
-        return FavoritePublicationSerializer(favorites, many=True).data
+        return FavoritePublicationSerializer(favorites, many=True, context=self.context).data
 
     def get_days_since_registration(self, obj):
         if hasattr(obj, 'user') and hasattr(obj.user, 'date_joined') and obj.user.date_joined:
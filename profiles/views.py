@@ -3,8 +3,13 @@ import os
 from django.shortcuts import get_object_or_404
 from rest_framework import generics, permissions, filters
 from rest_framework.exceptions import NotFound
+from django.db.models import Prefetch
 from accounts.models import User
-from .models import Profile, ProfileView
+from demeu.db_router import read_from_replica
+from publications.models import Publication
+from publications.serializers import PublicationCardSerializer
+from publications.services import view_events
+from .models import Profile
 from .serializers import ProfileSerializer
 from accounts.serializers import UserSerializer
 
@@ -29,14 +34,21 @@ class ProfilePublicView(generics.RetrieveAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [permissions.AllowAny]
 
+    @read_from_replica
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
         user_id = self.kwargs.get('user_id')
-        profile = get_object_or_404(Profile, user__id=user_id)
+        queryset = Profile.objects.select_related('user').prefetch_related(
+            Prefetch('user__publications',
+                     queryset=PublicationCardSerializer.setup_eager_loading(Publication.objects.order_by('-created_at'))))
+        profile = get_object_or_404(queryset, user__id=user_id)
 
         # Фиксируем просмотр профиля
         viewer = self.request.user if self.request.user.is_authenticated else None
         if viewer and viewer != profile.user:
-            ProfileView.objects.get_or_create(profile=profile, viewer=viewer)
+            view_events.record_profile_view(profile.id, viewer.id)
 
         return profile
 
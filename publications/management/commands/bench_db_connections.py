@@ -0,0 +1,98 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.test import Client
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from publications.models import Publication
+
+BENCH_EMAIL = 'bench-connections@demeu.kz'
+FEED_URL = '/publications/?status=active&page_size=20'
+
+# Режимы соединений, как их задаёт DB_CONN_MODE в settings.py; 'per-request' — прежнее поведение (CONN_MAX_AGE=0)
+MODES = {
+    'per-request': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False},
+    'persistent': {'CONN_MAX_AGE': 600, 'CONN_HEALTH_CHECKS': True},
+    'pool': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': True},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark publication_list requests/sec with per-request, persistent and pooled DB connections"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per mode")
+        parser.add_argument('--concurrency', type=int, default=4, help="Client threads")
+        parser.add_argument('--publications', type=int, default=200, help="Publications to seed (removed afterwards)")
+        parser.add_argument('--modes', default=','.join(MODES), help="Comma-separated modes to run")
+
+    def handle(self, *args, **options):
+        # Клиенты в разных потоках (и соединениях) должны видеть данные: сидим с коммитом и удаляем в конце
+        user = self.seed(options['publications'])
+        token = str(AccessToken.for_user(user))
+        database = connections.settings['default']
+        original = {key: database.get(key) for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS')}
+        try:
+            self.stdout.write(f"{'mode':<12} {'req/s':>8} {'p50, ms':>9} {'p95, ms':>9} {'new sessions':>13}")
+            for mode in options['modes'].split(','):
+                database.update(MODES[mode])
+                database['OPTIONS'] = {key: value for key, value in (original['OPTIONS'] or {}).items()
+                                       if key != 'pool'}
+                if mode == 'pool':
+                    database['OPTIONS']['pool'] = {'min_size': options['concurrency'],
+                                                   'max_size': options['concurrency']}
+                sessions = self.sessions()
+                rps, timings = self.run(token, options['requests'], options['concurrency'])
+                connections['default'].close_pool()
+                self.stdout.write(f"{mode:<12} {rps:>8.1f} {statistics.median(timings):>9.2f} "
+                                  f"{statistics.quantiles(timings, n=20)[-1]:>9.2f} "
+                                  f"{self.sessions() - sessions:>13}")
+        finally:
+            database.update(original)
+            User.objects.filter(email=BENCH_EMAIL).delete()
+
+    def sessions(self):
+        # Сколько соединений (backend-процессов Postgres) открыто к базе за всё время
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT pg_stat_clear_snapshot()')
+            cursor.execute('SELECT sessions FROM pg_stat_database WHERE datname = current_database()')
+            return cursor.fetchone()[0]
+
+    def seed(self, count):
+        User.objects.filter(email=BENCH_EMAIL).delete()
+        user = User.objects.create_user(email=BENCH_EMAIL, first_name='Bench', last_name='Mark', password=None)
+        Publication.objects.bulk_create([
+            Publication(author=user, title=f'Bench {i}', category='general', description='Bench',
+                        bank_details='4400430012345678', amount=100000, contact_name='Bench',
+                        contact_email=BENCH_EMAIL, contact_phone='+77011234567')
+            for i in range(count)
+        ])
+        return user
+
+    def run(self, token, total, concurrency):
+        def worker(requests):
+            client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'Bearer {token}')
+            timings = []
+            try:
+                for _ in range(requests):
+                    started = time.perf_counter()
+                    # Тестовый Client отключает close_old_connections на request_started/request_finished,
+                    # вызываем его сами, как это делает WSGI-обработчик
+                    close_old_connections()
+                    response = client.get(FEED_URL)
+                    close_old_connections()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        raise CommandError(f"{FEED_URL} returned {response.status_code}")
+            finally:
+                connections.close_all()
+            return timings
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            timings = [t for chunk in executor.map(worker, [total // concurrency] * concurrency) for t in chunk]
+        return len(timings) / (time.perf_counter() - started), timings
@@ -0,0 +1,105 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from accounts.models import User
+from publications.models import Publication
+from publications.services.search import normalize_text, search_publications
+
+# Тематические слова встречаются редко, остальной текст — случайные «слова» из слогов
+TOPICS = [
+    'лечение', 'операция', 'ребёнок', 'приют', 'собака', 'школа', 'университет', 'пожар', 'дом',
+    'спорт', 'турнир', 'экология', 'деревья', 'помощь', 'семья', 'реабилитация', 'инвалидность',
+    'бала', 'емдеу', 'көмек', 'мектеп', 'отбасы', 'жануарлар', 'спортшы',
+]
+SYLLABLES = ['ка', 'ра', 'ло', 'ми', 'ту', 'не', 'са', 'ве', 'до', 'ры', 'жа', 'қы', 'бе', 'го', 'ңа']
+TOPIC_RATE = 0.02
+
+# Последний запрос — с опечаткой, его находит только триграммный индекс
+QUERIES = ['лечение', 'операция ребёнок', 'приют для собак', 'көмек', 'леченее']
+
+
+def legacy_search(queryset, search):
+    """Прежний поиск из publication_list: OR-цепочки icontains по описанию, заголовку и email."""
+    words = search.split()
+    if len(words) <= 2:
+        query = Q()
+        for word in words:
+            word = normalize_text(word)
+            query |= Q(description__icontains=word) | Q(title__icontains=word) | Q(author__email__icontains=word)
+        return queryset.filter(query)
+    search = normalize_text(search)
+    return queryset.filter(Q(description__icontains=search) | Q(title__icontains=search) |
+                           Q(author__email__icontains=search))
+
+
+class Command(BaseCommand):
+    help = "Benchmark legacy icontains search against the full-text/trigram indexes on seeded publications"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--publications', type=int, default=100000, help="Number of publications to seed")
+        parser.add_argument('--repeat', type=int, default=10, help="Runs per query")
+
+    def handle(self, *args, **options):
+        # Всё выполняется в транзакции, которая откатывается в конце: база остаётся чистой
+        with transaction.atomic():
+            self.seed(options['publications'])
+
+            self.stdout.write(f"{'query':<20} {'icontains, ms':>15} {'index, ms':>12} {'found':>8}")
+            for search in QUERIES:
+                base = Publication.objects.filter(status='active')
+                legacy = self.measure(lambda: list(
+                    legacy_search(base, search).order_by('-created_at').values_list('id', flat=True)[:20]
+                ), options['repeat'])
+                indexed = self.measure(lambda: list(
+                    search_publications(base, search).order_by('-search_rank').values_list('id', flat=True)[:20]
+                ), options['repeat'])
+                found = search_publications(base, search).count()
+                self.stdout.write(f"{search:<20} {legacy:>15.2f} {indexed:>12.2f} {found:>8}")
+
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        self.stdout.write(f"Seeding {count} publications...")
+        author = User.objects.create_user(email='bench@demeu.kz', first_name='Bench', last_name='Mark',
+                                          password=None)
+        rng = random.Random(42)
+        filler = [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)]
+
+        def text(words):
+            result = rng.choices(filler, k=words)
+            if rng.random() < TOPIC_RATE:
+                result[rng.randrange(words)] = rng.choice(TOPICS)
+            return ' '.join(result)
+
+        batch = []
+        for _ in range(count):
+            batch.append(Publication(
+                author=author,
+                title=text(4),
+                category='general',
+                description=text(60),
+                bank_details='4400430012345678',
+                amount=100000,
+                contact_name='Bench',
+                contact_email='bench@demeu.kz',
+                contact_phone='+77011234567',
+            ))
+            if len(batch) == 5000:
+                Publication.objects.bulk_create(batch)
+                batch = []
+        Publication.objects.bulk_create(batch)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE publications_publication')
+
+    def measure(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,60 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Что загружает процесс каждого типа до первого запроса/задачи
+PROCESS_TYPES = {
+    # gunicorn/runserver: настройки, приложения и URLconf со всеми views и сериализаторами
+    'web': "django.setup(); from django.urls import get_resolver; get_resolver().url_patterns",
+    # runserver/daphne из INSTALLED_APPS: django.setup(), затем ASGI_APPLICATION (HTTP и WebSocket-маршруты)
+    'daphne': "django.setup(); import demeu.asgi; from django.urls import get_resolver; get_resolver().url_patterns",
+    # Celery импортирует все tasks.py (autodiscover) до запуска пула
+    'worker': "django.setup(); from demeu.celery import app; app.loader.import_default_modules()",
+    # Воркер очереди ocr дополнительно загружает модели NER до fork (preload_ocr_models)
+    'ocr-worker': ("django.setup(); from demeu.celery import app; app.loader.import_default_modules(); "
+                   "from verification.services.ner import load_models; load_models()"),
+}
+HEAVY_MODULES = ('numpy', 'scipy', 'cv2', 'pdf2image', 'pytesseract', 'natasha')
+
+CHILD = """
+import time
+started = time.perf_counter()
+import sys, json, django
+{code}
+elapsed = (time.perf_counter() - started) * 1000
+rss = next(int(line.split()[1]) for line in open('/proc/self/status') if line.startswith('VmRSS:')) // 1024
+print(json.dumps({{'ms': elapsed, 'rss': rss, 'heavy': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+class Command(BaseCommand):
+    help = "Measure import time and RSS of a fresh web, daphne, Celery and OCR-worker process"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help="Fresh processes per type")
+        parser.add_argument('--types', default=','.join(PROCESS_TYPES), help="Comma-separated process types")
+
+    def handle(self, *args, **options):
+        if not os.path.exists('/proc/self/status'):
+            raise CommandError("RSS is read from /proc/self/status, run the benchmark on Linux")
+
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'demeu.settings'))
+        self.stdout.write(f"{'process':<12} {'import, ms':>11} {'RSS, MB':>8}  heavy modules")
+        for process_type in options['types'].split(','):
+            code = CHILD.format(code=PROCESS_TYPES[process_type], heavy=HEAVY_MODULES)
+            runs = []
+            for _ in range(options['repeat']):
+                result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                        cwd=settings.BASE_DIR, env=env)
+                if result.returncode:
+                    raise CommandError(f"{process_type} failed to start:\n{result.stderr}")
+                runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            self.stdout.write(
+                f"{process_type:<12} {statistics.median(run['ms'] for run in runs):>11.0f} "
+                f"{statistics.median(run['rss'] for run in runs):>8.0f}  {', '.join(runs[-1]['heavy']) or '-'}"
+            )
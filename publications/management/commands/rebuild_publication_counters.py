@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F, Q
+
+from publications.models import Publication
+from publications.services.counters import actual_counters
+
+
+class Command(BaseCommand):
+    help = "Verify and rebuild denormalized publication counters (donated_total, views, comments, donors)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Only report drifted publications, exit with an error if any are found")
+
+    def handle(self, *args, **options):
+        expressions = actual_counters()
+        drift = Q()
+        for field in expressions:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+
+        drifted = (
+            Publication.objects
+            .annotate(**{f'actual_{field}': expression for field, expression in expressions.items()})
+            .filter(drift)
+            .values('id', 'title', *expressions, *[f'actual_{field}' for field in expressions])
+        )
+
+        drifted_ids = []
+        for row in drifted:
+            drifted_ids.append(row['id'])
+            changes = ', '.join(
+                f"{field}: {row[field]} -> {row[f'actual_{field}']}"
+                for field in expressions if row[field] != row[f'actual_{field}']
+            )
+            self.stdout.write(self.style.WARNING(f"[{row['id']}] {row['title']}: {changes}"))
+
+        if not drifted_ids:
+            self.stdout.write(self.style.SUCCESS("✅ All publication counters are consistent."))
+            return
+
+        if options['check']:
+            raise CommandError(f"{len(drifted_ids)} publications have drifted counters.")
+
+        updated = Publication.objects.filter(pk__in=drifted_ids).update(**actual_counters())
+        self.stdout.write(self.style.SUCCESS(f"✅ Rebuilt counters for {updated} publications."))
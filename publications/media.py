@@ -0,0 +1,178 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, parse_etags, quote_etag
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import NotAuthenticated, PermissionDenied
+from rest_framework.permissions import AllowAny
+
+from .models import PublicationDocument
+
+# Публичные файлы с уникальными именами: браузер и CDN кэшируют их на год
+PUBLIC_MEDIA_PREFIXES = ('publications/images/', 'publications/videos/', 'avatars/')
+PRIVATE_MEDIA_PREFIX = 'documents/'
+PUBLIC_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PRIVATE_CACHE_CONTROL = 'private, no-cache'
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeFileWrapper:
+    """
+    Отдаёт только [start, start + length) файла. fileno() оставляем: gunicorn (wsgi.file_wrapper) шлёт диапазон
+    через sendfile с текущей позиции ровно на Content-Length байт; без sendfile работает read().
+    """
+
+    def __init__(self, file, start, length):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def authorize_document(request, path):
+    document = PublicationDocument.objects.select_related('publication').filter(file=path).first()
+    if document is None:
+        raise Http404
+    if not request.user.is_authenticated:
+        raise NotAuthenticated()
+    if request.user != document.publication.author and not request.user.is_staff:
+        raise PermissionDenied("You do not have permission to view this document.")
+
+
+def set_headers(response, headers):
+    for name, value in headers.items():
+        response[name] = value
+
+
+def cache_control_for(path):
+    if path.startswith(PRIVATE_MEDIA_PREFIX):
+        return PRIVATE_CACHE_CONTROL
+    if path.startswith(PUBLIC_MEDIA_PREFIXES):
+        return PUBLIC_CACHE_CONTROL
+    return DEFAULT_CACHE_CONTROL
+
+
+def requested_range(request, size, etag, last_modified):
+    """
+    (start, end) из заголовка Range, None — отдать файл целиком, ValueError — диапазон невыполним.
+    If-Range: диапазон только если клиент держит ту же версию файла. Несколько диапазонов не поддерживаем (RFC
+    разрешает ответить целым файлом).
+    """
+    header = request.META.get('HTTP_RANGE', '').strip()
+    match = RANGE_RE.match(header)
+    if not match or match.groups() == ('', ''):
+        return None
+
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if if_range:
+        if if_range.startswith(('"', 'W/')):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    first, last = match.groups()
+    if first == '':
+        # bytes=-500: последние 500 байт
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError
+    return start, end
+
+
+def offload_response(path, full_path, content_type):
+    """Передаём отдачу файла прокси (nginx X-Accel-Redirect / Apache X-Sendfile), Range он обработает сам."""
+    response = HttpResponse(content_type=content_type)
+    if settings.MEDIA_OFFLOAD == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = settings.MEDIA_OFFLOAD_PREFIX + path
+    else:
+        response['X-Sendfile'] = full_path
+    return response
+
+
+@api_view(['GET', 'HEAD'])
+@permission_classes([AllowAny])
+def serve_media(request, path):
+    """
+    Отдаёт файлы из MEDIA_ROOT: Range/If-Range (206), ETag/Last-Modified (304), zero-copy через FileResponse
+    или X-Accel-Redirect/X-Sendfile. Документы публикаций доступны только автору и персоналу.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except Exception:
+        raise Http404
+    # Дальше — только нормализованный путь: x/../documents/... и ./documents/... не должны обходить проверку доступа
+    path = os.path.relpath(full_path, os.path.abspath(settings.MEDIA_ROOT)).replace(os.sep, '/')
+    if path.startswith(PRIVATE_MEDIA_PREFIX):
+        authorize_document(request, path)
+    if not os.path.isfile(full_path):
+        raise Http404
+
+    stat = os.stat(full_path)
+    last_modified = int(stat.st_mtime)
+    etag = quote_etag(f"{stat.st_mtime_ns:x}-{stat.st_size:x}")
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control_for(path),
+        'Accept-Ranges': 'bytes',
+    }
+
+    # If-None-Match важнее If-Modified-Since (RFC 9110)
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        etags = parse_etags(if_none_match)
+        not_modified = etag in etags or '*' in etags
+    else:
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        not_modified = if_modified_since is not None and last_modified <= if_modified_since
+    if not_modified:
+        response = HttpResponseNotModified()
+        set_headers(response, headers)
+        return response
+
+    if settings.MEDIA_OFFLOAD:
+        response = offload_response(path, full_path, content_type)
+        set_headers(response, headers)
+        return response
+
+    try:
+        byte_range = requested_range(request, stat.st_size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+
+    file = open(full_path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(RangeFileWrapper(file, start, end - start + 1), content_type=content_type,
+                                status=206)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    set_headers(response, headers)
+    return response
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0016_alter_publication_status'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='publication_feed_created_idx'),
+        ),
+    ]
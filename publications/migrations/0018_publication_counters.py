@@ -0,0 +1,57 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0017_publication_feed_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='comments_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='donated_total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='donors_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='publication',
+            name='views_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['status', '-views_count', '-id'], name='publication_feed_views_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['status', '-donated_total', '-id'], name='publication_feed_donated_idx'),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE publications_publication p SET
+                    donated_total = COALESCE(
+                        (SELECT SUM(d.donor_amount) FROM donations_donation d WHERE d.publication_id = p.id), 0),
+                    donors_count = (
+                        SELECT COUNT(DISTINCT d.donor_id) FROM donations_donation d WHERE d.publication_id = p.id),
+                    views_count = (
+                        SELECT COUNT(*) FROM publications_view v WHERE v.publication_id = p.id),
+                    comments_count = (
+                        SELECT COUNT(*) FROM comments_comment c WHERE c.publication_id = p.id);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
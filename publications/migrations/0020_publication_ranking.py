@@ -0,0 +1,25 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0019_publication_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublicationRanking',
+            fields=[
+                ('publication', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='publications.publication')),
+                ('score', models.FloatField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-score'], name='publication_ranking_score_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0021_publication_recommendation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Убираем накопившиеся дубликаты (оставляем самый ранний просмотр) и пересчитываем views_count
+        migrations.RunSQL(
+            sql="""
+                DELETE FROM publications_view a USING publications_view b
+                WHERE a.publication_id = b.publication_id AND a.viewer_id = b.viewer_id AND a.id > b.id;
+                UPDATE publications_publication p SET views_count = (
+                    SELECT COUNT(*) FROM publications_view v WHERE v.publication_id = p.id);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddConstraint(
+            model_name='view',
+            constraint=models.UniqueConstraint(fields=('publication', 'viewer'), name='publication_view_unique_viewer'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0022_view_unique_viewer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['is_archived', 'updated_at'], name='publication_archive_idx'),
+        ),
+    ]
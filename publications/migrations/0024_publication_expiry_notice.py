@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:24
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0023_publication_archive_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publication',
+            name='expiry_notice_stage',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='publication',
+            index=models.Index(fields=['status', 'expires_at'], name='publication_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0024_publication_expiry_notice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicationimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0025_publicationimage_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicationvideo',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicationvideo',
+            name='duration',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicationvideo',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='publicationvideo',
+            name='poster',
+            field=models.ImageField(blank=True, null=True, upload_to='publications/videos/posters/'),
+        ),
+        migrations.AddField(
+            model_name='publicationvideo',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
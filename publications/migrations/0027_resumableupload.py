@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:33
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0026_publicationvideo_metadata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumableUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('image', 'Изображение'), ('video', 'Видео'), ('document', 'Документ')], max_length=10)),
+                ('document_type', models.CharField(blank=True, choices=[('identity', 'Удостоверение личности'), ('income', 'Справка о доходах'), ('supporting', 'Подтверждающие документы')], max_length=20)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('offset', models.PositiveBigIntegerField(default=0)),
+                ('sha256', models.CharField(blank=True, max_length=64)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumable_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0027_resumableupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='publication',
+            name='status',
+            field=models.CharField(choices=[('active', 'Активна'), ('successful', 'Успешно завершена'), ('pending', 'Ожидает проверки'), ('expired', 'Истёк срок'), ('processing', 'Обрабатывается')], default='active', max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0028_publication_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='publicationdocument',
+            name='content_sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0029_publicationdocument_content_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumableupload',
+            name='publication',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pending_uploads', to='publications.publication'),
+        ),
+    ]
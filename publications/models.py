@@ -4,7 +4,9 @@ from django.utils import timezone
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db.models import Sum
+from django.db.models import Sum, F
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from phonenumber_field.modelfields import PhoneNumberField
 from datetime import timedelta
 
@@ -60,6 +62,7 @@ STATUS_CHOICES = [
     ('successful', 'Успешно завершена'),
     ('pending', 'Ожидает проверки'),
     ('expired', 'Истёк срок'),
+    ('processing', 'Обрабатывается'),  # асинхронное создание: файлы ещё сохраняются в Celery
 ]
 
 DURATION_CHOICES = [
@@ -68,6 +71,14 @@ DURATION_CHOICES = [
     (30, "1 месяц"),
 ]
 
+# Этапы предупреждений об окончании срока (expiry_notice_stage)
+EXPIRY_NOTICE_NONE = 0
+EXPIRY_NOTICE_TOMORROW = 1
+EXPIRY_NOTICE_TODAY = 2
+
+# Денормализованные счётчики: меняются только через Publication.adjust_counters (F-выражения)
+COUNTER_FIELDS = ('donated_total', 'views_count', 'comments_count', 'donors_count')
+
 # Models
 class Publication(models.Model):
     CATEGORY_CHOICES = [
@@ -103,6 +114,37 @@ class Publication(models.Model):
     expires_at = models.DateTimeField(blank=True, null=True) #дата окончания
     verification_status = models.CharField(max_length=20,choices=VERIFICATION_STATUS_CHOICES,default='pending',
         help_text="Статус проверки всех загруженных документов")
+    donated_total = models.DecimalField(max_digits=12, decimal_places=2, default=0) #сумма пожертвований
+    views_count = models.IntegerField(default=0) #количество просмотров
+    comments_count = models.IntegerField(default=0) #количество комментариев
+    donors_count = models.IntegerField(default=0) #количество уникальных доноров
+    expiry_notice_stage = models.PositiveSmallIntegerField(default=0) #какое предупреждение об окончании уже отправлено
+    # Поисковый вектор поддерживает сама БД: русская морфология + 'simple' для казахского текста
+    search_vector = models.GeneratedField(
+        expression=(
+            SearchVector('title', config='russian', weight='A') +
+            SearchVector('title', config='simple', weight='A') +
+            SearchVector('description', config='russian', weight='B') +
+            SearchVector('description', config='simple', weight='C')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        indexes = [
+            # Keyset-пагинация ленты: WHERE status = ... ORDER BY created_at DESC, id DESC
+            models.Index(fields=['status', '-created_at', '-id'], name='publication_feed_created_idx'),
+            models.Index(fields=['status', '-views_count', '-id'], name='publication_feed_views_idx'),
+            models.Index(fields=['status', '-donated_total', '-id'], name='publication_feed_donated_idx'),
+            GinIndex(fields=['search_vector'], name='publication_search_idx'),
+            # Устойчивость к опечаткам: title %> 'запрос' (pg_trgm)
+            GinIndex(fields=['title'], name='publication_title_trgm_idx', opclasses=['gin_trgm_ops']),
+            # Срочные и предупреждения об окончании: WHERE status = 'active' AND expires_at < ...
+            models.Index(fields=['status', 'expires_at'], name='publication_expiry_idx'),
+            # Ночная очистка архива: WHERE is_archived AND updated_at <= ...
+            models.Index(fields=['is_archived', 'updated_at'], name='publication_archive_idx'),
+        ]
 
     def total_donated(self):
         return self.donations.aggregate(total=Sum('donor_amount'))['total'] or 0
@@ -117,9 +159,31 @@ class Publication(models.Model):
         total = self.total_donated()
         return (total / self.amount) * 100 if self.amount else 0
 
+    @staticmethod
+    def deleted_with_publication(origin):
+        """
+        post_delete строки пришёл из каскада удаления самих публикаций (origin — публикация или её QuerySet):
+        счётчики и кэш лент удаляемых публикаций обновлять незачем, иначе это UPDATE на каждую строку.
+        """
+        model = origin.model if isinstance(origin, models.QuerySet) else type(origin)
+        return issubclass(model, Publication)
+
+    @classmethod
+    def adjust_counters(cls, publication_id, **deltas):
+        """
+        Атомарно сдвигает счётчики публикации: UPDATE ... SET views_count = views_count + 1
+        """
+        cls.objects.filter(pk=publication_id).update(**{field: F(field) + delta for field, delta in deltas.items()})
+
     def save(self, *args, **kwargs):
         if not self.expires_at:
             self.expires_at = timezone.now() + timedelta(days=self.duration_days)
+        # Не перезаписываем счётчики значениями из устаревшего экземпляра
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -129,11 +193,19 @@ class Publication(models.Model):
 class PublicationImage(models.Model):
     publication = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='publications/images/', validators=[validate_file_size, validate_image_format])
+    # WebP/AVIF копии по ширинам {формат: {ширина: файл}}, заполняет задача generate_image_variants
+    variants = models.JSONField(default=dict, blank=True)
 
 
 class PublicationVideo(models.Model):
     publication = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='videos')
     video = models.FileField(upload_to='publications/videos/', validators=[validate_file_size, validate_video_format])
+    # Постер и метаданные заполняет задача extract_video_metadata: ленте не нужно скачивать сам файл
+    poster = models.ImageField(upload_to='publications/videos/posters/', blank=True, null=True)
+    duration = models.FloatField(blank=True, null=True) #секунды
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    bitrate = models.PositiveIntegerField(blank=True, null=True) #бит/с
 
 
 # Типы документов
@@ -154,6 +226,8 @@ class PublicationDocument(models.Model):
     )
     uploaded_at = models.DateTimeField(auto_now_add=True)
     text_hash = models.CharField(max_length=64, unique=False, null=True, blank=True)
+    # sha256 байтов файла, посчитанный при приёме; по нему берётся готовый OCR (verification.OcrResult)
+    content_sha256 = models.CharField(max_length=64, blank=True)
     # Поля проверки ИИ
     verified = models.BooleanField(default=False)
     verification_status = models.CharField(
@@ -190,5 +264,83 @@ class View(models.Model):
     viewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     viewed_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        # Один просмотр на пользователя: flush_view_events пишет пачки с ignore_conflicts
+        constraints = [
+            models.UniqueConstraint(fields=['publication', 'viewer'], name='publication_view_unique_viewer'),
+        ]
+
+    def __str__(self):
+        return f"User {self.viewer} viewed publication {self.publication.title}"
+
+class PublicationRanking(models.Model):
+    """
+    Материализованный рейтинг для top_publications: пересчитывается задачей refresh_publication_ranking.
+    """
+    publication = models.OneToOneField(Publication, on_delete=models.CASCADE, primary_key=True,
+                                       related_name='ranking')
+    score = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-score'], name='publication_ranking_score_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.publication_id}: {self.score:.2f}"
+
+
+class PublicationRecommendation(models.Model):
+    """
+    Предрассчитанные рекомендации (item-item): строит ночная задача build_publication_recommendations.
+    Строки с user=NULL — список популярного для пользователей без истории.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='publication_recommendations')
+    publication = models.ForeignKey(Publication, on_delete=models.CASCADE, related_name='recommendations')
+    score = models.FloatField()
+    position = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'position'], name='publication_recommend_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id or 'popular'} -> {self.publication_id} ({self.score:.3f})"
+
+
+UPLOAD_KIND_CHOICES = [
+    ('image', 'Изображение'),
+    ('video', 'Видео'),
+    ('document', 'Документ'),
+]
+
+
+class ResumableUpload(models.Model):
+    """
+    Файл, загружаемый частями: PATCH с Upload-Offset дописывает байты в UPLOAD_TEMP_DIR/<id>.part.
+    После последней части считается sha256, и загрузку можно прикрепить к публикации по id (upload_ids).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='resumable_uploads')
+    kind = models.CharField(max_length=10, choices=UPLOAD_KIND_CHOICES)
+    document_type = models.CharField(max_length=20, choices=DOCUMENT_TYPES, blank=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    # Публикация в статусе processing, файлы которой ждут finalize_publication: такие загрузки не удаляются по сроку
+    publication = models.ForeignKey('Publication', on_delete=models.SET_NULL, null=True, blank=True,
+                                    related_name='pending_uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def temp_path(self):
+        return os.path.join(settings.UPLOAD_TEMP_DIR, f"{self.id}.part")
+
     def __str__(self):
-        return f"User {self.viewer} viewed publication {self.publication.title}"
\ No newline at end of file
+        return f"{self.filename} ({self.offset}/{self.size})"
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PublicationCursorPagination(BasePagination):
+    """
+    Keyset-пагинация ленты по паре (поле сортировки, id).
+
+    Курсор непрозрачен для клиента, страница N стоит столько же, сколько первая:
+    вместо OFFSET используется условие WHERE (field, id) < (value, last_id).
+    COUNT(*) выполняется только если клиент явно попросил ?count=true.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering='-created_at'):
+        self.ordering = ordering
+        self.field = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+
+    def get_page_size(self, request):
+        page_size = settings.PUBLICATIONS_PAGE_SIZE
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            pass
+        return max(1, min(page_size, settings.PUBLICATIONS_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.cursor = self.decode_cursor(request)
+
+        self.count = None
+        if request.query_params.get(self.count_query_param) in ('1', 'true'):
+            self.count = queryset.count()
+
+        # При движении назад сортировка переворачивается, а результат потом разворачивается обратно
+        reverse = self.cursor is not None and self.cursor['r']
+        descending = self.descending != reverse
+        if self.cursor is not None:
+            lookup = 'lt' if descending else 'gt'
+            value, pk = self.cursor['v'], self.cursor['id']
+            queryset = queryset.filter(
+                Q(**{f'{self.field}__{lookup}': value}) |
+                Q(**{self.field: value, f'id__{lookup}': pk})
+            )
+
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.build_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.build_link(self.page[0], reverse=True)
+
+    def build_link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.count_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(obj, reverse))
+
+    def encode_cursor(self, obj, reverse):
+        payload = {'o': self.ordering, 'v': getattr(obj, self.field), 'id': obj.id, 'r': reverse}
+        raw = json.dumps(payload, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if payload['o'] != self.ordering:
+                raise ValueError('Cursor was issued for another ordering')
+            return {'v': payload['v'], 'id': int(payload['id']), 'r': bool(payload['r'])}
+        except (TypeError, ValueError, KeyError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
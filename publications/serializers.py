@@ -1,24 +1,40 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.db import transaction
+from django.db.models import Sum, Prefetch
 from django.utils import timezone
 from rest_framework import serializers
 from datetime import date
 from donations import models
-from .models import Publication, PublicationImage, PublicationVideo, View, PublicationDocument
+from .models import (Publication, PublicationImage, PublicationVideo, View, PublicationDocument, ResumableUpload,
+                     validate_document_format, validate_image_format, validate_video_format)
+from .services.images import image_srcset
+from .services.publication_media import add_publication_media, media_atomic
+from .services.uploads import stage_uploaded_files
+from .tasks import finalize_publication
 from profiles.models import Profile
 from donations.models import Donation
-from verification.tasks import process_document_verification
 
 
 class PublicationImageSerializer(serializers.ModelSerializer):
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = PublicationImage
-        fields = ['id', 'image']
+        fields = ['id', 'image', 'srcset']
+
+    def get_srcset(self, obj):
+        # {"webp": "url 480w, url 1080w, ..."}; пусто, пока копии не построены — клиент берёт image
+        request = self.context.get('request')
+        return image_srcset(obj.variants, request.build_absolute_uri if request else str)
 
 
 class PublicationVideoSerializer(serializers.ModelSerializer):
     class Meta:
         model = PublicationVideo
-        fields = ['id', 'video']
+        fields = ['id', 'video', 'poster', 'duration', 'width', 'height', 'bitrate']
+        read_only_fields = ['poster', 'duration', 'width', 'height', 'bitrate']
 
 
 class DonationSerializer(serializers.ModelSerializer):
@@ -81,6 +97,67 @@ class PublicationDocumentSerializer(serializers.ModelSerializer):
 
 
 
+class PublicationCardSerializer(serializers.ModelSerializer):
+    """
+    Компактная карточка публикации для лент и списков.
+    Полный вложенный PublicationSerializer используется только в publication_detail.
+    """
+    cover_image = serializers.SerializerMethodField()
+    cover_srcset = serializers.SerializerMethodField()
+    author = serializers.SerializerMethodField()
+    total_donated = serializers.DecimalField(source='donated_total', max_digits=12, decimal_places=2, read_only=True)
+    donation_percentage = serializers.SerializerMethodField()
+    days_remaining = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Publication
+        fields = [
+            'id', 'title', 'category', 'cover_image', 'cover_srcset', 'author', 'amount', 'total_donated',
+            'donation_percentage', 'days_remaining', 'status', 'verification_status', 'created_at',
+        ]
+        read_only_fields = fields
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """Загружает всё, что нужно карточке, за постоянное число запросов."""
+        return queryset.select_related('author__profile').prefetch_related(
+            Prefetch('images', queryset=PublicationImage.objects.order_by('id')),
+        )
+
+    def build_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_cover_image(self, obj):
+        image = next(iter(obj.images.all()), None)
+        return self.build_url(image.image.url) if image and image.image else None
+
+    def get_cover_srcset(self, obj):
+        image = next(iter(obj.images.all()), None)
+        return image_srcset(image.variants, self.build_url) if image else {}
+
+    def get_author(self, obj):
+        author = obj.author
+        avatar = None
+        if hasattr(author, 'profile') and author.profile.avatar:
+            avatar = self.build_url(author.profile.avatar.url)
+        return {
+            'id': author.id,
+            'name': f"{author.first_name} {author.last_name}".strip(),
+            'avatar': avatar,
+        }
+
+    def get_donation_percentage(self, obj):
+        if obj.amount:
+            return (obj.donated_total / obj.amount) * 100
+        return 0
+
+    def get_days_remaining(self, obj):
+        if obj.expires_at:
+            return max(0, (obj.expires_at.date() - timezone.now().date()).days)
+        return None
+
+
 class PublicationSerializer(serializers.ModelSerializer):
     images = PublicationImageSerializer(many=True, read_only=True)
     videos = PublicationVideoSerializer(many=True, read_only=True)
@@ -98,6 +175,8 @@ class PublicationSerializer(serializers.ModelSerializer):
     deleted_videos = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False)
     delete_all_images = serializers.BooleanField(write_only=True, required=False, default=False)
     delete_all_videos = serializers.BooleanField(write_only=True, required=False, default=False)
+    # id завершённых загрузок частями (publications/uploads/): изображения, видео и документы
+    upload_ids = serializers.ListField(child=serializers.UUIDField(), write_only=True, required=False)
 
     documents = PublicationDocumentSerializer(many=True, read_only=True)
     donations = serializers.SerializerMethodField()
@@ -120,12 +199,26 @@ class PublicationSerializer(serializers.ModelSerializer):
             'bank_details', 'amount', 'contact_name', 'contact_email',
             'contact_phone', 'created_at', 'updated_at', 'images',
             'videos', 'uploaded_images', 'uploaded_videos','uploaded_documents','uploaded_document_types',
-            'deleted_images', 'deleted_videos', 'delete_all_images', 'delete_all_videos',
+            'deleted_images', 'deleted_videos', 'delete_all_images', 'delete_all_videos', 'upload_ids',
             'documents', 'donations', 'views', 'donation_percentage',
             'total_views', 'total_donated', 'total_comments','duration_days',
             'days_remaining','status', 'verification_status',]
         read_only_fields = ['id', 'author', 'created_at', 'updated_at']
 
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        """
+        Подготавливает queryset к сериализации: все связи загружаются заранее,
+        поэтому число запросов не зависит от количества публикаций и вложенных объектов.
+        """
+        return queryset.select_related('author__profile').prefetch_related(
+            Prefetch('images', queryset=PublicationImage.objects.order_by('id')),
+            Prefetch('videos', queryset=PublicationVideo.objects.order_by('id')),
+            Prefetch('documents', queryset=PublicationDocument.objects.order_by('id')),
+            Prefetch('views', queryset=View.objects.order_by('id')),
+            Prefetch('donations', queryset=Donation.objects.select_related('donor').order_by('created_at', 'id')),
+        )
+
     def get_author_id(self, obj):
         return obj.author.id if obj.author else None
 
@@ -145,7 +238,7 @@ class PublicationSerializer(serializers.ModelSerializer):
 
 
     def get_donations(self, obj):
-        donations = obj.donations.select_related('donor')
+        donations = obj.donations.all()
         return [
             {
                 "donor_name": f"{donation.donor.first_name} {donation.donor.last_name}".strip()
@@ -156,19 +249,18 @@ class PublicationSerializer(serializers.ModelSerializer):
         ]
 
     def get_donation_percentage(self, obj):
-        total_donations = obj.donations.aggregate(total=Sum('donor_amount'))['total'] or 0
         if obj.amount:
-            return (total_donations / obj.amount) * 100
+            return (obj.donated_total / obj.amount) * 100
         return 0
 
     def get_total_views(self, obj):
-        return obj.views.count()
+        return obj.views_count
 
     def get_total_donated(self, obj):
-        return Donation.objects.filter(publication=obj).aggregate(total=Sum('donor_amount'))['total'] or 0
+        return obj.donated_total
 
     def get_total_comments(self, obj):
-        return obj.comments.count()
+        return obj.comments_count
 
     def get_days_remaining(self, obj):
         if obj.expires_at:
@@ -182,6 +274,14 @@ class PublicationSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Период публикации должен быть 7, 14 или 30 дней.")
         return value
 
+    def validate_upload_ids(self, value):
+        uploads = list(ResumableUpload.objects.filter(
+            pk__in=value, owner=self.context['request'].user, completed_at__isnull=False))
+        if len(uploads) != len(set(value)):
+            raise serializers.ValidationError("Загрузка не найдена или ещё не завершена.")
+        return uploads
+
+    @media_atomic()
     def create(self, validated_data):
         request = self.context.get('request')
 
@@ -194,9 +294,10 @@ class PublicationSerializer(serializers.ModelSerializer):
         uploaded_document_types = (
                 request.data.getlist('uploaded_document_types[]') or
                 request.data.getlist('uploaded_document_types') or [])
+        uploads = validated_data.get('upload_ids', [])
 
         #Проверка: обязательно хотя бы один документ
-        if not uploaded_documents:
+        if not uploaded_documents and not any(upload.kind == 'document' for upload in uploads):
             raise serializers.ValidationError({"uploaded_documents": "Необходимо загрузить хотя бы один документ."})
 
         # Проверка соответствия количества документов и типов
@@ -209,26 +310,29 @@ class PublicationSerializer(serializers.ModelSerializer):
 
         validated_data['verification_status'] = 'pending'
 
-        publication = Publication.objects.create(**validated_data)
-
-        for image in uploaded_images:
-            PublicationImage.objects.create(publication=publication, image=image)
-        print("Images uploaded successfully!" if uploaded_images else "No images uploaded!")
+        if self.context.get('defer_media'):
+            # Асинхронное создание: публикация сохраняется в статусе processing, файлы из запроса переносятся
+            # в каталог загрузок, а в хранилище их кладёт задача finalize_publication после коммита
+            final_status = validated_data.pop('status', Publication._meta.get_field('status').default)
+            publication = Publication.objects.create(**validated_data, status='processing')
+            staged = stage_uploaded_files(request.user, uploaded_images, uploaded_videos,
+                                          zip(uploaded_documents, uploaded_document_types))
+            upload_ids = [str(upload.pk) for upload in staged + uploads]
+            ResumableUpload.objects.filter(pk__in=upload_ids).update(publication=publication)
+            transaction.on_commit(lambda: finalize_publication.delay(publication.id, upload_ids, final_status))
+            return publication
 
-        for video in uploaded_videos:
-            PublicationVideo.objects.create(publication=publication, video=video)
-        print("Videos uploaded successfully!" if uploaded_videos else "No videos uploaded!")
-
-        if uploaded_documents and len(uploaded_documents) != len(uploaded_document_types):
-            raise serializers.ValidationError("Каждый документ должен иметь соответствующий тип.")
+        publication = Publication.objects.create(**validated_data)
 
-        for document, doc_type in zip(uploaded_documents, uploaded_document_types):
-            publication_document = PublicationDocument.objects.create(
-                publication=publication,file=document,document_type=doc_type)
-            process_document_verification.delay(publication_document.id)
+        # Один INSERT на тип файлов; проверка документов и обработка медиа ставятся в очередь после коммита
+        images, videos, documents = add_publication_media(
+            publication, uploaded_images, uploaded_videos,
+            zip(uploaded_documents, uploaded_document_types), uploads)
+        print(f"Uploaded {len(images)} images, {len(videos)} videos, {len(documents)} documents")
 
         return publication
 
+    @media_atomic()
     def update(self, instance, validated_data):
         # Получаем текущего пользователя
         request_user = self.context['request'].user
@@ -257,19 +361,43 @@ class PublicationSerializer(serializers.ModelSerializer):
         if validated_data.pop('delete_all_videos', False):
             instance.videos.all().delete()
 
-        # Добавление новых изображений
-        uploaded_images = validated_data.pop('uploaded_images', [])
-        for image in uploaded_images:
-            PublicationImage.objects.create(publication=instance, image=image)
-
-        # Добавление новых видео
-        uploaded_videos = validated_data.pop('uploaded_videos', [])
-        for video in uploaded_videos:
-            PublicationVideo.objects.create(publication=instance, video=video)
+        # Добавление новых изображений, видео и файлов, загруженных частями
+        add_publication_media(instance, images=validated_data.pop('uploaded_images', []),
+                              videos=validated_data.pop('uploaded_videos', []),
+                              uploads=validated_data.pop('upload_ids', []))
 
         # Обновление остальных полей
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
         instance.save()
 
-        return instance
\ No newline at end of file
+        return instance
+
+UPLOAD_FORMAT_VALIDATORS = {
+    'image': validate_image_format,
+    'video': validate_video_format,
+    'document': validate_document_format,
+}
+
+
+class ResumableUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ResumableUpload
+        fields = ['id', 'kind', 'document_type', 'filename', 'size', 'offset', 'sha256', 'created_at', 'completed_at']
+        read_only_fields = ['id', 'offset', 'sha256', 'created_at', 'completed_at']
+
+    def validate_size(self, value):
+        if value > settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(
+                f"Размер файла не может превышать {settings.UPLOAD_MAX_SIZE / (1024 * 1024)} MB.")
+        return value
+
+    def validate(self, attrs):
+        # Формат проверяем до загрузки байтов, теми же валидаторами, что и поля моделей
+        try:
+            UPLOAD_FORMAT_VALIDATORS[attrs['kind']](File(None, name=attrs['filename']))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({"filename": e.messages})
+        if attrs['kind'] == 'document' and not attrs.get('document_type'):
+            raise serializers.ValidationError({"document_type": "Для документа нужно указать тип."})
+        return attrs
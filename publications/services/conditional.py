@@ -0,0 +1,97 @@
+import hashlib
+from datetime import datetime, time as dt_time, timezone as dt_timezone
+
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from comments.models import Comment
+from donations.models import Donation
+from publications.models import Publication, PublicationRanking, View
+from publications.services.feed_cache import feed_last_modified, feed_versions
+
+# Валидаторы для django.views.decorators.http.condition: ETag/Last-Modified считаются одним лёгким запросом,
+# и на If-None-Match / If-Modified-Since отвечаем 304 без сериализации.
+
+
+def start_of_today():
+    # days_remaining в ответах меняется раз в сутки
+    return datetime.combine(timezone.now().date(), dt_time.min, tzinfo=dt_timezone.utc)
+
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def latest(queryset, field):
+    return Subquery(queryset.filter(publication=OuterRef('pk')).order_by(f'-{field}').values(field)[:1])
+
+
+def publication_validators(request, pk):
+    """
+    (etag, last_modified) активной публикации: updated_at, счётчики, состав изображений и видео, данные автора
+    и время последнего пожертвования/комментария/просмотра. Для недоступных публикаций условный GET
+    не применяется. Копии изображений и постеры видео сдвигают updated_at (tasks.touch_publication).
+    """
+    if not hasattr(request, '_publication_validators'):
+        row = (
+            Publication.objects.filter(pk=pk, status='active')
+            .annotate(last_activity=Greatest(
+                'updated_at',
+                latest(Donation.objects, 'created_at'),
+                latest(Comment.objects, 'created_at'),
+                latest(View.objects, 'viewed_at'),
+            ))
+            .annotate(last_image=Max('images__id'), last_video=Max('videos__id'))
+            .values('updated_at', 'donated_total', 'donors_count', 'views_count', 'comments_count', 'last_activity',
+                    'last_image', 'last_video', 'author__first_name', 'author__last_name', 'author__email',
+                    'author__profile__avatar')
+            .first()
+        )
+        if row is None:
+            request._publication_validators = (None, None)
+        else:
+            today = start_of_today()
+            etag = make_etag(pk, row['updated_at'].isoformat(), row['donated_total'], row['donors_count'],
+                             row['views_count'], row['comments_count'], row['last_image'], row['last_video'],
+                             row['author__first_name'], row['author__last_name'], row['author__email'],
+                             row['author__profile__avatar'], today.date())
+            request._publication_validators = (etag, max(row['last_activity'], today))
+    return request._publication_validators
+
+
+def publication_etag(request, pk):
+    return publication_validators(request, pk)[0]
+
+
+def publication_last_modified(request, pk):
+    return publication_validators(request, pk)[1]
+
+
+def top_publications_refreshed_at(request):
+    if not hasattr(request, '_ranking_refreshed_at'):
+        request._ranking_refreshed_at = PublicationRanking.objects.aggregate(refreshed=Max('computed_at'))['refreshed']
+    return request._ranking_refreshed_at
+
+
+def top_publications_etag(request):
+    refreshed = top_publications_refreshed_at(request)
+    return make_etag('top', refreshed.isoformat(), start_of_today().date()) if refreshed else None
+
+
+def top_publications_last_modified(request):
+    refreshed = top_publications_refreshed_at(request)
+    return max(refreshed, start_of_today()) if refreshed else None
+
+
+def urgent_hour():
+    # Срочные — истекающие в ближайшие 2 дня: список сдвигается со временем, поэтому версия почасовая
+    return timezone.now().replace(minute=0, second=0, microsecond=0)
+
+
+def urgent_publications_etag(request):
+    return make_etag('urgent', *feed_versions(None), urgent_hour().isoformat())
+
+
+def urgent_publications_last_modified(request):
+    return max(feed_last_modified(), urgent_hour())
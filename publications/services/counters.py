@@ -0,0 +1,23 @@
+from django.db.models import Count, OuterRef, Subquery, Sum, Value, DecimalField, IntegerField
+from django.db.models.functions import Coalesce
+
+from comments.models import Comment
+from donations.models import Donation
+from publications.models import View
+
+
+def aggregate_subquery(queryset, aggregate, output_field):
+    subquery = queryset.filter(publication=OuterRef('pk')).order_by().values('publication')
+    return Coalesce(Subquery(subquery.annotate(value=aggregate).values('value')),
+                    Value(0, output_field=output_field))
+
+
+def actual_counters():
+    """Выражения, вычисляющие счётчики публикации заново из исходных таблиц."""
+    return {
+        'donated_total': aggregate_subquery(Donation.objects, Sum('donor_amount'),
+                                            DecimalField(max_digits=12, decimal_places=2)),
+        'donors_count': aggregate_subquery(Donation.objects, Count('donor', distinct=True), IntegerField()),
+        'views_count': aggregate_subquery(View.objects, Count('id'), IntegerField()),
+        'comments_count': aggregate_subquery(Comment.objects, Count('id'), IntegerField()),
+    }
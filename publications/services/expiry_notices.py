@@ -0,0 +1,48 @@
+from datetime import datetime, time as dt_time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification
+from notifications.utils import notify_users_bulk
+from publications.models import Publication, EXPIRY_NOTICE_TOMORROW, EXPIRY_NOTICE_TODAY
+
+# Этап -> текст уведомления; диапазон дат считается в notify_expiring_publications
+EXPIRY_NOTICES = {
+    EXPIRY_NOTICE_TOMORROW: "⏰ Ваша публикация скоро истекает",
+    EXPIRY_NOTICE_TODAY: "❗ Сегодня заканчивается срок вашей публикации",
+}
+
+
+def send_expiry_notices(stage, starts, ends):
+    """
+    Предупреждает авторов активных публикаций с expires_at в [starts, ends), которым этот этап ещё не отправлен.
+    Строки блокируются (SKIP LOCKED) и помечаются в той же транзакции: повторный или параллельный запуск
+    не продублирует уведомления.
+    """
+    with transaction.atomic():
+        publications = list(
+            Publication.objects
+            .filter(status='active', expires_at__gte=starts, expires_at__lt=ends, expiry_notice_stage__lt=stage)
+            .select_for_update(skip_locked=True)
+            .values_list('id', 'author_id', 'title')
+        )
+        if not publications:
+            return 0
+
+        notify_users_bulk([
+            Notification(recipient_id=author_id, verb=EXPIRY_NOTICES[stage], target=title, url=f"/post/{pk}")
+            for pk, author_id, title in publications
+        ])
+        Publication.objects.filter(pk__in=[pk for pk, _, _ in publications]).update(expiry_notice_stage=stage)
+    return len(publications)
+
+
+def notify_expiring_publications():
+    # Полуоткрытые диапазоны по expires_at вместо expires_at__date: работает индекс (status, expires_at)
+    today = timezone.make_aware(datetime.combine(timezone.localdate(), dt_time.min))
+    tomorrow = today + timedelta(days=1)
+    return {
+        'tomorrow': send_expiry_notices(EXPIRY_NOTICE_TOMORROW, tomorrow, tomorrow + timedelta(days=1)),
+        'today': send_expiry_notices(EXPIRY_NOTICE_TODAY, today, tomorrow),
+    }
@@ -0,0 +1,83 @@
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Версия ленты по категории; 'all' меняется при любом изменении и относится к ленте без фильтра категорий
+FEED_VERSION_KEY = 'publications:feed:version:{}'
+ALL_CATEGORIES = 'all'
+# Сколько держим блокировку single-flight и как часто ожидающие проверяют кэш
+FEED_LOCK_TIMEOUT = 10
+FEED_LOCK_POLL_INTERVAL = 0.05
+
+
+def feed_versions(categories):
+    """
+    Текущие версии нужных категорий. Версия — время последнего изменения в наносекундах;
+    отсутствующую (новую или вытесненную из Redis) создаём текущим временем, чтобы не совпасть со старыми записями.
+    """
+    keys = [FEED_VERSION_KEY.format(category) for category in sorted(categories or [ALL_CATEGORIES])]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def feed_last_modified(categories=None):
+    """Время последнего изменения ленты (для Last-Modified)."""
+    return datetime.fromtimestamp(max(feed_versions(categories)) / 1e9, tz=dt_timezone.utc)
+
+
+def bump_feed_version(*categories):
+    """Инвалидирует закэшированные ленты категорий (и общую ленту) после коммита транзакции."""
+    def bump():
+        version = time.time_ns()
+        cache.set_many({FEED_VERSION_KEY.format(category): version for category in {*categories, ALL_CATEGORIES}},
+                       None)
+
+    transaction.on_commit(bump)
+
+
+def feed_cache_key(request, categories):
+    """Ключ по нормализованным параметрам запроса: порядок и пустые значения не важны."""
+    params = sorted(
+        (name, value.strip()) for name, values in request.GET.lists() for value in values if value.strip()
+    )
+    digest = hashlib.sha1(f"{request.get_host()}?{urlencode(params)}".encode()).hexdigest()
+    return f"publications:feed:{'.'.join(map(str, feed_versions(categories)))}:{digest}"
+
+
+def cached_feed(key, build):
+    """
+    Возвращает данные из кэша; при промахе строит их один раз (single-flight):
+    остальные запросы ждут результат, а не идут в Postgres параллельно.
+    """
+    data = cache.get(key)
+    if data is not None:
+        return data
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, FEED_LOCK_TIMEOUT):
+        try:
+            data = build()
+            cache.set(key, data, settings.PUBLICATIONS_FEED_CACHE_TIMEOUT)
+            return data
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + FEED_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(FEED_LOCK_POLL_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if cache.get(lock_key) is None:
+            break
+    # Строящий запрос упал или завис — считаем сами
+    return build()
@@ -0,0 +1,62 @@
+import os
+from io import BytesIO
+
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Ширины производных изображений: карточка ленты, страница публикации, полноэкранный просмотр
+IMAGE_VARIANT_WIDTHS = {'card': 480, 'detail': 1080, 'fullscreen': 1920}
+IMAGE_VARIANTS_DIR = 'publications/images/variants'
+IMAGE_QUALITY = {'webp': 80, 'avif': 60}
+
+
+def variant_formats():
+    # AVIF есть не во всех сборках Pillow: добавляем его, только если кодировщик доступен
+    Image.init()
+    return ['webp'] + (['avif'] if 'AVIF' in Image.SAVE else [])
+
+
+def open_normalized(file):
+    """Открывает изображение, поворачивает по EXIF Orientation и приводит к RGB/RGBA без метаданных."""
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        return image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+
+def build_image_variants(publication_image):
+    """
+    Сохраняет WebP (и AVIF) копии оригинала под каждую ширину из IMAGE_VARIANT_WIDTHS, не увеличивая
+    маленькие изображения. Возвращает карту {формат: {ширина: имя файла в хранилище}}.
+    """
+    with publication_image.image.open('rb') as file:
+        original = open_normalized(file)
+
+    stem = os.path.splitext(os.path.basename(publication_image.image.name))[0]
+    widths = sorted({min(width, original.width) for width in IMAGE_VARIANT_WIDTHS.values()})
+    variants = {}
+    for width in widths:
+        resized = original if width == original.width else original.resize(
+            (width, round(original.height * width / original.width)), Image.LANCZOS)
+        for fmt in variant_formats():
+            buffer = BytesIO()
+            # Метаданные не передаём: EXIF (в том числе геолокация) в копии не попадает
+            resized.save(buffer, format=fmt.upper(), quality=IMAGE_QUALITY[fmt])
+            name = default_storage.save(f"{IMAGE_VARIANTS_DIR}/{stem}_{width}.{fmt}", ContentFile(buffer.getvalue()))
+            variants.setdefault(fmt, {})[str(width)] = name
+    return variants
+
+
+def delete_image_variants(variants):
+    for names in variants.values():
+        for name in names.values():
+            default_storage.delete(name)
+
+
+def image_srcset(variants, build_url):
+    """Карта {формат: "url 480w, url 1080w, ..."} для атрибута srcset."""
+    return {
+        fmt: ', '.join(f"{build_url(default_storage.url(name))} {width}w"
+                       for width, name in sorted(names.items(), key=lambda item: int(item[0])))
+        for fmt, names in variants.items()
+    }
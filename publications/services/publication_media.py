@@ -0,0 +1,162 @@
+import os
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+
+from celery import group, signature
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from publications.models import Publication, PublicationDocument, PublicationImage, PublicationVideo
+from publications.services.uploads import UploadedPartFile, discard_upload
+from publications.tasks import extract_video_metadata, finalize_publication, generate_image_variants
+
+# Задача проверки отправляется по имени: импорт verification.tasks тянет OpenCV, pdf2image и natasha в веб-процесс
+DOCUMENT_VERIFICATION_TASK = 'verification.tasks.process_document_verification'
+
+# Файлы, сохранённые в хранилище внутри текущего media_atomic(): пары (имя, временный файл загрузки или '')
+_stored_files = ContextVar('stored_media_files', default=None)
+
+
+@contextmanager
+def media_atomic():
+    """
+    transaction.atomic(), после отката которого файлы, положенные в хранилище add_publication_media, убираются:
+    строк, которые на них ссылаются, уже нет. Во вложенном блоке файлы после успеха передаются внешнему.
+    """
+    outer = _stored_files.get()
+    stored = []
+    token = _stored_files.set(stored)
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        remove_stored_files(stored)
+        raise
+    finally:
+        _stored_files.reset(token)
+    if outer is not None:
+        outer.extend(stored)
+
+
+def stored_files(images, videos, documents, sources):
+    """Файлы, уже записанные в хранилище (FieldFile сохраняется в pre_save, до INSERT), с их загрузками."""
+    files = ([(image, image.image) for image in images] + [(video, video.video) for video in videos]
+             + [(document, document.file) for document in documents])
+    return [(file.name, sources.get(id(instance), '')) for instance, file in files if file and file._committed]
+
+
+def remove_stored_files(stored):
+    """
+    Откат: файл загрузки FileSystemStorage переместил, а не скопировал — возвращаем его в UPLOAD_TEMP_DIR,
+    чтобы повтор finalize_publication его нашёл. Остальные файлы удаляются.
+    """
+    for name, temp_path in stored:
+        if temp_path and not os.path.exists(temp_path):
+            file_move_safe(default_storage.path(name), temp_path)
+        else:
+            default_storage.delete(name)
+
+
+def add_publication_media(publication, images=(), videos=(), documents=(), uploads=()):
+    """
+    Сохраняет файлы публикации одним INSERT (bulk_create) на тип вместо INSERT на каждый файл.
+    documents — пары (файл, тип документа), uploads — завершённые загрузки частями.
+    Вызывается внутри media_atomic(): при откате сохранённые файлы убираются, а обработка файлов и удаление
+    временных файлов загрузок выполняются только после коммита — повторная попытка найдёт загрузки на месте.
+    """
+    images = [PublicationImage(publication=publication, image=image) for image in images]
+    videos = [PublicationVideo(publication=publication, video=video) for video in videos]
+    documents = [PublicationDocument(publication=publication, file=file, document_type=document_type,
+                                     content_sha256=getattr(file, 'sha256', ''))
+                 for file, document_type in documents]
+
+    sources = {}  # id объекта -> временный файл загрузки, из которого сохраняется его файл
+    with ExitStack() as stack:
+        for upload in uploads:
+            content = stack.enter_context(UploadedPartFile(open(upload.temp_path, 'rb'), name=upload.filename))
+            if upload.kind == 'image':
+                instance = PublicationImage(publication=publication, image=content)
+                images.append(instance)
+            elif upload.kind == 'video':
+                instance = PublicationVideo(publication=publication, video=content)
+                videos.append(instance)
+            else:
+                instance = PublicationDocument(publication=publication, file=content,
+                                               document_type=upload.document_type, content_sha256=upload.sha256)
+                documents.append(instance)
+            sources[id(instance)] = upload.temp_path
+        # Файлы уходят в хранилище в pre_save полей, то есть внутри bulk_create
+        try:
+            images = PublicationImage.objects.bulk_create(images)
+            videos = PublicationVideo.objects.bulk_create(videos)
+            documents = PublicationDocument.objects.bulk_create(documents)
+        finally:
+            stored = _stored_files.get()
+            if stored is not None:
+                stored.extend(stored_files(images, videos, documents, sources))
+
+    def discard_uploads():
+        for upload in uploads:
+            discard_upload(upload)
+
+    transaction.on_commit(discard_uploads)
+    dispatch_media_processing(images, videos, documents)
+    return images, videos, documents
+
+
+def finalize_publication_media(publication, uploads, status):
+    """
+    Фоновая часть асинхронного создания: сохраняет файлы публикации и переводит её из processing в status.
+    Строка публикации блокируется: повторная (восстановленная) задача для уже готовой публикации вернёт None.
+    """
+    with media_atomic():
+        if not Publication.objects.filter(pk=publication.pk, status='processing').select_for_update().exists():
+            return None
+        media = add_publication_media(publication, uploads=uploads)
+        publication.status = status
+        publication.save(update_fields=['status', 'updated_at'])
+    return media
+
+
+def recover_stuck_publications(timeout_minutes, give_up_hours):
+    """
+    Публикации, застрявшие в processing дольше timeout_minutes (задача упала после всех повторов, очередь
+    не работала), снова ставятся в finalize_publication со своими загрузками и статусом pending — дальше
+    их ведёт проверка документов. Старше give_up_hours — отклоняются, загрузки удаляются.
+    Возвращает (переотправленные, отклонённые публикации).
+    """
+    now = timezone.now()
+    stuck = Publication.objects.filter(status='processing', updated_at__lte=now - timedelta(minutes=timeout_minutes))
+    requeued, failed = [], []
+    for publication in stuck.select_related('author').prefetch_related('pending_uploads'):
+        uploads = list(publication.pending_uploads.all())
+        if publication.created_at <= now - timedelta(hours=give_up_hours):
+            for upload in uploads:
+                discard_upload(upload)
+            publication.status = 'pending'
+            publication.verification_status = 'rejected'
+            publication.save(update_fields=['status', 'verification_status', 'updated_at'])
+            failed.append(publication)
+        else:
+            # updated_at сдвигаем, чтобы следующий проход не отправил задачу ещё раз, пока эта в очереди
+            Publication.objects.filter(pk=publication.pk).update(updated_at=now)
+            finalize_publication.delay(publication.id, [str(upload.pk) for upload in uploads], 'pending')
+            requeued.append(publication)
+    return requeued, failed
+
+
+def dispatch_media_processing(images, videos, documents):
+    """
+    bulk_create не отправляет post_save, поэтому задачи обработки ставим сами: копии изображений,
+    метаданные видео и проверку документов — одним group после коммита, когда строки уже видны воркерам.
+    """
+    signatures = (
+        [generate_image_variants.si(image.id) for image in images]
+        + [extract_video_metadata.si(video.id) for video in videos]
+        + [signature(DOCUMENT_VERIFICATION_TASK, args=(document.id,), immutable=True) for document in documents]
+    )
+    if signatures:
+        transaction.on_commit(lambda: group(signatures).apply_async())
@@ -0,0 +1,107 @@
+import numpy as np
+from scipy import sparse
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from donations.models import Donation
+from favorites.models import FavoritePublication
+from publications.models import Publication, PublicationRecommendation, View
+
+# Вес сигнала: пожертвование говорит об интересе больше, чем избранное, а избранное — больше просмотра
+INTERACTION_WEIGHTS = {'view': 1.0, 'favorite': 3.0, 'donation': 5.0}
+# Сколько пользователей скорим за раз: плотный блок chunk × активные публикации
+USER_CHUNK_SIZE = 500
+
+
+def interaction_matrix():
+    """
+    Разреженная матрица пользователь × публикация (CSR) и списки id для строк и столбцов.
+    Повторные взаимодействия суммируются и сглаживаются log1p.
+    """
+    sources = [
+        (View.objects.values_list('viewer_id', 'publication_id'), INTERACTION_WEIGHTS['view']),
+        (FavoritePublication.objects.values_list('user_id', 'publication_id'), INTERACTION_WEIGHTS['favorite']),
+        (Donation.objects.filter(donor__isnull=False).values_list('donor_id', 'publication_id'),
+         INTERACTION_WEIGHTS['donation']),
+    ]
+    user_index, item_index = {}, {}
+    rows, cols, weights = [], [], []
+    for queryset, weight in sources:
+        for user_id, publication_id in queryset.iterator(chunk_size=10000):
+            rows.append(user_index.setdefault(user_id, len(user_index)))
+            cols.append(item_index.setdefault(publication_id, len(item_index)))
+            weights.append(weight)
+
+    matrix = sparse.coo_matrix(
+        (np.array(weights, dtype=np.float32), (np.array(rows, dtype=np.int32), np.array(cols, dtype=np.int32))),
+        shape=(len(user_index), len(item_index)),
+    ).tocsr()  # дубликаты складываются при конвертации
+    matrix.data = np.log1p(matrix.data)
+    return matrix, list(user_index), list(item_index)
+
+
+def item_similarity(matrix):
+    """Косинусная близость публикаций по совместным взаимодействиям (разреженная, без диагонали)."""
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    norms[norms == 0] = 1
+    normalized = matrix @ sparse.diags(1 / norms)
+    similarity = (normalized.T @ normalized).tocsr()
+    similarity.setdiag(0)
+    similarity.eliminate_zeros()
+    return similarity
+
+
+def top_k(scores, k):
+    """Индексы k лучших положительных значений по убыванию."""
+    if not len(scores):
+        return []
+    candidates = np.argpartition(-scores, min(k, len(scores) - 1))[:k]
+    return [index for index in candidates[np.argsort(-scores[candidates])] if scores[index] > 0]
+
+
+def build_recommendations(top_k_size=None):
+    """
+    Пересчитывает PublicationRecommendation: top-K активных публикаций для каждого пользователя
+    с историей и общий список популярного (user=NULL). Возвращает число пользователей.
+    """
+    k = top_k_size or settings.RECOMMENDATIONS_TOP_K
+    now = timezone.now()
+    matrix, user_ids, item_ids = interaction_matrix()
+
+    # Рекомендуем только активные публикации, и не собственные публикации пользователя
+    active = dict(Publication.objects.filter(status='active').values_list('id', 'author_id'))
+    active_columns = np.array([index for index, item_id in enumerate(item_ids) if item_id in active], dtype=np.int32)
+    active_item_ids = [item_ids[index] for index in active_columns]
+    own_columns = {}
+    for column, item_id in enumerate(active_item_ids):
+        own_columns.setdefault(active[item_id], []).append(column)
+
+    rows = []
+    popularity = np.asarray(matrix[:, active_columns].sum(axis=0)).ravel() if len(active_columns) else np.array([])
+    for position, index in enumerate(top_k(popularity, k)):
+        rows.append(PublicationRecommendation(user_id=None, publication_id=active_item_ids[index],
+                                              score=float(popularity[index]), position=position, computed_at=now))
+
+    if len(active_columns):
+        similarity = item_similarity(matrix)[:, active_columns]
+        for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+            chunk = matrix[start:start + USER_CHUNK_SIZE]
+            scores = (chunk @ similarity).toarray()
+            # Уже просмотренное/поддержанное не рекомендуем повторно
+            seen = chunk[:, active_columns].toarray() > 0
+            scores[seen] = 0
+            for offset, user_scores in enumerate(scores):
+                user_id = user_ids[start + offset]
+                user_scores[own_columns.get(user_id, [])] = 0
+                for position, index in enumerate(top_k(user_scores, k)):
+                    rows.append(PublicationRecommendation(user_id=user_id, publication_id=active_item_ids[index],
+                                                          score=float(user_scores[index]), position=position,
+                                                          computed_at=now))
+
+    with transaction.atomic():
+        PublicationRecommendation.objects.all().delete()
+        PublicationRecommendation.objects.bulk_create(rows, batch_size=1000)
+
+    return len(user_ids)
@@ -0,0 +1,44 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+
+# Конфигурации полнотекстового поиска: для казахского словаря в PostgreSQL нет, поэтому 'simple'
+SEARCH_CONFIGS = ('russian', 'simple')
+
+
+def normalize_text(text):
+    return re.sub(r'[^\w\s]', '', text.lower())
+
+
+def build_search_query(search):
+    """
+    1-2 слова — ищем любое из слов (логика OR), 3+ слова — все слова фразы (логика AND).
+    """
+    words = search.split()
+    if len(words) <= 2:
+        queries = [SearchQuery(word, config=config) for word in words for config in SEARCH_CONFIGS]
+    else:
+        queries = [SearchQuery(search, config=config, search_type='websearch') for config in SEARCH_CONFIGS]
+    return reduce(or_, queries)
+
+
+def search_publications(queryset, search):
+    """
+    Фильтрует публикации по поисковому вектору (GIN) и триграммам заголовка (pg_trgm, опечатки),
+    для запросов из 1-2 слов — ещё и по началу email автора (индекс user_email_prefix_idx),
+    и аннотирует search_rank для сортировки по релевантности.
+    """
+    query = build_search_query(search)
+    condition = Q(search_vector=query) | Q(title__trigram_word_similar=search)
+    words = search.split()
+    if len(words) <= 2:
+        # Знаки из запроса уже удалены, поэтому ищем по имени до "@": ?search=aigerim -> aigerim@...
+        condition |= reduce(or_, (Q(author__email__istartswith=word) for word in words))
+
+    # ts_rank возвращает real: приводим к double precision, чтобы курсор сравнивался без потерь
+    rank = SearchRank(F('search_vector'), query) + TrigramWordSimilarity(search, 'title')
+    return queryset.filter(condition).annotate(search_rank=Cast(rank, FloatField()))
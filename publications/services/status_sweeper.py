@@ -0,0 +1,83 @@
+import time
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from publications.models import Publication, PublicationDocument, PublicationImage, PublicationVideo
+from publications.services.feed_cache import bump_feed_version
+
+ARCHIVE_RETENTION_DAYS = 90
+DELETE_BATCH_SIZE = 1000
+
+
+def timed(stats, step, run):
+    started = time.perf_counter()
+    stats[step] = {'rows': run(), 'ms': round((time.perf_counter() - started) * 1000, 1)}
+
+
+def media_files(ids):
+    """Оригиналы изображений, видео и документов публикаций: в базе на них ссылаются только удаляемые строки."""
+    return [
+        name
+        for model, field in ((PublicationImage, 'image'), (PublicationVideo, 'video'), (PublicationDocument, 'file'))
+        for name in model.objects.filter(publication_id__in=ids).exclude(**{field: ''}).values_list(field, flat=True)
+    ]
+
+
+def delete_media_files(names):
+    for name in names:
+        default_storage.delete(name)
+
+
+def delete_archived_batch(cutoff, batch_size):
+    """
+    Удаляет одну пачку архивных публикаций в короткой транзакции. QuerySet.delete() проходит каскад на любую
+    глубину (например, отпечатки документов) и отправляет post_delete: копии изображений и постеры видео
+    удаляют их обработчики, счётчики удаляемых публикаций обработчики не трогают. Оригиналы файлов удаляем
+    сами — после коммита.
+    """
+    with transaction.atomic():
+        ids = list(
+            Publication.objects.filter(is_archived=True, updated_at__lte=cutoff)
+            .select_for_update(skip_locked=True)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return 0
+        files = media_files(ids)
+        Publication.objects.filter(id__in=ids).delete()
+        transaction.on_commit(lambda: delete_media_files(files))
+    return len(ids)
+
+
+def delete_archived_publications(cutoff, batch_size):
+    deleted = 0
+    while True:
+        count = delete_archived_batch(cutoff, batch_size)
+        deleted += count
+        if count < batch_size:
+            return deleted
+
+
+def sweep_publication_statuses(retention_days=ARCHIVE_RETENTION_DAYS, batch_size=DELETE_BATCH_SIZE):
+    """
+    Ночная проверка статусов. Собранные публикации — successful, просроченные — expired (два UPDATE ... WHERE
+    по хранимым счётчикам), затем пачками удаляем архив старше retention_days.
+    Возвращает по каждому шагу число затронутых строк и время в мс.
+    """
+    now = timezone.now()
+    stats = {}
+    # updated_at ставим явно: от него отсчитывается срок хранения архива
+    timed(stats, 'successful', lambda: Publication.objects.filter(
+        status='active', donated_total__gte=F('amount')).update(status='successful', is_archived=True, updated_at=now))
+    timed(stats, 'expired', lambda: Publication.objects.filter(
+        status='active', expires_at__lte=now).update(status='expired', is_archived=True, updated_at=now))
+    if stats['successful']['rows'] or stats['expired']['rows']:
+        # update() не отправляет post_save: сбрасываем кэш лент явно
+        bump_feed_version(*[category for category, _ in Publication.CATEGORY_CHOICES])
+
+    timed(stats, 'deleted', lambda: delete_archived_publications(now - timedelta(days=retention_days), batch_size))
+    return stats
@@ -0,0 +1,158 @@
+import base64
+import binascii
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager, suppress
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.http import UnreadablePostError
+from django.utils import timezone
+
+from publications.models import ResumableUpload
+
+# Тело PATCH читаем и пишем кусками: в памяти воркера не больше CHUNK_READ_SIZE байт загрузки
+CHUNK_READ_SIZE = 64 * 1024
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class UploadBusy(Exception):
+    """Часть этой загрузки уже пишет другой запрос."""
+
+
+class UploadedPartFile(File):
+    """Готовый файл загрузки: FileSystemStorage перемещает его (file_move_safe), а не копирует."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def parse_checksum(header):
+    """Заголовок Upload-Checksum: "sha256 <base64>" -> hex-дайджест; ValueError для других алгоритмов."""
+    algorithm, _, value = header.strip().partition(' ')
+    if algorithm.lower() != 'sha256':
+        raise ValueError(f"Неподдерживаемый алгоритм контрольной суммы: {algorithm}")
+    try:
+        return base64.b64decode(value, validate=True).hex()
+    except binascii.Error:
+        raise ValueError("Контрольная сумма должна быть в base64")
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for data in iter(lambda: file.read(CHUNK_READ_SIZE), b''):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def start_upload(upload):
+    os.makedirs(os.path.dirname(upload.temp_path), exist_ok=True)
+    open(upload.temp_path, 'wb').close()
+
+
+@contextmanager
+def claim_upload(upload):
+    """
+    Занимает загрузку на время записи части: неблокирующий flock временного файла. Второй PATCH той же
+    загрузки получает UploadBusy. Блокировку снимает ОС, даже если воркер упал, а транзакция и соединение
+    с БД на время передачи не нужны.
+    """
+    with open(upload.temp_path, 'rb') as part:
+        try:
+            fcntl.flock(part, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadBusy
+        yield
+
+
+def write_chunk(upload, stream, length, checksum=None):
+    """
+    Дописывает часть с текущего offset. Оборванное соединение не страшно: сохраняем всё, что успело прийти,
+    клиент продолжит с нового offset (HEAD). checksum — sha256 части; при несовпадении часть отбрасывается.
+    Когда файл докачан, считаем sha256 всего файла и отмечаем загрузку завершённой.
+    Вызывается вне транзакции под claim_upload(); offset сдвигается условным UPDATE.
+    """
+    start = upload.offset
+    digest = hashlib.sha256()
+    remaining = length
+    with open(upload.temp_path, 'r+b') as part:
+        part.seek(upload.offset)
+        try:
+            while remaining:
+                data = stream.read(min(CHUNK_READ_SIZE, remaining))
+                if not data:
+                    break
+                part.write(data)
+                digest.update(data)
+                remaining -= len(data)
+        except (OSError, UnreadablePostError) as e:
+            print(f"⚠️ Загрузка {upload.id} прервана на {length - remaining} из {length} байт: {e}")
+
+        if checksum is not None and (remaining or digest.hexdigest() != checksum):
+            part.truncate(upload.offset)
+            raise ChecksumMismatch
+        part.truncate(upload.offset + length - remaining)
+
+    upload.offset = start + length - remaining
+    if upload.offset == upload.size:
+        upload.sha256 = file_sha256(upload.temp_path)
+        upload.completed_at = timezone.now()
+    # Offset сдвигаем, только если с момента проверки его никто не менял
+    advanced = ResumableUpload.objects.filter(pk=upload.pk, offset=start, completed_at__isnull=True).update(
+        offset=upload.offset, sha256=upload.sha256, completed_at=upload.completed_at)
+    if not advanced:
+        raise UploadBusy
+
+
+def discard_upload(upload):
+    with suppress(FileNotFoundError):
+        os.remove(upload.temp_path)
+    upload.delete()
+
+
+def stage_uploaded_file(owner, file, kind, document_type=''):
+    """
+    Переносит файл из multipart-запроса в UPLOAD_TEMP_DIR как завершённую загрузку, чтобы его дообработал
+    Celery. Временный файл Django перемещается, а не копируется; sha256 берём посчитанный при приёме
+    (HashingMixin), сами файл не перечитываем — запрос не ждёт.
+    """
+    upload = ResumableUpload(owner=owner, kind=kind, document_type=document_type, filename=file.name,
+                             size=file.size, offset=file.size, sha256=getattr(file, 'sha256', ''),
+                             completed_at=timezone.now())
+    os.makedirs(os.path.dirname(upload.temp_path), exist_ok=True)
+    if hasattr(file, 'temporary_file_path'):
+        file_move_safe(file.temporary_file_path(), upload.temp_path, allow_overwrite=True)
+    else:
+        with open(upload.temp_path, 'wb') as part:
+            for chunk in file.chunks():
+                part.write(chunk)
+    return upload
+
+
+def stage_uploaded_files(owner, images=(), videos=(), documents=()):
+    uploads = (
+        [stage_uploaded_file(owner, image, 'image') for image in images]
+        + [stage_uploaded_file(owner, video, 'video') for video in videos]
+        + [stage_uploaded_file(owner, file, 'document', document_type) for file, document_type in documents]
+    )
+    return ResumableUpload.objects.bulk_create(uploads)
+
+
+def purge_stale_uploads(max_age_hours):
+    """
+    Удаляет загрузки (и их файлы), созданные раньше max_age_hours назад и так и не прикреплённые.
+    Загрузки публикаций в processing не трогаем: их дообработает finalize_publication или recover_stuck_publications.
+    """
+    stale = (ResumableUpload.objects.filter(created_at__lt=timezone.now() - timedelta(hours=max_age_hours))
+             .exclude(publication__status='processing'))
+    count = 0
+    for upload in stale.iterator():
+        discard_upload(upload)
+        count += 1
+    return count
@@ -0,0 +1,83 @@
+import os
+import tempfile
+from contextlib import contextmanager
+from io import BytesIO
+
+import cv2
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+VIDEO_POSTERS_DIR = 'publications/videos/posters'
+POSTER_MAX_WIDTH = 1080
+# Кадр для постера: 10% длительности, но не позже 3 секунд (первый кадр часто чёрный)
+POSTER_POSITION = 0.1
+POSTER_MAX_SECONDS = 3
+
+
+@contextmanager
+def local_video_path(field_file):
+    """OpenCV читает только с диска: для нелокальных хранилищ копируем файл во временный."""
+    try:
+        path = field_file.path
+    except NotImplementedError:
+        path = None
+    if path:
+        yield path
+        return
+
+    suffix = os.path.splitext(field_file.name)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix) as tmp, field_file.open('rb') as source:
+        for chunk in source.chunks():
+            tmp.write(chunk)
+        tmp.flush()
+        yield tmp.name
+
+
+def poster_image(frame):
+    image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    image.thumbnail((POSTER_MAX_WIDTH, POSTER_MAX_WIDTH * 4))
+    buffer = BytesIO()
+    image.save(buffer, format='WEBP', quality=80)
+    return ContentFile(buffer.getvalue())
+
+
+def extract_video_metadata(publication_video):
+    """
+    Длительность (с), разрешение, битрейт (бит/с) и постер (WebP в хранилище) для PublicationVideo.
+    Возвращает словарь полей модели; то, что не удалось определить, — None.
+    """
+    with local_video_path(publication_video.video) as path:
+        capture = cv2.VideoCapture(path)
+        try:
+            if not capture.isOpened():
+                raise ValueError(f"OpenCV не смог открыть видео {publication_video.video.name}")
+
+            fps = capture.get(cv2.CAP_PROP_FPS)
+            frames = capture.get(cv2.CAP_PROP_FRAME_COUNT)
+            duration = frames / fps if fps and frames > 0 else None
+            width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)) or None
+            height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)) or None
+
+            if duration:
+                capture.set(cv2.CAP_PROP_POS_MSEC, min(duration * POSTER_POSITION, POSTER_MAX_SECONDS) * 1000)
+            ok, frame = capture.read()
+            if not ok:
+                # Позиционирование поддерживается не всеми контейнерами — берём первый кадр
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = capture.read()
+        finally:
+            capture.release()
+
+    poster = None
+    if ok:
+        stem = os.path.splitext(os.path.basename(publication_video.video.name))[0]
+        poster = default_storage.save(f"{VIDEO_POSTERS_DIR}/{stem}.webp", poster_image(frame))
+
+    return {
+        'poster': poster,
+        'duration': round(duration, 2) if duration else None,
+        'width': width,
+        'height': height,
+        'bitrate': int(publication_video.video.size * 8 / duration) if duration else None,
+    }
@@ -0,0 +1,168 @@
+import atexit
+import json
+import os
+import threading
+from collections import deque
+
+import redis
+from django.conf import settings
+from django.db import connection
+
+from accounts.models import User
+from profiles.models import Profile, ProfileView
+from publications.models import Publication, View
+from publications.services.counters import actual_counters
+
+# События просмотров копятся в списке Redis и пишутся в БД пачками задачей flush_view_events.
+# Если Redis недоступен (или не настроен), события копятся в памяти процесса и сбрасываются его фоновым потоком.
+VIEW_EVENTS_KEY = 'publications:view-events'
+PUBLICATION_VIEW = 'publication'
+PROFILE_VIEW = 'profile'
+FLUSH_BATCH_SIZE = 5000
+LOCAL_FLUSH_SIZE = 100
+LOCAL_FLUSH_SECONDS = 5
+LOCAL_BUFFER_LIMIT = 100000
+
+_local_events = deque(maxlen=LOCAL_BUFFER_LIMIT)
+_local_lock = threading.Lock()
+_local_flush_requested = threading.Event()
+_local_flusher_pid = None
+_redis = None
+
+
+def redis_client():
+    global _redis
+    if not settings.VIEW_EVENTS_REDIS_URL:
+        return None
+    if _redis is None:
+        _redis = redis.Redis.from_url(settings.VIEW_EVENTS_REDIS_URL, socket_connect_timeout=0.2, socket_timeout=0.5)
+    return _redis
+
+
+def record_view(kind, target_id, viewer_id):
+    """Ставит событие просмотра в очередь; запросов к БД на горячем пути нет."""
+    event = json.dumps([kind, target_id, viewer_id])
+    client = redis_client()
+    if client is not None:
+        try:
+            client.rpush(VIEW_EVENTS_KEY, event)
+            return
+        except redis.RedisError as e:
+            print(f"⚠️ Redis недоступен, просмотры буферизуются локально: {e}")
+
+    # Локальный буфер пишет в БД фоновый поток: по размеру пачки или раз в LOCAL_FLUSH_SECONDS, не запрос
+    _local_events.append(event)
+    ensure_local_flusher()
+    if len(_local_events) >= LOCAL_FLUSH_SIZE:
+        _local_flush_requested.set()
+
+
+def record_publication_view(publication_id, viewer_id):
+    record_view(PUBLICATION_VIEW, publication_id, viewer_id)
+
+
+def record_profile_view(profile_id, viewer_id):
+    record_view(PROFILE_VIEW, profile_id, viewer_id)
+
+
+def pop_redis_events(client, count):
+    # LRANGE + LTRIM в одной транзакции: конкурирующие воркеры не заберут одни и те же события
+    with client.pipeline(transaction=True) as pipe:
+        pipe.lrange(VIEW_EVENTS_KEY, 0, count - 1)
+        pipe.ltrim(VIEW_EVENTS_KEY, count, -1)
+        events, _ = pipe.execute()
+    return events
+
+
+def flush_local_events():
+    with _local_lock:
+        events = [_local_events.popleft() for _ in range(len(_local_events))]
+    try:
+        return write_events(events)
+    except Exception:
+        _local_events.extendleft(reversed(events))  # следующий сброс повторит запись
+        raise
+
+
+def local_flusher():
+    while True:
+        _local_flush_requested.wait(LOCAL_FLUSH_SECONDS)
+        _local_flush_requested.clear()
+        if not _local_events:
+            continue
+        try:
+            flush_local_events()
+        except Exception as e:
+            print(f"⚠️ Не удалось записать просмотры из локального буфера: {e}")
+        finally:
+            connection.close()  # соединение потока не держим между сбросами
+
+
+def ensure_local_flusher():
+    # Поток запускается при первом локальном событии; после fork (воркеры gunicorn) — заново в каждом процессе
+    global _local_flusher_pid
+    if _local_flusher_pid == os.getpid():
+        return
+    with _local_lock:
+        if _local_flusher_pid != os.getpid():
+            threading.Thread(target=local_flusher, name='view-events-flusher', daemon=True).start()
+            _local_flusher_pid = os.getpid()
+
+
+def write_events(events):
+    """
+    Пишет пачку событий: bulk_create(ignore_conflicts=True) по уникальным (publication, viewer) и
+    (profile, viewer), затем пересчитывает views_count затронутых публикаций одним UPDATE.
+    """
+    publication_views, profile_views = set(), set()
+    for event in events:
+        kind, target_id, viewer_id = json.loads(event)
+        (publication_views if kind == PUBLICATION_VIEW else profile_views).add((target_id, viewer_id))
+    if not publication_views and not profile_views:
+        return 0
+
+    # Цель или зритель могли быть удалены, пока событие ждало в очереди
+    viewer_ids = set(User.objects.filter(
+        pk__in={viewer for _, viewer in publication_views | profile_views}).values_list('pk', flat=True))
+    publication_ids = set(Publication.objects.filter(
+        pk__in={target for target, _ in publication_views}).values_list('pk', flat=True))
+    profile_ids = set(Profile.objects.filter(
+        pk__in={target for target, _ in profile_views}).values_list('pk', flat=True))
+
+    View.objects.bulk_create(
+        [View(publication_id=target, viewer_id=viewer) for target, viewer in publication_views
+         if target in publication_ids and viewer in viewer_ids],
+        ignore_conflicts=True,
+    )
+    ProfileView.objects.bulk_create(
+        [ProfileView(profile_id=target, viewer_id=viewer) for target, viewer in profile_views
+         if target in profile_ids and viewer in viewer_ids],
+        ignore_conflicts=True,
+    )
+    # bulk_create не отправляет post_save, поэтому счётчик пересчитываем из таблицы
+    if publication_ids:
+        Publication.objects.filter(pk__in=publication_ids).update(views_count=actual_counters()['views_count'])
+    return len(events)
+
+
+def flush_view_events(batch_size=FLUSH_BATCH_SIZE):
+    """Переносит накопленные события в БД. Возвращает число обработанных событий."""
+    flushed = flush_local_events()
+    client = redis_client()
+    if client is None:
+        return flushed
+    while True:
+        events = pop_redis_events(client, batch_size)
+        try:
+            flushed += write_events(events)
+        except Exception:
+            # Возвращаем пачку в очередь, следующий запуск задачи повторит запись
+            if events:
+                client.rpush(VIEW_EVENTS_KEY, *events)
+            raise
+        if len(events) < batch_size:
+            return flushed
+
+
+# Локальный буфер не должен теряться при штатной остановке процесса
+atexit.register(lambda: _local_events and flush_local_events())
@@ -0,0 +1,64 @@
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Publication, PublicationImage, PublicationVideo, View
+from .services.feed_cache import bump_feed_version
+from .services.images import delete_image_variants
+
+
+@receiver(post_save, sender=View)
+def increment_views_count(sender, instance, created, **kwargs):
+    if created:
+        Publication.adjust_counters(instance.publication_id, views_count=1)
+
+
+@receiver(post_delete, sender=View)
+def decrement_views_count(sender, instance, origin=None, **kwargs):
+    if Publication.deleted_with_publication(origin):
+        return
+    Publication.adjust_counters(instance.publication_id, views_count=-1)
+
+
+@receiver(pre_save, sender=Publication)
+def remember_previous_category(sender, instance, **kwargs):
+    # При смене категории публикация должна пропасть и из ленты старой категории
+    if instance.pk:
+        instance._previous_category = (
+            Publication.objects.filter(pk=instance.pk).values_list('category', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Publication)
+@receiver(post_delete, sender=Publication)
+def invalidate_publication_feed(sender, instance, **kwargs):
+    bump_feed_version(instance.category, *filter(None, [getattr(instance, '_previous_category', None)]))
+
+
+@receiver(post_save, sender=PublicationImage)
+def schedule_image_variants(sender, instance, created, **kwargs):
+    # Копии под разные ширины строятся в Celery, а не в запросе загрузки
+    if created:
+        from .tasks import generate_image_variants
+        transaction.on_commit(lambda: generate_image_variants.delay(instance.id))
+
+
+@receiver(post_delete, sender=PublicationImage)
+def remove_image_variants(sender, instance, **kwargs):
+    variants = instance.variants
+    if variants:
+        transaction.on_commit(lambda: delete_image_variants(variants))
+
+
+@receiver(post_save, sender=PublicationVideo)
+def schedule_video_metadata(sender, instance, created, **kwargs):
+    if created:
+        from .tasks import extract_video_metadata
+        transaction.on_commit(lambda: extract_video_metadata.delay(instance.id))
+
+
+@receiver(post_delete, sender=PublicationVideo)
+def remove_video_poster(sender, instance, **kwargs):
+    poster = instance.poster.name if instance.poster else None
+    if poster:
+        transaction.on_commit(lambda: default_storage.delete(poster))
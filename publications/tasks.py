@@ -1,72 +1,152 @@
 from celery import shared_task
-from .models import Publication
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import DatabaseError
 from django.utils import timezone
-from datetime import timedelta
+from notifications.utils import notify_user
+from .models import Publication, PublicationImage, PublicationVideo, ResumableUpload
+from .services.feed_cache import bump_feed_version
+from .services.expiry_notices import notify_expiring_publications as notify_expiring
+from .services.images import build_image_variants, delete_image_variants
+from .services.ranking import refresh_publication_ranking as refresh_ranking
+from .services.status_sweeper import sweep_publication_statuses
+from .services.uploads import discard_upload, purge_stale_uploads as purge_uploads
+from .services.view_events import flush_view_events as flush_views
+
+
+def touch_publication(publication_id):
+    """
+    Копии изображений и метаданные видео пишутся через update(): без post_save не меняются ни updated_at
+    публикации (ETag/Last-Modified детальной страницы), ни версия кэша лент. Сдвигаем их явно.
+    """
+    category = Publication.objects.filter(pk=publication_id).values_list('category', flat=True).first()
+    if category is not None:
+        Publication.objects.filter(pk=publication_id).update(updated_at=timezone.now())
+        bump_feed_version(category)
 
 
 @shared_task
 def check_publication_status():
     print("🕒 Циклическая задача запущена: проверка публикаций")
 
-    now = timezone.now()
-    three_months_ago = now - timedelta(days=90)
-    publications = Publication.objects.filter(status='active')
-    for pub in publications:
-        donated = pub.total_donated()
-        if donated >= pub.amount:
-            pub.status = 'successful'
-            pub.is_archived = True
-            pub.save()
-            print(f"[✓] {pub.title} marked as successful.")
-        elif pub.expires_at and pub.expires_at <= now:
-            pub.status = 'expired'
-            pub.is_archived = True
-            pub.save()
-            print(f"[⌛] {pub.title} expired and archived.")
-
-    # Удаляем публикации, которые были архивированы более 3 месяцев назад
-    old_archived = Publication.objects.filter(is_archived=True, updated_at__lte=three_months_ago)
-    count = old_archived.count()
-    old_archived.delete()
+    stats = sweep_publication_statuses()
+    print(f"[✓] Успешно завершено: {stats['successful']['rows']} ({stats['successful']['ms']} мс)")
+    print(f"[⌛] Истёк срок: {stats['expired']['rows']} ({stats['expired']['ms']} мс)")
+    print(f"[🗑] Удалено архивных публикаций старше 3 месяцев: {stats['deleted']['rows']} ({stats['deleted']['ms']} мс)")
+    return stats
+
+
+@shared_task
+def refresh_publication_ranking():
+    count = refresh_ranking()
+    print(f"[🏆] Рейтинг публикаций пересчитан: {count} публикаций.")
+
+
+@shared_task
+def build_publication_recommendations():
+    # numpy/scipy и OpenCV импортируются в задачах: модуль задач грузит и веб (сериализаторы, сигналы)
+    from .services.recommendations import build_recommendations
+
+    users = build_recommendations()
+    print(f"[🎯] Рекомендации пересчитаны для {users} пользователей.")
+
+
+@shared_task
+def generate_image_variants(image_id):
+    try:
+        image = PublicationImage.objects.get(id=image_id)
+    except PublicationImage.DoesNotExist:
+        return  # Изображение уже удалено
+
+    variants = build_image_variants(image)
+    # update(), а не save(): без повторного post_save и без гонки с удалением
+    if not PublicationImage.objects.filter(id=image_id).update(variants=variants):
+        delete_image_variants(variants)
+    else:
+        touch_publication(image.publication_id)
+    print(f"[🖼] Копии изображения {image_id}: {', '.join(variants)}")
+
+
+@shared_task
+def extract_video_metadata(video_id):
+    try:
+        video = PublicationVideo.objects.get(id=video_id)
+    except PublicationVideo.DoesNotExist:
+        return  # Видео уже удалено
+
+    from .services.videos import extract_video_metadata as extract_metadata
+
+    metadata = extract_metadata(video)
+    if not PublicationVideo.objects.filter(id=video_id).update(**metadata):
+        if metadata['poster']:
+            default_storage.delete(metadata['poster'])
+    else:
+        touch_publication(video.publication_id)
+    print(f"[🎬] Видео {video_id}: {metadata['width']}x{metadata['height']}, {metadata['duration']} с")
+
+
+@shared_task
+def flush_view_events():
+    count = flush_views()
     if count:
-        print(f"[🗑] Удалено {count} архивных публикаций старше 3 месяцев.")
+        print(f"[👁] Записано {count} событий просмотра.")
 
 
 @shared_task
 def notify_expiring_publications():
-    from django.utils import timezone
-    from datetime import timedelta
-    from publications.models import Publication
-    from notifications.utils import notify_user
-
-    now = timezone.now()
-    tomorrow = now + timedelta(days=1)
-    today = now.date()
-
-    # За день до истечения
-    almost_expired = Publication.objects.filter(
-        expires_at__date=tomorrow.date(),
-        status='active',
-    )
+    sent = notify_expiring()
+    if sent['tomorrow'] or sent['today']:
+        print(f"[⏰] Предупреждения об окончании: завтра — {sent['tomorrow']}, сегодня — {sent['today']}.")
+    return sent
 
-    for pub in almost_expired:
-        notify_user(
-            user=pub.author,
-            verb="⏰ Ваша публикация скоро истекает",
-            target=pub.title,
-            url=f"/post/{pub.id}"
-        )
 
-    # В день истечения
-    expiring_today = Publication.objects.filter(
-        expires_at__date=today,
-        status='active',
+@shared_task
+def purge_stale_uploads():
+    count = purge_uploads(settings.UPLOAD_EXPIRE_HOURS)
+    if count:
+        print(f"[🧹] Удалено незавершённых загрузок: {count}.")
+
+
+# Сбой базы или хранилища — повторяем с растущей паузой; acks_late: задача вернётся в очередь, если воркер умер.
+# Если повторы кончились, публикацию подберёт recover_stuck_publications
+@shared_task(autoretry_for=(DatabaseError, OSError), retry_backoff=True, max_retries=5, acks_late=True)
+def finalize_publication(publication_id, upload_ids, status):
+    # Импорт здесь: publication_media сам ставит задачи из этого модуля
+    from .services.publication_media import finalize_publication_media
+
+    uploads = list(ResumableUpload.objects.filter(pk__in=upload_ids))
+    publication = Publication.objects.select_related('author').filter(pk=publication_id).first()
+    if publication is None:
+        # Публикацию удалили, пока файлы ждали обработки
+        for upload in uploads:
+            discard_upload(upload)
+        return
+
+    media = finalize_publication_media(publication, uploads, status)
+    if media is None:
+        return  # уже обработана предыдущим запуском
+    images, videos, documents = media
+    notify_user(
+        user=publication.author,
+        verb="📤 Ваша публикация создана, файлы загружены",
+        target=f"Публикация: {publication.title}",
+        url=f"/publications/{publication.id}/"
     )
+    print(f"[📤] Публикация {publication_id}: {len(images)} изображений, {len(videos)} видео, "
+          f"{len(documents)} документов.")
+
+
+@shared_task
+def recover_stuck_publications():
+    from .services.publication_media import recover_stuck_publications as recover
 
-    for pub in expiring_today:
+    requeued, failed = recover(settings.PUBLICATION_PROCESSING_TIMEOUT_MINUTES, settings.UPLOAD_EXPIRE_HOURS)
+    for publication in failed:
         notify_user(
-            user=pub.author,
-            verb="❗ Сегодня заканчивается срок вашей публикации",
-            target=pub.title,
-            url=f"/post/{pub.id}"
+            user=publication.author,
+            verb="⚠️ Не удалось сохранить файлы публикации",
+            target=f"Публикация: {publication.title} — загрузите документы заново",
+            url=f"/publications/{publication.id}/"
         )
+    if requeued or failed:
+        print(f"[♻️] Застрявшие публикации: переотправлено {len(requeued)}, отклонено {len(failed)}.")
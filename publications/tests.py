@@ -1,3 +1,1009 @@
-from django.test import TestCase
+from decimal import Decimal
 
-# Create your tests here.
+import pytest
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from comments.models import Comment
+from donations.models import Donation
+from publications.models import Publication, PublicationImage, View
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                    password='secret123')
+
+
+def make_publication(author, **kwargs):
+    data = {
+        'author': author,
+        'title': 'Сбор на лечение',
+        'category': 'medicine',
+        'description': 'Нужна помощь',
+        'bank_details': '4400430012345678',
+        'amount': 100000,
+        'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz',
+        'contact_phone': '+77011234567',
+    }
+    data.update(kwargs)
+    return Publication.objects.create(**data)
+
+
+# ------------------------
+# 🔍 Keyset-пагинация ленты
+# ------------------------
+def test_publication_list_cursor_pagination(author):
+    publications = [make_publication(author, title=f'Публикация {i}') for i in range(5)]
+    expected = [p.id for p in sorted(publications, key=lambda p: (p.created_at, p.id), reverse=True)]
+    client = APIClient()
+
+    seen = []
+    url = '/publications/?page_size=2'
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        assert 'count' not in response.data
+        pages.append(response.data)
+        seen.extend(item['id'] for item in response.data['results'])
+        url = response.data['next']
+
+    assert seen == expected
+    assert pages[0]['previous'] is None
+
+    previous = client.get(pages[-1]['previous'])
+    assert [item['id'] for item in previous.data['results']] == expected[2:4]
+
+
+def test_publication_list_count_and_invalid_cursor(author):
+    for i in range(3):
+        make_publication(author, title=f'Публикация {i}')
+    client = APIClient()
+
+    response = client.get('/publications/?page_size=2&count=true')
+    assert response.data['count'] == 3
+    assert 'count=' not in response.data['next']
+
+    assert client.get('/publications/?cursor=garbage').status_code == 404
+
+
+def test_publication_list_returns_cards(author):
+    publication = make_publication(author)
+    client = APIClient()
+
+    card = client.get('/publications/').data['results'][0]
+    assert card['author'] == {'id': author.id, 'name': 'Айгерим Серикова', 'avatar': None}
+    assert card['cover_image'] is None
+    assert 'views' not in card and 'documents' not in card and 'donations' not in card
+
+    detail = client.get(f'/publications/{publication.id}/').data
+    assert 'documents' in detail and 'donations' in detail
+
+
+# ------------------------
+# 🔍 Бюджет запросов (N+1)
+# ------------------------
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(context.captured_queries)
+
+
+def test_publication_list_query_budget_is_constant(author):
+    client = APIClient()
+    client.force_authenticate(author)  # лента анонимов кэшируется, бюджет меряем на построении из БД
+    for i in range(5):
+        publication = make_publication(author, title=f'Публикация {i}')
+        PublicationImage.objects.create(publication=publication, image=f'publications/images/{i}.jpg')
+    few = count_queries(client, '/publications/?page_size=50')
+
+    for i in range(45):
+        publication = make_publication(author, title=f'Ещё публикация {i}')
+        PublicationImage.objects.create(publication=publication, image=f'publications/images/more_{i}.jpg')
+    many = count_queries(client, '/publications/?page_size=50')
+
+    # Страница + prefetch изображений; автор и профиль приходят через JOIN
+    assert few == many == 2
+
+
+def test_publication_detail_query_budget_is_constant(author):
+    client = APIClient()
+    publication = make_publication(author)
+    donors = [
+        User.objects.create_user(email=f'donor{i}@demeu.kz', first_name='Донор', last_name=str(i), password='secret123')
+        for i in range(10)
+    ]
+
+    Donation.objects.create(publication=publication, donor=donors[0], donor_amount=100)
+    View.objects.create(publication=publication, viewer=donors[0])
+    few = count_queries(client, f'/publications/{publication.id}/')
+
+    for donor in donors[1:]:
+        Donation.objects.create(publication=publication, donor=donor, donor_amount=100)
+        View.objects.create(publication=publication, viewer=donor)
+        PublicationImage.objects.create(publication=publication, image=f'publications/images/{donor.id}.jpg')
+    many = count_queries(client, f'/publications/{publication.id}/')
+
+    # Валидаторы ETag/Last-Modified + публикация с автором и профилем + пять prefetch
+    # (изображения, видео, документы, просмотры, пожертвования)
+    assert few == many == 7
+
+
+# ------------------------
+# 🔍 Денормализованные счётчики
+# ------------------------
+def test_counters_follow_donations_views_and_comments(author):
+    publication = make_publication(author)
+    donor = User.objects.create_user(email='donor@demeu.kz', first_name='Ерлан', last_name='Ахметов',
+                                      password='secret123')
+
+    first = Donation.objects.create(publication=publication, donor=donor, donor_amount=1000)
+    Donation.objects.create(publication=publication, donor=donor, donor_amount=500)
+    View.objects.create(publication=publication, viewer=donor)
+    comment = Comment.objects.create(publication=publication, author=donor, content='Держитесь!')
+
+    publication.refresh_from_db()
+    assert publication.donated_total == Decimal('1500')
+    assert publication.donors_count == 1
+    assert publication.views_count == 1
+    assert publication.comments_count == 1
+
+    first.delete()
+    comment.delete()
+    publication.refresh_from_db()
+    assert publication.donated_total == Decimal('500')
+    assert publication.donors_count == 1
+    assert publication.comments_count == 0
+
+    # Несколько пожертвований одного донора, удалённые одним запросом, уменьшают число доноров один раз
+    other = User.objects.create_user(email='other@demeu.kz', first_name='Дана', last_name='Омарова',
+                                     password='secret123')
+    Donation.objects.create(publication=publication, donor=donor, donor_amount=700)
+    Donation.objects.create(publication=publication, donor=other, donor_amount=500)
+    Donation.objects.filter(donor=donor).delete()
+    publication.refresh_from_db()
+    assert publication.donated_total == Decimal('500')
+    assert publication.donors_count == 1
+
+    # Сбор закрывается по хранимому donated_total, без агрегата по пожертвованиям
+    with CaptureQueriesContext(connection) as queries:
+        Donation.objects.create(publication=publication, donor=donor, donor_amount=99500)
+    assert not any('SUM(' in query['sql'] and 'GROUP BY' not in query['sql'] for query in queries.captured_queries)
+    publication.refresh_from_db()
+    assert publication.status == 'successful'
+
+    # Каскад удаления публикации не пересчитывает её счётчики построчно
+    for _ in range(3):
+        Comment.objects.create(publication=publication, author=donor, content='Спасибо')
+    with CaptureQueriesContext(connection) as queries:
+        publication.delete()
+    assert not any(query['sql'].startswith('UPDATE "publications_publication"') for query in queries.captured_queries)
+
+
+def test_stale_instance_save_keeps_counters(author):
+    publication = make_publication(author)
+    View.objects.create(publication=publication, viewer=author)
+
+    publication.title = 'Новый заголовок'
+    publication.save()
+
+    publication.refresh_from_db()
+    assert publication.views_count == 1
+
+
+def test_rebuild_publication_counters(author):
+    publication = make_publication(author)
+    View.objects.create(publication=publication, viewer=author)
+    Publication.objects.filter(pk=publication.pk).update(views_count=42, donated_total=10)
+
+    with pytest.raises(CommandError):
+        call_command('rebuild_publication_counters', '--check')
+
+    call_command('rebuild_publication_counters')
+    publication.refresh_from_db()
+    assert publication.views_count == 1
+    assert publication.donated_total == 0
+    call_command('rebuild_publication_counters', '--check')
+
+
+# ------------------------
+# 🔍 Полнотекстовый поиск
+# ------------------------
+def test_publication_search_ranks_and_tolerates_typos(author):
+    title_match = make_publication(author, title='Лечение ребёнка', description='Сбор средств')
+    description_match = make_publication(author, title='Сбор средств', description='Нужно лечение после операции')
+    make_publication(author, title='Приют для собак', description='Корм и вакцины')
+    client = APIClient()
+
+    results = client.get('/publications/?search=лечение').data['results']
+    assert [item['id'] for item in results] == [title_match.id, description_match.id]
+
+    typo = client.get('/publications/?search=леченее').data['results']
+    assert title_match.id in [item['id'] for item in typo]
+
+    # Запрос из 1-2 слов находит публикации по началу email автора
+    by_email = client.get('/publications/?search=Author').data['results']
+    assert len(by_email) == 3
+    assert client.get('/publications/?search=demeu').data['results'] == []
+
+
+# ------------------------
+# 🔍 Материализованный рейтинг
+# ------------------------
+def test_top_publications_reads_materialized_ranking(author):
+    from publications.tasks import refresh_publication_ranking
+
+    popular = make_publication(author, title='Популярная')
+    quiet = make_publication(author, title='Тихая')
+    make_publication(author, title='Без активности')
+    Publication.objects.filter(pk=popular.pk).update(views_count=100, donated_total=5000)
+    Publication.objects.filter(pk=quiet.pk).update(views_count=1)
+    client = APIClient()
+
+    assert client.get('/publications/top-publications/').data == []
+
+    refresh_publication_ranking()
+    with CaptureQueriesContext(connection) as context:
+        response = client.get('/publications/top-publications/')
+    assert [item['id'] for item in response.data] == [popular.id, quiet.id]
+    # Время пересчёта для ETag + топ-10 по индексу + prefetch изображений
+    assert len(context.captured_queries) == 3
+
+
+# ------------------------
+# 🔍 Предрассчитанные рекомендации
+# ------------------------
+def test_recommendations_from_co_occurrence_with_popular_fallback(author):
+    from favorites.models import FavoritePublication
+    from publications.tasks import build_publication_recommendations
+
+    medicine, school, shelter = (make_publication(author, title=title) for title in ('Лечение', 'Школа', 'Приют'))
+    users = [
+        User.objects.create_user(email=f'user{i}@demeu.kz', first_name='Пользователь', last_name=str(i),
+                                 password='secret123')
+        for i in range(4)
+    ]
+    # Кто поддержал лечение, тот смотрел и школу; приют смотрят отдельно
+    for user in users[:2]:
+        Donation.objects.create(publication=medicine, donor=user, donor_amount=100)
+        View.objects.create(publication=school, viewer=user)
+    FavoritePublication.objects.create(user=users[2], publication=shelter)
+    View.objects.create(publication=shelter, viewer=users[2])
+    View.objects.create(publication=medicine, viewer=users[3])
+    newcomer = User.objects.create_user(email='new@demeu.kz', first_name='Новый', last_name='Пользователь',
+                                        password='secret123')
+
+    build_publication_recommendations()
+    client = APIClient()
+
+    client.force_authenticate(users[3])
+    assert [item['id'] for item in client.get('/publications/recommended/').data] == [school.id]
+
+    client.force_authenticate(newcomer)
+    assert [item['id'] for item in client.get('/publications/recommended/').data] == [medicine.id, shelter.id,
+                                                                                      school.id]
+
+
+# ------------------------
+# 🔍 Кэш анонимной ленты
+# ------------------------
+def test_anonymous_feed_is_cached_and_invalidated_by_category(author, django_capture_on_commit_callbacks):
+    medicine = make_publication(author, title='Лечение', category='medicine')
+    make_publication(author, title='Приют', category='animals')
+    donor = User.objects.create_user(email='donor@demeu.kz', first_name='Ерлан', last_name='Ахметов',
+                                     password='secret123')
+    client = APIClient()
+
+    client.get('/publications/?category=medicine&page_size=5')
+    client.get('/publications/?category=animals')
+    # Тот же набор параметров в другом порядке — попадание в кэш без запросов к БД
+    assert count_queries(client, '/publications/?page_size=5&category=medicine') == 0
+    assert count_queries(client, '/publications/?category=animals') == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Donation.objects.create(publication=medicine, donor=donor, donor_amount=1000)
+
+    response = client.get('/publications/?category=medicine&page_size=5')
+    assert response.data['results'][0]['total_donated'] == '1000.00'
+    assert count_queries(client, '/publications/?category=animals') == 0
+    assert count_queries(client, '/publications/') > 0
+
+
+def test_feed_cache_single_flight_waits_for_builder():
+    import threading
+    from django.core.cache import cache
+    from publications.services.feed_cache import cached_feed
+
+    # Другой запрос уже строит ответ: ждём его результат, а не идём в БД сами
+    cache.add('feed-key:lock', 1)
+    threading.Timer(0.2, cache.set, args=('feed-key', {'results': []})).start()
+    assert cached_feed('feed-key', lambda: pytest.fail('should not rebuild')) == {'results': []}
+
+
+# ------------------------
+# 🔍 Условный GET (ETag / Last-Modified)
+# ------------------------
+def test_publication_detail_conditional_get(author, monkeypatch):
+    import json
+
+    from publications import tasks
+    from publications.services import view_events
+
+    publication = make_publication(author)
+    client = APIClient()
+    url = f'/publications/{publication.id}/'
+
+    response = client.get(url)
+    etag, last_modified = response['ETag'], response['Last-Modified']
+
+    with CaptureQueriesContext(connection) as context:
+        not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304
+    assert len(context.captured_queries) == 1
+    assert client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code == 304
+
+    Donation.objects.create(publication=publication, donor_amount=500)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+
+    # Копии изображения пишутся через update() в задаче — ответ всё равно меняется
+    image = PublicationImage.objects.create(publication=publication, image='publications/images/a.png')
+    etag = client.get(url)['ETag']
+    monkeypatch.setattr(tasks, 'build_image_variants', lambda image: {'webp': {'320': 'variants/a-320.webp'}})
+    tasks.generate_image_variants(image.id)
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    etag = response['ETag']
+
+    User.objects.filter(pk=author.pk).update(first_name='Айгуль')
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+    # Повторный просмотр с If-None-Match (304) тоже засчитывается
+    viewer = User.objects.create_user(email='viewer@demeu.kz', first_name='Ерлан', last_name='Ахметов',
+                                      password='secret123')
+    client.force_authenticate(viewer)
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    events = [json.loads(event) for event in view_events._local_events]
+    assert events == [['publication', publication.id, viewer.id]] * 2
+    view_events.flush_view_events()
+    publication.refresh_from_db()
+    assert publication.views_count == 1
+
+
+def test_top_publications_conditional_get(author):
+    from publications.tasks import refresh_publication_ranking
+
+    publication = make_publication(author)
+    Publication.objects.filter(pk=publication.pk).update(views_count=10)
+    client = APIClient()
+    assert 'ETag' not in client.get('/publications/top-publications/')
+
+    refresh_publication_ranking()
+    etag = client.get('/publications/top-publications/')['ETag']
+    assert client.get('/publications/top-publications/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    refresh_publication_ranking()
+    assert client.get('/publications/top-publications/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+# ------------------------
+# 🔍 Write-behind просмотров
+# ------------------------
+def test_views_are_buffered_and_flushed_in_bulk(author):
+    from profiles.models import ProfileView
+    from publications.tasks import flush_view_events
+
+    publication = make_publication(author)
+    viewer = User.objects.create_user(email='viewer@demeu.kz', first_name='Ерлан', last_name='Ахметов',
+                                      password='secret123')
+    client = APIClient()
+    client.force_authenticate(viewer)
+
+    for _ in range(3):
+        with CaptureQueriesContext(connection) as context:
+            client.get(f'/publications/{publication.id}/')
+            client.get(f'/profiles/{author.id}/')
+        assert not [q for q in context.captured_queries if q['sql'].startswith(('INSERT', 'UPDATE'))]
+    assert not View.objects.exists()
+
+    flush_view_events()
+    assert View.objects.filter(publication=publication, viewer=viewer).count() == 1
+    assert ProfileView.objects.filter(profile=author.profile, viewer=viewer).count() == 1
+    publication.refresh_from_db()
+    assert publication.views_count == 1
+
+
+@pytest.mark.django_db(transaction=True)
+def test_local_view_buffer_is_flushed_by_background_thread(monkeypatch):
+    import time
+
+    from publications.services import view_events
+
+    monkeypatch.undo()  # настоящий ensure_local_flusher вместо заглушки из conftest
+    author = User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                      password='secret123')
+    publication = make_publication(author)
+    viewers = User.objects.bulk_create([User(email=f'viewer{i}@demeu.kz', first_name='Ерлан', last_name='Ахметов')
+                                        for i in range(view_events.LOCAL_FLUSH_SIZE)])
+
+    # Даже событие, заполнившее пачку, не пишет в БД в потоке запроса
+    with CaptureQueriesContext(connection) as context:
+        for viewer in viewers:
+            view_events.record_publication_view(publication.id, viewer.id)
+    assert context.captured_queries == []
+
+    deadline = time.monotonic() + 5
+    while View.objects.count() < len(viewers) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert View.objects.count() == len(viewers)
+    publication.refresh_from_db()
+    assert publication.views_count == len(viewers)
+
+
+# ------------------------
+# 🔍 Ночная проверка статусов
+# ------------------------
+def test_check_publication_status_sweeps_in_sets(author, settings, tmp_path, django_capture_on_commit_callbacks):
+    from datetime import timedelta
+    from django.core.files.base import ContentFile
+    from django.utils import timezone
+    from publications.models import PublicationVideo
+    from publications.tasks import check_publication_status
+
+    settings.MEDIA_ROOT = tmp_path
+
+    funded = make_publication(author, title='Собрано', amount=1000)
+    Publication.objects.filter(pk=funded.pk).update(donated_total=1000)
+    expired = make_publication(author, title='Истекла')
+    Publication.objects.filter(pk=expired.pk).update(expires_at=timezone.now() - timedelta(hours=1))
+    active = make_publication(author, title='Идёт сбор')
+    old = make_publication(author, title='Старый архив')
+    Comment.objects.create(publication=old, author=author, content='Спасибо!')
+    View.objects.create(publication=old, viewer=author)
+    image = PublicationImage(publication=old)
+    image.image.save('cover.png', ContentFile(b'png'), save=False)
+    variant = 'publications/images/variants/cover-320.webp'
+    (tmp_path / variant).parent.mkdir(parents=True)
+    (tmp_path / variant).write_bytes(b'webp')
+    image.variants = {'webp': {'320': variant}}
+    video = PublicationVideo(publication=old)
+    video.video.save('clip.mp4', ContentFile(b'mp4'), save=False)
+    video.poster.save('clip.jpg', ContentFile(b'jpg'), save=False)
+    PublicationImage.objects.bulk_create([image])
+    PublicationVideo.objects.bulk_create([video])
+    Publication.objects.filter(pk=old.pk).update(status='expired', is_archived=True,
+                                                 updated_at=timezone.now() - timedelta(days=91))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        stats = check_publication_status()
+
+    assert {step: stats[step]['rows'] for step in stats} == {'successful': 1, 'expired': 1, 'deleted': 1}
+    assert Publication.objects.get(pk=funded.pk).status == 'successful'
+    assert Publication.objects.get(pk=expired.pk).status == 'expired'
+    assert Publication.objects.get(pk=active.pk).status == 'active'
+    assert not Publication.objects.filter(pk=old.pk).exists()
+    assert not Comment.objects.filter(publication_id=old.pk).exists()
+    # Файлы удалённой публикации — оригиналы, копии и постер — тоже удалены
+    assert [path for path in tmp_path.rglob('*') if path.is_file()] == []
+
+
+# ------------------------
+# 🔍 Предупреждения об окончании срока
+# ------------------------
+def test_expiry_notices_are_bulk_and_sent_once(author, django_capture_on_commit_callbacks):
+    from datetime import datetime, time, timedelta
+    from django.utils import timezone
+    from notifications.models import Notification
+    from publications.tasks import notify_expiring_publications
+
+    midnight = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+    for title, expires_at in [('Завтра', midnight + timedelta(days=1, hours=10)),
+                              ('Сегодня', midnight + timedelta(hours=23, minutes=59)),
+                              ('Через неделю', midnight + timedelta(days=7))]:
+        publication = make_publication(author, title=title)
+        Publication.objects.filter(pk=publication.pk).update(expires_at=expires_at)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert notify_expiring_publications() == {'tomorrow': 1, 'today': 1}
+    assert notify_expiring_publications() == {'tomorrow': 0, 'today': 0}
+
+    assert sorted(Notification.objects.filter(recipient=author).values_list('target', flat=True)) == [
+        'Завтра', 'Сегодня']
+
+
+# ------------------------
+# 🔍 Адаптивные копии изображений
+# ------------------------
+def test_image_variants_are_oriented_stripped_and_exposed(author, settings, tmp_path):
+    from io import BytesIO
+    from PIL import Image
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from publications.tasks import generate_image_variants
+
+    settings.MEDIA_ROOT = tmp_path
+    # 2400x1200, но EXIF Orientation=6 (повернуть на 90°): фактически 1200x2400
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    buffer = BytesIO()
+    Image.new('RGB', (2400, 1200), 'red').save(buffer, format='JPEG', exif=exif)
+    publication = make_publication(author)
+    image = PublicationImage.objects.create(
+        publication=publication, image=SimpleUploadedFile('photo.jpg', buffer.getvalue(), content_type='image/jpeg'))
+
+    generate_image_variants(image.id)
+    image.refresh_from_db()
+
+    assert sorted(image.variants['webp'], key=int) == ['480', '1080', '1200']
+    with Image.open(tmp_path / image.variants['webp']['480']) as variant:
+        assert variant.size == (480, 960)
+        assert not variant.getexif()
+
+    card = APIClient().get('/publications/').data['results'][0]
+    assert card['cover_srcset']['webp'].endswith('_1200.webp 1200w')
+
+
+# ------------------------
+# 🔍 Постер и метаданные видео
+# ------------------------
+def test_video_metadata_and_poster(author, settings, tmp_path):
+    import cv2
+    import numpy as np
+    from django.core.files import File
+    from publications.models import PublicationVideo
+    from publications.tasks import extract_video_metadata
+
+    settings.MEDIA_ROOT = tmp_path
+    source = tmp_path / 'clip.mp4'
+    writer = cv2.VideoWriter(str(source), cv2.VideoWriter_fourcc(*'mp4v'), 10, (320, 240))
+    for i in range(30):
+        writer.write(np.full((240, 320, 3), i * 8, np.uint8))
+    writer.release()
+
+    with open(source, 'rb') as file:
+        video = PublicationVideo.objects.create(publication=make_publication(author), video=File(file, 'clip.mp4'))
+    extract_video_metadata(video.id)
+    video.refresh_from_db()
+
+    assert (video.width, video.height, video.duration) == (320, 240, 3.0)
+    assert video.bitrate == int(video.video.size * 8 / 3)
+    assert (tmp_path / video.poster.name).exists()
+
+    detail = APIClient().get(f'/publications/{video.publication_id}/').data
+    assert detail['videos'][0]['poster'].endswith('.webp')
+
+
+# ------------------------
+# 🔍 Отдача медиа: Range, кэш, доступ к документам
+# ------------------------
+def test_media_range_requests_and_cache_headers(settings, tmp_path, db):
+    settings.MEDIA_ROOT = tmp_path
+    (tmp_path / 'publications/videos').mkdir(parents=True)
+    (tmp_path / 'publications/videos/clip.mp4').write_bytes(bytes(range(256)) * 4)
+    client = APIClient()
+    url = '/media/publications/videos/clip.mp4'
+
+    full = client.get(url)
+    assert full.status_code == 200
+    assert full['Cache-Control'] == 'public, max-age=31536000, immutable'
+    assert full['Accept-Ranges'] == 'bytes'
+
+    partial = client.get(url, HTTP_RANGE='bytes=100-199')
+    assert partial.status_code == 206
+    assert partial['Content-Range'] == 'bytes 100-199/1024'
+    assert b''.join(partial.streaming_content) == bytes(range(100, 200))
+
+    tail = client.get(url, HTTP_RANGE='bytes=-24', HTTP_IF_RANGE=full['ETag'])
+    assert b''.join(tail.streaming_content) == bytes(range(232, 256))
+    # If-Range не совпал — файл изменился, отдаём целиком
+    assert client.get(url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code == 200
+
+    assert client.get(url, HTTP_RANGE='bytes=5000-').status_code == 416
+    assert client.get(url, HTTP_IF_NONE_MATCH=full['ETag']).status_code == 304
+    assert client.get('/media/../settings.py').status_code == 404
+
+
+def test_media_documents_only_for_author(author, settings, tmp_path):
+    from publications.models import PublicationDocument
+
+    settings.MEDIA_ROOT = tmp_path
+    publication = make_publication(author)
+    path = f'documents/publication_{publication.id}/identity/passport.pdf'
+    (tmp_path / path).parent.mkdir(parents=True)
+    (tmp_path / path).write_bytes(b'%PDF-1.4')
+    PublicationDocument.objects.bulk_create([PublicationDocument(publication=publication, document_type='identity',
+                                                                 file=path)])
+    stranger = User.objects.create_user(email='stranger@demeu.kz', first_name='Чужой', last_name='Пользователь',
+                                        password='secret123')
+    client = APIClient()
+
+    assert client.get(f'/media/{path}').status_code == 401
+    # Обходные формы пути нормализуются до проверки доступа
+    for alias in (f'x/../{path}', f'./{path}', f'publications/.././{path}'):
+        assert client.get(f'/media/{alias}').status_code == 401
+    client.force_authenticate(stranger)
+    assert client.get(f'/media/{path}').status_code == 403
+    client.force_authenticate(author)
+    response = client.get(f'/media/{path}')
+    assert response.status_code == 200
+    assert response['Cache-Control'] == 'private, no-cache'
+
+    settings.MEDIA_OFFLOAD = 'x-accel-redirect'
+    assert client.get(f'/media/{path}')['X-Accel-Redirect'] == f'/protected-media/{path}'
+
+
+# ------------------------
+# 🔍 Загрузка частями
+# ------------------------
+def test_resumable_upload_is_attached_to_publication(author, settings, tmp_path, media_dispatches, monkeypatch,
+                                                     django_capture_on_commit_callbacks):
+    import base64
+    import hashlib
+
+    from publications.models import ResumableUpload
+    from publications.services import uploads
+
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_TEMP_DIR = tmp_path / 'parts'
+    publication = make_publication(author)
+    client = APIClient()
+    client.force_authenticate(author)
+    payload = bytes(range(256)) * 40
+
+    assert client.post('/publications/uploads/', {'kind': 'video', 'filename': 'clip.avi', 'size': 10},
+                       format='json').status_code == 400
+    created = client.post('/publications/uploads/', {'kind': 'video', 'filename': 'clip.mp4', 'size': len(payload)},
+                          format='json')
+    assert created.status_code == 201
+    url = created['Location']
+
+    def patch(offset, data, **headers):
+        return client.generic('PATCH', url, data, content_type='application/offset+octet-stream',
+                              HTTP_UPLOAD_OFFSET=str(offset), **headers)
+
+    # Часть пишется вне транзакции: медленный клиент не держит блокировку строки и соединение
+    atomic_depth = []
+    write_chunk = uploads.write_chunk
+    monkeypatch.setattr(uploads, 'write_chunk', lambda *args: atomic_depth.append(len(connection.atomic_blocks))
+                        or write_chunk(*args))
+    baseline = len(connection.atomic_blocks)
+    assert patch(0, payload[:4000]).status_code == 200
+    assert atomic_depth == [baseline]
+    assert client.head(url)['Upload-Offset'] == '4000'
+    # Пока часть пишет другой запрос, следующая получает 409
+    with uploads.claim_upload(ResumableUpload.objects.get()):
+        busy = patch(4000, payload[4000:])
+    assert busy.status_code == 409 and client.head(url)['Upload-Offset'] == '4000'
+    # Клиент потерял ответ и повторяет старую часть — сервер сообщает настоящий offset
+    conflict = patch(0, payload[:4000])
+    assert conflict.status_code == 409 and conflict['Upload-Offset'] == '4000'
+    assert patch(4000, payload[4000:], HTTP_UPLOAD_CHECKSUM='sha256 AAAA').status_code == 460
+
+    checksum = base64.b64encode(hashlib.sha256(payload[4000:]).digest()).decode()
+    done = patch(4000, payload[4000:], HTTP_UPLOAD_CHECKSUM=f'sha256 {checksum}')
+    assert done.status_code == 200
+    assert done.data['sha256'] == hashlib.sha256(payload).hexdigest()
+    assert done.data['completed_at'] is not None
+
+    # Временный файл и строка загрузки удаляются после коммита
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.put(f'/publications/{publication.id}/', {'upload_ids': [done.data['id']]}, format='json')
+    assert response.status_code == 200
+    video = publication.videos.get()
+    assert video.video.read() == payload
+    assert not ResumableUpload.objects.exists()
+    assert not any((tmp_path / 'parts').iterdir())
+
+
+# ------------------------
+# 🔍 Создание публикации: одна транзакция, bulk_create, один group после коммита
+# ------------------------
+@pytest.fixture
+def media_dispatches(monkeypatch):
+    """Вместо отправки group в брокер запоминает имена задач каждой отправки."""
+    from publications.services import publication_media
+
+    dispatched = []
+
+    class RecordingGroup:
+        def __init__(self, signatures):
+            self.tasks = sorted(signature.task.rsplit('.', 1)[-1] for signature in signatures)
+
+        def apply_async(self):
+            dispatched.append(self.tasks)
+
+    monkeypatch.setattr(publication_media, 'group', RecordingGroup)
+    return dispatched
+
+
+def test_publication_create_is_atomic_and_dispatches_once(author, settings, tmp_path, monkeypatch, media_dispatches,
+                                                          django_capture_on_commit_callbacks):
+    from io import BytesIO
+
+    from PIL import Image
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from publications.services import publication_media
+
+    settings.MEDIA_ROOT = tmp_path
+    dispatched = media_dispatches
+
+    def storage_down(objs):
+        raise RuntimeError('storage down')
+
+    def image(name):
+        buffer = BytesIO()
+        Image.new('RGB', (8, 8), 'red').save(buffer, format='PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    client = APIClient()
+    client.force_authenticate(author)
+    data = {
+        'title': 'Сбор на операцию', 'category': 'medicine', 'description': 'Нужна помощь',
+        'bank_details': '4400430012345678', 'amount': 100000, 'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz', 'contact_phone': '+77011234567', 'duration_days': 14,
+        'uploaded_images': [image('a.png'), image('b.png')],
+        'uploaded_documents': [SimpleUploadedFile('passport.pdf', b'%PDF-1.4', content_type='application/pdf')],
+        'uploaded_document_types': ['identity'],
+    }
+    with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/publications/', data, format='multipart')
+        assert dispatched == []  # до коммита задачи не ставятся
+
+    assert response.status_code == 201
+    publication = Publication.objects.get(pk=response.data['id'])
+    assert publication.images.count() == 2 and publication.documents.count() == 1
+    image_inserts = [query for query in queries.captured_queries
+                     if query['sql'].startswith('INSERT INTO "publications_publicationimage"')]
+    assert len(image_inserts) == 1
+    assert dispatched == [['generate_image_variants', 'generate_image_variants', 'process_document_verification']]
+
+    # Ошибка посреди создания откатывает всю публикацию
+    monkeypatch.setattr(publication_media.PublicationDocument.objects, 'bulk_create', storage_down)
+    data.update(uploaded_images=[image('c.png')],
+                uploaded_documents=[SimpleUploadedFile('passport.pdf', b'%PDF-1.4')])
+    with pytest.raises(RuntimeError):
+        client.post('/publications/', data, format='multipart')
+    assert Publication.objects.count() == 1
+
+
+# ------------------------
+# 🔍 Асинхронное создание публикации (Prefer: respond-async)
+# ------------------------
+def test_async_publication_create_returns_202_and_finalizes_in_task(author, settings, tmp_path, monkeypatch,
+                                                                     media_dispatches,
+                                                                     django_capture_on_commit_callbacks):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    from notifications.models import Notification
+    from publications import serializers, tasks
+
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_TEMP_DIR = tmp_path / 'parts'
+    queued = []
+    monkeypatch.setattr(serializers.finalize_publication, 'delay', lambda *args: queued.append(args))
+
+    client = APIClient()
+    client.force_authenticate(author)
+    data = {
+        'title': 'Сбор на операцию', 'category': 'medicine', 'description': 'Нужна помощь',
+        'bank_details': '4400430012345678', 'amount': 100000, 'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz', 'contact_phone': '+77011234567', 'duration_days': 14,
+        'uploaded_videos': [SimpleUploadedFile('clip.mp4', b'\x00' * 4096, content_type='video/mp4')],
+        'uploaded_documents': [SimpleUploadedFile('passport.pdf', b'%PDF-1.4', content_type='application/pdf')],
+        'uploaded_document_types': ['identity'],
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/publications/', data, format='multipart', HTTP_PREFER='respond-async')
+
+    assert response.status_code == 202
+    assert response['Location'] == response.data['status_url']
+    publication = Publication.objects.get(pk=response.data['id'])
+    assert publication.status == 'processing'
+    assert not publication.videos.exists() and len(queued) == 1
+    assert client.get(response['Location']).data['videos'] == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.finalize_publication(*queued[0])
+
+    status = client.get(response['Location']).data
+    assert (status['status'], status['videos'], status['documents']) == ('active', 1, 1)
+    assert publication.videos.get().video.read() == b'\x00' * 4096
+    assert media_dispatches == [['extract_video_metadata', 'process_document_verification']]
+    assert Notification.objects.filter(recipient=author, url=f'/publications/{publication.id}/').exists()
+    assert not any((tmp_path / 'parts').iterdir())
+
+
+def test_stuck_processing_publication_keeps_uploads_and_is_requeued(author, settings, tmp_path, monkeypatch,
+                                                                     media_dispatches,
+                                                                     django_capture_on_commit_callbacks):
+    from datetime import timedelta
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.utils import timezone
+
+    from notifications.models import Notification
+    from publications import serializers, tasks
+    from publications.models import ResumableUpload
+    from publications.services.uploads import purge_stale_uploads
+
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_TEMP_DIR = tmp_path / 'parts'
+    queued = []
+    monkeypatch.setattr(serializers.finalize_publication, 'delay', lambda *args: queued.append(args))
+
+    client = APIClient()
+    client.force_authenticate(author)
+    data = {
+        'title': 'Сбор на операцию', 'category': 'medicine', 'description': 'Нужна помощь',
+        'bank_details': '4400430012345678', 'amount': 100000, 'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz', 'contact_phone': '+77011234567', 'duration_days': 14,
+        'uploaded_videos': [SimpleUploadedFile('clip.mp4', b'\x00' * 4096, content_type='video/mp4')],
+        'uploaded_documents': [SimpleUploadedFile('passport.pdf', b'%PDF-1.4', content_type='application/pdf')],
+        'uploaded_document_types': ['identity'],
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/publications/', data, format='multipart', HTTP_PREFER='respond-async')
+    publication = Publication.objects.get(pk=response.data['id'])
+
+    # Задача потерялась (очередь не работала): загрузки не удаляются по сроку, пока публикация в processing
+    queued.clear()
+    assert purge_stale_uploads(max_age_hours=0) == 0
+    assert publication.pending_uploads.count() == 2
+
+    tasks.recover_stuck_publications()
+    assert queued == []  # ещё не истёк PUBLICATION_PROCESSING_TIMEOUT_MINUTES
+    Publication.objects.filter(pk=publication.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+    tasks.recover_stuck_publications()
+    assert len(queued) == 1
+    tasks.recover_stuck_publications()
+    assert len(queued) == 1  # updated_at сдвинут — повторно не отправляется
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.finalize_publication(*queued[0])
+        tasks.finalize_publication(*queued[0])  # повторный запуск ничего не делает
+    publication.refresh_from_db()
+    assert publication.status == 'pending' and publication.videos.count() == 1
+    assert media_dispatches == [['extract_video_metadata', 'process_document_verification']]
+    assert not ResumableUpload.objects.exists()
+
+    # Публикация, которую не удалось обработать за UPLOAD_EXPIRE_HOURS, отклоняется, загрузки удаляются
+    queued.clear()
+    data['uploaded_videos'] = [SimpleUploadedFile('clip.mp4', b'\x00' * 4096, content_type='video/mp4')]
+    data['uploaded_documents'] = [SimpleUploadedFile('passport.pdf', b'%PDF-1.4', content_type='application/pdf')]
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post('/publications/', data, format='multipart', HTTP_PREFER='respond-async')
+    old = timezone.now() - timedelta(hours=settings.UPLOAD_EXPIRE_HOURS + 1)
+    Publication.objects.filter(pk=response.data['id']).update(created_at=old, updated_at=old)
+    queued.clear()
+    tasks.recover_stuck_publications()
+    stuck = Publication.objects.get(pk=response.data['id'])
+    assert queued == [] and (stuck.status, stuck.verification_status) == ('pending', 'rejected')
+    assert not ResumableUpload.objects.exists() and not any((tmp_path / 'parts').iterdir())
+    assert Notification.objects.filter(recipient=author, url=f'/publications/{stuck.id}/').exists()
+
+
+
+def test_failed_finalize_removes_stored_files_and_keeps_uploads(author, settings, tmp_path, monkeypatch,
+                                                                media_dispatches,
+                                                                django_capture_on_commit_callbacks):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from django.db import DatabaseError
+
+    from publications import serializers, tasks
+    from publications.models import PublicationDocument, ResumableUpload
+
+    settings.MEDIA_ROOT = tmp_path / 'media'
+    settings.UPLOAD_TEMP_DIR = tmp_path / 'parts'
+    queued = []
+    monkeypatch.setattr(serializers.finalize_publication, 'delay', lambda *args: queued.append(args))
+
+    client = APIClient()
+    client.force_authenticate(author)
+    data = {
+        'title': 'Сбор на операцию', 'category': 'medicine', 'description': 'Нужна помощь',
+        'bank_details': '4400430012345678', 'amount': 100000, 'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz', 'contact_phone': '+77011234567', 'duration_days': 14,
+        'uploaded_videos': [SimpleUploadedFile('clip.mp4', b'\x00' * 4096, content_type='video/mp4')],
+        'uploaded_documents': [SimpleUploadedFile('passport.pdf', b'%PDF-1.4', content_type='application/pdf')],
+        'uploaded_document_types': ['identity'],
+    }
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post('/publications/', data, format='multipart', HTTP_PREFER='respond-async')
+
+    # Видео уже в хранилище, INSERT документов падает: транзакция откатывается
+    def fail(*args, **kwargs):
+        raise DatabaseError('connection lost')
+
+    with monkeypatch.context() as patch, django_capture_on_commit_callbacks(execute=True), \
+            pytest.raises(DatabaseError):
+        patch.setattr(PublicationDocument.objects, 'bulk_create', fail)
+        tasks.finalize_publication(*queued[0])
+    stored = [path for path in (tmp_path / 'media').rglob('*') if path.is_file()]
+    assert stored == []
+    assert ResumableUpload.objects.count() == 2 and len(list((tmp_path / 'parts').rglob('*.part'))) == 2
+    assert Publication.objects.get(pk=queued[0][0]).status == 'processing'
+
+    # Повтор находит загрузки на месте
+    with django_capture_on_commit_callbacks(execute=True):
+        tasks.finalize_publication(*queued[0])
+    publication = Publication.objects.get(pk=queued[0][0])
+    assert publication.status == 'active' and publication.videos.get().video.read() == b'\x00' * 4096
+    assert not ResumableUpload.objects.exists()
+
+
+def test_processing_publications_are_listed_only_to_their_author(author):
+    other = User.objects.create_user(email='other@demeu.kz', first_name='Ерлан', last_name='Ахметов',
+                                     password='secret123')
+    own = make_publication(author, status='processing')
+    make_publication(other, status='processing')
+
+    assert APIClient().get('/publications/?status=processing').status_code == 403
+
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.get('/publications/?status=processing')
+    assert response.status_code == 200
+    assert [item['id'] for item in response.data['results']] == [own.id]
+
+
+# ------------------------
+# 🔍 Чтения с реплики (две БД: default и тестовое зеркало replica)
+# ------------------------
+@pytest.mark.django_db(transaction=True, databases=['default', 'replica'])
+def test_read_endpoints_use_replica_until_user_writes(settings):
+    from django.db import connections
+
+    settings.DB_REPLICAS = ['replica']
+    author = User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                      password='secret123')
+    publication = make_publication(author)
+    client = APIClient()
+    client.force_authenticate(author)
+
+    def queries_by_db(method, url, **kwargs):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = getattr(client, method)(url, **kwargs)
+        assert response.status_code < 400
+        return len(primary), len(replica)
+
+    primary, replica = queries_by_db('get', '/publications/?status=active')
+    assert replica > 0 and primary == 0
+    assert client.get('/publications/?status=active').data['results'][0]['id'] == publication.id
+    assert queries_by_db('get', f'/comments/publication/{publication.id}/comments/')[1] > 0
+
+    # Запись закрепляет пользователя за основной БД: свой комментарий он увидит сразу
+    primary, replica = queries_by_db('post', f'/comments/publication/{publication.id}/comments/', data={'content': 'Держитесь!'})
+    assert primary > 0 and replica == 0
+    primary, replica = queries_by_db('get', f'/comments/publication/{publication.id}/comments/')
+    assert primary > 0 and replica == 0
+
+    # Общий кэш анонимной ленты строится из основной БД, даже внутри @read_from_replica
+    client.force_authenticate(None)
+    primary, replica = queries_by_db('get', '/publications/')
+    assert primary > 0 and replica == 0
+
+
+# ------------------------
+# 🔍 Веб-процесс не загружает OpenCV, natasha и numpy
+# ------------------------
+def test_web_startup_does_not_import_ml_dependencies():
+    import subprocess
+    import sys
+
+    from django.conf import settings
+
+    code = ("import sys, django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns; "
+            "print(','.join(name for name in ('numpy', 'cv2', 'pdf2image', 'natasha') if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, cwd=settings.BASE_DIR)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == ''
@@ -0,0 +1,35 @@
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMixin:
+    """
+    Считает sha256 файла по мере чтения multipart-тела, без второго прохода по байтам.
+    Готовый файл получает атрибут sha256 — по нему проверка документов находит уже распознанный OCR.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # До super(): MemoryFileUploadHandler, забирая файл себе, выходит из new_file через StopFutureHandlers
+        self.digest = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        rest = super().receive_data_chunk(raw_data, start)
+        if rest is None:  # часть досталась этому обработчику, а не следующему
+            self.digest.update(raw_data)
+        return rest
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.digest.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingMixin, TemporaryFileUploadHandler):
+    pass
@@ -1,14 +1,18 @@
 from django.urls import path
-from .views import (publication_list, publication_detail, recommended_publications, top_publications,
-                    archived_publications, urgent_publications, active_publications, pending_publications)
+from .views import (publication_list, publication_detail, publication_status, recommended_publications, top_publications,
+                    archived_publications, urgent_publications, active_publications, pending_publications,
+                    create_upload, upload_detail)
 
 urlpatterns = [
     path('', publication_list, name='publication-list'),
     path('<int:pk>/', publication_detail, name='publication-detail'),
+    path('<int:pk>/status/', publication_status, name='publication-status'),
     path('top-publications/', top_publications, name='top-publications'),
     path('recommended/', recommended_publications, name='recommended-publications'),
     path('archive/', archived_publications, name='publication-archive'),
     path('urgent/', urgent_publications, name='urgent-publications'),
     path('my-active/', active_publications, name='my-active-publications'),
     path('my-pending/', pending_publications, name='my-pending-publications'),
+    path('uploads/', create_upload, name='upload-create'),
+    path('uploads/<uuid:upload_id>/', upload_detail, name='upload-detail'),
 ]
\ No newline at end of file
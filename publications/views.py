@@ -1,139 +1,192 @@
 import os
 import re
+from functools import wraps
 
+from django.conf import settings
+from django.db import OperationalError, transaction
+from django.urls import reverse
 from django.utils import timezone
+from django.views.decorators.http import condition
 from decimal import Decimal
 from django.db.models import Sum, Count, Q, F, FloatField, Avg
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Publication, View
-from donations.models import Donation
-from .serializers import PublicationSerializer
-
-
-
-def normalize_text(text):
-    return re.sub(r'[^\w\s]', '', text.lower())
+from demeu.db_router import read_from_replica, use_primary
+from .models import Publication, PublicationRecommendation, ResumableUpload
+from .serializers import PublicationSerializer, PublicationCardSerializer, ResumableUploadSerializer
+from .pagination import PublicationCursorPagination
+from .services import conditional, feed_cache, uploads, view_events
+from .services.search import normalize_text, search_publications
+
+
+
+# SQLSTATE 55P03 lock_not_available: строку держит другой запрос (select_for_update(nowait=True))
+LOCK_NOT_AVAILABLE = '55P03'
+
+# Параметры сортировки API -> хранимые поля публикации
+ORDERING_FIELDS = {
+    'created_at': 'created_at',
+    'total_views': 'views_count',
+    'total_donated': 'donated_total',
+    'relevance': 'search_rank',  # только вместе с ?search=
+}
+
+
+def requested_categories(request):
+    categories = request.GET.get('category')
+    if not categories:
+        return []
+    return [c.strip() for c in categories.split(',') if c.strip()]  # Разбиваем строку на список
+
+
+def publication_feed(request):
+    publications = PublicationCardSerializer.setup_eager_loading(Publication.objects.all())
+    search = normalize_text(request.GET.get('search', '').strip())  # Удаляем знаки
+    if search:
+        # Полнотекстовый поиск (GIN) + триграммы заголовка, с рангом релевантности
+        publications = search_publications(publications, search)
+
+    #Фильтрация по статусу(по умолчанию показываем только активные)
+    # Неактивные публикации (в том числе ещё не сохранившие файлы — processing) видит только автор
+    status_param = request.GET.get('status', 'active')
+    if status_param in ['expired', 'successful', 'pending', 'processing']:
+        if not request.user.is_authenticated:
+            return Response({"error": "Access denied."}, status=status.HTTP_403_FORBIDDEN)
+        publications = publications.filter(author=request.user, status=status_param)
+    else:
+        publications = publications.filter(status=status_param)
+
+    # Фильтрация по категории
+    category_list = requested_categories(request)
+    if category_list:
+        publications = publications.filter(category__in=category_list)
+
+
+    created_at_gte = request.GET.get('created_at__gte')
+    created_at_lte = request.GET.get('created_at__lte')
+    if created_at_gte and created_at_lte:
+        publications = publications.filter(created_at__gte=created_at_gte, created_at__lte=created_at_lte)
+
+    amount_gte = request.GET.get('amount__gte')
+    amount_lte = request.GET.get('amount__lte')
+    if amount_gte and amount_lte:
+        publications = publications.filter(amount__gte=amount_gte, amount__lte=amount_lte)
+
+    total_donated_gte = request.GET.get('total_donated__gte')
+    total_donated_lte = request.GET.get('total_donated__lte')
+    if total_donated_gte and total_donated_lte:
+        publications = publications.filter(donated_total__gte=total_donated_gte,
+                                           donated_total__lte=total_donated_lte)
+
+    #Сортировка
+    # По умолчанию сортируем по дате, при поиске — по релевантности
+    ordering = request.GET.get('ordering', '-relevance' if search else '-created_at')
+    field = ordering.lstrip('-')
+    if field not in ORDERING_FIELDS or (field == 'relevance' and not search):
+        ordering, field = '-created_at', 'created_at'
+    ordering = ('-' if ordering.startswith('-') else '') + ORDERING_FIELDS[field]
+
+    # print(f" SQL-запрос: {str(publications.query)}")  # Логируем SQL-запрос
+
+    # Keyset-пагинация: сортировка по (ordering, id), без OFFSET и без COUNT(*)
+    paginator = PublicationCursorPagination(ordering=ordering)
+    page = paginator.paginate_queryset(publications, request)
+    serializer = PublicationCardSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET', 'POST'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@read_from_replica
 def publication_list(request):
     if request.method == 'GET':
-        publications = Publication.objects.annotate(
-            total_donated=Sum('donations__donor_amount'),
-            total_views=Count('views'),
-            total_comments=Count('comments'),
-        )
-        search = request.GET.get('search', '').strip().lower()
-        if search:
-            search_words = search.split()  # Разбиваем строку на слова
-            # print(f"Поисковый запрос: {search_words}")  # Логируем введенные слова
-
-            if len(search_words) <= 2:
-                #Если 1-2 слова → ищем любое из слов (логика OR)
-                query = Q()
-                for word in search_words:
-                    word_normalized = normalize_text(word)  # Удаляем знаки
-                    query |= (
-                            Q(description__icontains=word_normalized) |
-                            Q(title__icontains=word_normalized) |
-                            Q(author__email__icontains=word_normalized)
-                    )
-                publications = publications.filter(query)
-            else:
-                #Если 3+ слова → ищем полное совпадение текста (логика AND)
-                normalized_search = normalize_text(search)
-                publications = publications.filter(
-                    Q(description__icontains=normalized_search) |
-                    Q(title__icontains=normalized_search) |
-                    Q(author__email__icontains=normalized_search)
-                )
-
-        #Фильтрация по статусу(по умолчанию показываем только активные)
-        status_param = request.GET.get('status', 'active')
-        if status_param in ['expired', 'successful', 'pending']:
-            if not request.user.is_authenticated:
-                return Response({"error": "Access denied."}, status=status.HTTP_403_FORBIDDEN)
-            publications = publications.filter(author=request.user, status=status_param)
-        else:
-            publications = publications.filter(status=status_param)
-
-        # Фильтрация по категории
-        categories = request.GET.get('category')
-        if categories:
-            category_list = [c.strip() for c in categories.split(',')]  # Разбиваем строку на список
-            publications = publications.filter(category__in=category_list)
-
-
-        created_at_gte = request.GET.get('created_at__gte')
-        created_at_lte = request.GET.get('created_at__lte')
-        if created_at_gte and created_at_lte:
-            publications = publications.filter(created_at__gte=created_at_gte, created_at__lte=created_at_lte)
-
-        amount_gte = request.GET.get('amount__gte')
-        amount_lte = request.GET.get('amount__lte')
-        if amount_gte and amount_lte:
-            publications = publications.filter(amount__gte=amount_gte, amount__lte=amount_lte)
-
-        total_donated_gte = request.GET.get('total_donated__gte')
-        total_donated_lte = request.GET.get('total_donated__lte')
-        if total_donated_gte and total_donated_lte:
-            publications = publications.filter(total_donated__gte=total_donated_gte,
-                                               total_donated__lte=total_donated_lte)
-
-        #Сортировка
-        ordering = request.GET.get('ordering', '-created_at')  # По умолчанию сортируем по дате
-        if ordering in ['created_at', '-created_at', 'total_views', '-total_views', 'total_donated', '-total_donated']:
-            publications = publications.order_by(ordering)
-
-        # print(f" SQL-запрос: {str(publications.query)}")  # Логируем SQL-запрос
-
-        serializer = PublicationSerializer(publications, many=True)
-        return Response(serializer.data)
+        # Анонимная лента активных публикаций одинакова для всех: отдаём из кэша с версией по категориям
+        if request.user.is_authenticated or request.GET.get('status', 'active') != 'active':
+            return publication_feed(request)
+        key = feed_cache.feed_cache_key(request, requested_categories(request))
+
+        def build():
+            # Запись кэша под новой версией живёт PUBLICATIONS_FEED_CACHE_TIMEOUT и отдаётся всем: строим её
+            # из основной БД — отстающая реплика закэшировала бы ленту без только что сделанной записи
+            with use_primary():
+                return publication_feed(request).data
+
+        return Response(feed_cache.cached_feed(key, build))
 
     elif request.method == 'POST':
-        # serializer = PublicationSerializer(data=request.data)
-        serializer = PublicationSerializer(data=request.data, context={'request': request})
+        # Prefer: respond-async — файлы сохраняет Celery, ответ 202 со ссылкой на статус
+        respond_async = 'respond-async' in request.headers.get('Prefer', '')
+        serializer = PublicationSerializer(data=request.data,
+                                           context={'request': request, 'defer_media': respond_async})
         if serializer.is_valid():
-            serializer.save(author=request.user)
+            publication = serializer.save(author=request.user)
+            if respond_async:
+                status_url = request.build_absolute_uri(reverse('publication-status', args=[publication.id]))
+                response = Response({'id': publication.id, 'status': publication.status, 'status_url': status_url},
+                                    status=status.HTTP_202_ACCEPTED)
+                response['Location'] = status_url
+                return response
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def publication_status(request, pk):
+    # Опрос асинхронного создания; о завершении автор также узнаёт из WebSocket-уведомлений
+    publication = Publication.objects.filter(pk=pk, author=request.user).annotate(
+        images_count=Count('images', distinct=True),
+        videos_count=Count('videos', distinct=True),
+        documents_count=Count('documents', distinct=True),
+    ).first()
+    if publication is None:
+        return Response({"error": "Publication not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    response = Response({
+        'id': publication.id,
+        'status': publication.status,
+        'verification_status': publication.verification_status,
+        'images': publication.images_count,
+        'videos': publication.videos_count,
+        'documents': publication.documents_count,
+        'url': request.build_absolute_uri(reverse('publication-detail', args=[publication.id])),
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def counts_publication_view(view):
+    """
+    Засчитывает просмотр и для 304: condition отвечает раньше, чем выполняется тело view. Стоит под api_view,
+    чтобы пользователь был уже аутентифицирован DRF (JWT).
+    """
+    @wraps(view)
+    def wrapper(request, pk, *args, **kwargs):
+        response = view(request, pk, *args, **kwargs)
+        # Просмотр уходит в очередь (Redis), в БД его пишет задача flush_view_events
+        if request.method == 'GET' and response.status_code in (200, 304) and request.user.is_authenticated:
+            view_events.record_publication_view(pk, request.user.id)
+        return response
+    return wrapper
+
+
 @api_view(['GET', 'PUT', 'DELETE'])
 @permission_classes([IsAuthenticatedOrReadOnly])
+@counts_publication_view
+@condition(etag_func=conditional.publication_etag, last_modified_func=conditional.publication_last_modified)
 def publication_detail(request, pk):
     try:
-        publication = Publication.objects.annotate(
-            total_donated=Sum('donations__donor_amount'),
-            total_views=Count('views'),
-            total_comments=Count('comments')
-        ).get(pk=pk)
+        publication = PublicationSerializer.setup_eager_loading(Publication.objects.all()).get(pk=pk)
     except Publication.DoesNotExist:
         return Response({"error": "Publication not found."}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        donors = [donation.donor.email for donation in publication.donations.all()]
+        donors = [donation.donor.email for donation in publication.donations.all() if donation.donor]
         if publication.status != 'active' and (request.user != publication.author and request.user.email not in donors):
             return Response({"error": "This publication is not available."}, status=status.HTTP_403_FORBIDDEN)
 
-        if request.user.is_authenticated:
-            if not View.objects.filter(publication=publication, viewer=request.user).exists():
-                View.objects.create(publication=publication, viewer=request.user)
-
-        serializer = PublicationSerializer(publication, context={'request': request})
-        return Response(serializer.data)
-
-    publication.donation_percentage = (publication.total_donated or 0) / (publication.amount or 1) * 100
-
-    if request.method == 'GET':
-        if request.user.is_authenticated and not View.objects.filter(publication=publication, viewer=request.user).exists():
-            View.objects.create(publication=publication, viewer=request.user)
-
-        # serializer = PublicationSerializer(publication)
         serializer = PublicationSerializer(publication, context={'request': request})
         return Response(serializer.data)
 
@@ -158,101 +211,34 @@ def publication_detail(request, pk):
         return Response({"message": "Publication deleted successfully."}, status=status.HTTP_204_NO_CONTENT)
 
 
+@condition(etag_func=conditional.top_publications_etag,
+           last_modified_func=conditional.top_publications_last_modified)
 @api_view(['GET'])
+@read_from_replica
 def top_publications(request):
-    two_months_ago = timezone.now() - timezone.timedelta(days=60)
-
-    publications = Publication.objects.filter(created_at__gte=two_months_ago, status='active')
-
-    publications = publications.annotate(
-        total_donated=Sum('donations__donor_amount', default=0),
-        total_views=Count('views', distinct=True),
-        total_comments=Count('comments', distinct=True),
-    )
-
-    # Динамически рассчитываем средние суммы пожертвований по категориям
-    category_averages = Publication.objects.values('category').annotate(
-        avg_donation=Avg('donations__donor_amount')
-    )
-
-    category_averages_dict = {item['category']: float(item['avg_donation'] or 50000) for item in category_averages}
-
-    for publication in publications:
-        total_donated = float(getattr(publication, 'total_donated', Decimal(0)))
-        total_views = float(getattr(publication, 'total_views', 0))
-        total_comments = float(getattr(publication, 'total_comments', 0))
+    # Рейтинг считает задача refresh_publication_ranking (Celery beat), здесь только чтение топ-10 по индексу
+    publications = PublicationCardSerializer.setup_eager_loading(
+        Publication.objects.filter(ranking__isnull=False, status='active')
+    ).order_by('-ranking__score')[:10]
 
-        # Количество дней с момента создания публикации
-        days_old = (timezone.now() - publication.created_at).days + 1  # +1 чтобы не делить на 0
-
-        # Коэффициент свежести (старые публикации затухают)
-        freshness_factor = max(0.5, 1 - 0.01 * days_old)
-
-        # Скорость пожертвований (важно, как быстро собираются деньги)
-        donation_rate = total_donated / days_old
-
-        # Коэффициент категории (балансируем популярные и непопулярные категории)
-        category_factor = 1 + (category_averages_dict.get(publication.category, 50000) / 50000) * 0.2
-
-        # Коэффициент вовлеченности пользователей (уникальные пользователи в комментариях)
-        active_users = (
-            publication.comments.values('author').distinct().count()
-            if hasattr(Publication, 'comments')
-            else 0
-        )
-        engagement_boost = 1 + (active_users / 50)
-
-        # Финальный расчет рейтинга
-        publication.score = (
-                (total_donated * 0.5 + total_views * 0.3 + total_comments * 0.2 + donation_rate * 0.5)
-                * freshness_factor * category_factor * engagement_boost
-        )
-
-    publications = [p for p in publications if p.total_donated > 0 or p.total_views > 0 or p.total_comments > 0]
-
-    top_publications = sorted(publications, key=lambda p: p.score, reverse=True)[:10]
-
-    serializer = PublicationSerializer(top_publications, many=True)
+    serializer = PublicationCardSerializer(publications, many=True, context={'request': request})
     return Response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@read_from_replica
 def recommended_publications(request):
     user = request.user
 
-    # Получаем категории, которые пользователь чаще всего просматривал
-    viewed_categories = list(
-        View.objects.filter(viewer=user)
-        .values('publication__category')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-        .values_list('publication__category', flat=True)
-    )
-
-    donated_categories = list(
-        Donation.objects.filter(donor=user)
-        .values('publication__category')
-        .annotate(count=Count('id'))
-        .order_by('-count')
-    )
-    donated_categories = [item['publication__category'] for item in donated_categories]
-
-    # Объединяем списки категорий и удаляем дубликаты
-    preferred_categories = list(set(viewed_categories + donated_categories))
-
-    # Получаем публикации из предпочтительных категорий
-    recommended_posts = Publication.objects.filter(category__in=preferred_categories, status='active').exclude(author=user)
-
-    # Если у пользователя нет истории, просто берем самые популярные посты
-    if not recommended_posts.exists():
-        recommended_posts = (
-            Publication.objects.annotate(
-                total_donations=Sum('donations__donor_amount'),
-                total_views=Count('views'))
-            .filter(status='active').order_by('-total_donations', '-total_views')[:5])
-
-    serializer = PublicationSerializer(recommended_posts, many=True)
+    # Рекомендации строит ночная задача build_publication_recommendations (item-item по просмотрам,
+    # избранному и пожертвованиям); без истории отдаём общий список популярного (user=NULL)
+    owner = user if PublicationRecommendation.objects.filter(user=user).exists() else None
+    recommended_posts = PublicationCardSerializer.setup_eager_loading(
+        Publication.objects.filter(recommendations__user=owner, status='active').exclude(author=user)
+    ).order_by('recommendations__position')[:settings.RECOMMENDATIONS_TOP_K]
+
+    serializer = PublicationCardSerializer(recommended_posts, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -261,10 +247,14 @@ def recommended_publications(request):
 def archived_publications(request):
     user = request.user
     queryset = Publication.objects.filter(author=user, is_archived=True).order_by('-created_at')
-    serializer = PublicationSerializer(queryset, many=True, context={'request': request})
+    queryset = PublicationCardSerializer.setup_eager_loading(queryset)
+    serializer = PublicationCardSerializer(queryset, many=True, context={'request': request})
     return Response(serializer.data)
 
+@condition(etag_func=conditional.urgent_publications_etag,
+           last_modified_func=conditional.urgent_publications_last_modified)
 @api_view(['GET'])
+@read_from_replica
 def urgent_publications(request):
     today = timezone.now()
     soon = today + timezone.timedelta(days=2)
@@ -275,7 +265,8 @@ def urgent_publications(request):
         is_archived=False
     ).order_by('expires_at')
 
-    serializer = PublicationSerializer(queryset, many=True, context={'request': request})
+    queryset = PublicationCardSerializer.setup_eager_loading(queryset)
+    serializer = PublicationCardSerializer(queryset, many=True, context={'request': request})
     return Response(serializer.data)
 
 
@@ -289,14 +280,12 @@ def active_publications(request):
         author=user,
         status='active',
         is_archived=False,
-        expires_at__gt=today  # ещё не истёк срок
-    ).annotate(
-        total_donated=Sum('donations__donor_amount')
-    ).filter(
-        Q(total_donated__lt=F('amount')) | Q(total_donated__isnull=True)
+        expires_at__gt=today,  # ещё не истёк срок
+        donated_total__lt=F('amount'),
     ).order_by('-created_at')
 
-    serializer = PublicationSerializer(queryset, many=True, context={'request': request})
+    queryset = PublicationCardSerializer.setup_eager_loading(queryset)
+    serializer = PublicationCardSerializer(queryset, many=True, context={'request': request})
     return Response(serializer.data)
 
 @api_view(['GET'])
@@ -309,5 +298,80 @@ def pending_publications(request):
         verification_status__in=['pending', 'rejected']
     ).order_by('-created_at')
 
-    serializer = PublicationSerializer(queryset, many=True, context={'request': request})
-    return Response(serializer.data)
\ No newline at end of file
+    queryset = PublicationCardSerializer.setup_eager_loading(queryset)
+    serializer = PublicationCardSerializer(queryset, many=True, context={'request': request})
+    return Response(serializer.data)
+
+
+def upload_response(upload, status_code=status.HTTP_200_OK):
+    response = Response(ResumableUploadSerializer(upload).data, status=status_code)
+    response['Upload-Offset'] = upload.offset
+    response['Upload-Length'] = upload.size
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_upload(request):
+    # Загрузка частями: POST создаёт загрузку, PATCH с Upload-Offset дописывает байты, HEAD/GET — текущий offset
+    serializer = ResumableUploadSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    upload = serializer.save(owner=request.user)
+    uploads.start_upload(upload)
+    response = upload_response(upload, status.HTTP_201_CREATED)
+    response['Location'] = request.build_absolute_uri(reverse('upload-detail', args=[upload.id]))
+    return response
+
+
+@api_view(['GET', 'HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAuthenticated])
+def upload_detail(request, upload_id):
+    try:
+        upload = ResumableUpload.objects.get(pk=upload_id, owner=request.user)
+    except ResumableUpload.DoesNotExist:
+        return Response({"error": "Upload not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method in ('GET', 'HEAD'):
+        return upload_response(upload)
+
+    elif request.method == 'DELETE':
+        uploads.discard_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    elif request.method == 'PATCH':
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+            checksum = request.headers.get('Upload-Checksum')
+            checksum = uploads.parse_checksum(checksum) if checksum else None
+        except (KeyError, ValueError) as e:
+            return Response({"error": f"Invalid upload headers: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            # Загрузку занимает блокировка файла; строка блокируется только на проверку offset, а передача части
+            # идёт без транзакции — медленный клиент не держит ни блокировку строки, ни соединение из пула
+            with uploads.claim_upload(upload):
+                with transaction.atomic():
+                    upload = ResumableUpload.objects.select_for_update(nowait=True).get(pk=upload.pk)
+                if upload.completed_at or offset != upload.offset:
+                    return upload_response(upload, status.HTTP_409_CONFLICT)
+                if length > upload.size - upload.offset:
+                    return Response({"error": "Chunk exceeds the declared upload size."},
+                                    status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+                if length:
+                    uploads.write_chunk(upload, request.stream, length, checksum)
+        except OperationalError as e:
+            if getattr(e.__cause__, 'sqlstate', None) != LOCK_NOT_AVAILABLE:
+                raise
+            return Response({"error": "Another chunk of this upload is being written."},
+                            status=status.HTTP_409_CONFLICT)
+        except uploads.UploadBusy:
+            return Response({"error": "Another chunk of this upload is being written."},
+                            status=status.HTTP_409_CONFLICT)
+        except uploads.ChecksumMismatch:
+            # 460 Checksum Mismatch из протокола tus
+            return Response({"error": "Chunk checksum mismatch."}, status=460)
+        return upload_response(upload)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from publications.models import PublicationDocument
+from verification.models import OcrResult
+from verification.services.near_duplicates import index_document
+
+
+class Command(BaseCommand):
+    help = "Index near-duplicate fingerprints for documents verified before the LSH index existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Documents loaded per query")
+
+    def handle(self, *args, **options):
+        # Текст берём из сохранённого результата проверки, pHash — из кэша OCR по тем же байтам, если он есть
+        documents = (
+            PublicationDocument.objects.filter(fingerprint__isnull=True, extracted_data__has_key='ocr_text')
+            .only('id', 'content_sha256', 'extracted_data').order_by('id')
+        )
+        indexed = skipped = 0
+        for document in documents.iterator(chunk_size=options['batch_size']):
+            text = document.extracted_data.get('ocr_text') or ''
+            if not text.strip():
+                skipped += 1
+                continue
+            phash = None
+            if document.content_sha256:
+                phash = (OcrResult.objects.filter(content_sha256=document.content_sha256, phash__isnull=False)
+                         .values_list('phash', flat=True).first())
+            index_document(document, text, phash)
+            indexed += 1
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} documents, skipped {skipped} without text"))
@@ -0,0 +1,103 @@
+import hashlib
+import random
+import statistics
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from accounts.models import User
+from publications.models import Publication, PublicationDocument
+from verification.models import DocumentFingerprint, LshBucket
+from verification.services.near_duplicates import (
+    find_near_duplicates, hamming, is_near_duplicate, jaccard, minhash, phash_bucket_keys, text_bucket_keys,
+)
+
+SYLLABLES = ['ка', 'ра', 'ло', 'ми', 'ту', 'не', 'са', 'ве', 'до', 'ры', 'жа', 'қы', 'бе', 'го', 'ңа']
+BATCH = 5000
+
+
+class Command(BaseCommand):
+    help = "Benchmark near-duplicate lookup (LSH buckets) against exact text_hash and a linear MinHash scan"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documents', type=int, default=20000, help="Number of documents to seed")
+        parser.add_argument('--queries', type=int, default=50, help="Near-duplicate queries to run")
+        parser.add_argument('--noise', type=float, default=0.02, help="Share of characters changed (OCR errors)")
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        # Всё выполняется в транзакции, которая откатывается в конце: база остаётся чистой
+        with transaction.atomic():
+            started = time.perf_counter()
+            documents = self.seed(rng, options['documents'])
+            self.stdout.write(f"Seeded {len(documents)} documents in {time.perf_counter() - started:.1f} s")
+
+            queries = []
+            for document_id, text, phash in rng.sample(documents, options['queries']):
+                noisy = ''.join(rng.choice(SYLLABLES)[0] if rng.random() < options['noise'] else char
+                                for char in text)
+                for bit in rng.sample(range(64), 3):  # повторный скан: несколько бит pHash меняются
+                    phash ^= 1 << bit
+                queries.append((document_id, noisy, phash - (1 << 64) if phash >= 1 << 63 else phash))
+
+            self.stdout.write(f"{'method':<20} {'p50, ms':>9} {'p95, ms':>9} {'recall':>8}")
+            self.report('exact text_hash', queries, lambda text, phash: list(
+                PublicationDocument.objects.filter(text_hash=hashlib.sha256(text.encode()).hexdigest())
+                .values_list('id', flat=True)))
+            self.report('linear MinHash', queries, self.linear_scan)
+            self.report('LSH buckets', queries, lambda text, phash: [
+                document_id for document_id, _, _ in find_near_duplicates(text, phash)])
+
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count):
+        author = User.objects.create_user(email='bench-duplicates@demeu.kz', first_name='Bench', last_name='Mark',
+                                          password=None)
+        publication = Publication.objects.create(
+            author=author, title='Bench', category='general', description='Bench', bank_details='4400430012345678',
+            amount=100000, contact_name='Bench', contact_email='bench-duplicates@demeu.kz',
+            contact_phone='+77011234567')
+        filler = [''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)]
+
+        seeded = []
+        for offset in range(0, count, BATCH):
+            texts = [' '.join(rng.choices(filler, k=40)) for _ in range(min(BATCH, count - offset))]
+            documents = PublicationDocument.objects.bulk_create([
+                PublicationDocument(publication=publication, document_type='identity', file=f'documents/{i}.pdf',
+                                    text_hash=hashlib.sha256(text.encode()).hexdigest())
+                for i, text in enumerate(texts, offset)
+            ])
+            fingerprints, buckets = [], []
+            for document, text in zip(documents, texts):
+                signature = minhash(text)
+                phash = rng.getrandbits(64) - (1 << 63)
+                fingerprints.append(DocumentFingerprint(document=document, minhash=signature.tobytes(), phash=phash))
+                buckets.extend(LshBucket(document=document, key=key)
+                               for key in text_bucket_keys(signature) + phash_bucket_keys(phash))
+                seeded.append((document.id, text, phash & ((1 << 64) - 1)))
+            DocumentFingerprint.objects.bulk_create(fingerprints)
+            LshBucket.objects.bulk_create(buckets, batch_size=BATCH)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE publications_publicationdocument')
+            cursor.execute('ANALYZE verification_lshbucket')
+        return seeded
+
+    def linear_scan(self, text, phash):
+        # Без индекса: сравнить подписи со всеми документами по тому же правилу, что и find_near_duplicates
+        signature = minhash(text)
+        return [document_id for document_id, other, other_phash
+                in DocumentFingerprint.objects.values_list('document_id', 'minhash', 'phash')
+                if is_near_duplicate(jaccard(signature, np.frombuffer(other, dtype=np.uint32)),
+                                     hamming(phash, other_phash))]
+
+    def report(self, name, queries, lookup):
+        timings, found = [], 0
+        for document_id, text, phash in queries:
+            started = time.perf_counter()
+            result = lookup(text, phash)
+            timings.append((time.perf_counter() - started) * 1000)
+            found += document_id in result
+        p95 = statistics.quantiles(timings, n=20)[-1] if len(timings) > 1 else timings[0]
+        self.stdout.write(f"{name:<20} {statistics.median(timings):>9.2f} {p95:>9.2f} {found / len(queries):>8.0%}")
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OcrResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_sha256', models.CharField(max_length=64)),
+                ('pipeline_version', models.PositiveIntegerField()),
+                ('ocr_text', models.TextField()),
+                ('entities', models.JSONField(default=list)),
+                ('complete', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('content_sha256', 'pipeline_version'), name='ocr_result_unique_content')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('publications', '0029_publicationdocument_content_sha256'),
+        ('verification', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ocrresult',
+            name='phash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='DocumentFingerprint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('minhash', models.BinaryField()),
+                ('phash', models.BigIntegerField(blank=True, null=True)),
+                ('document', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='fingerprint', to='publications.publicationdocument')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LshBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.BigIntegerField(db_index=True)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='publications.publicationdocument')),
+            ],
+        ),
+    ]
@@ -1,3 +1,45 @@
 from django.db import models
 
-# Create your models here.
+
+class OcrResult(models.Model):
+    """
+    Распознанный текст и сущности по содержимому файла. Одинаковые файлы (часто — удостоверения личности,
+    загруженные в разные публикации) распознаются один раз на версию конвейера (PIPELINE_VERSION).
+    """
+    content_sha256 = models.CharField(max_length=64)
+    pipeline_version = models.PositiveIntegerField()
+    ocr_text = models.TextField()
+    entities = models.JSONField(default=list)
+    # False — PDF дочитан не до конца: распознавание остановилось, когда для документа хватило совпадений
+    complete = models.BooleanField(default=True)
+    phash = models.BigIntegerField(null=True, blank=True)  # pHash первой страницы, для поиска почти-дубликатов
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_sha256', 'pipeline_version'], name='ocr_result_unique_content'),
+        ]
+
+    def __str__(self):
+        return f"{self.content_sha256[:12]} (v{self.pipeline_version})"
+
+
+class DocumentFingerprint(models.Model):
+    """Подписи документа для поиска почти-дубликатов: MinHash текста OCR и pHash изображения (первой страницы)."""
+    document = models.OneToOneField('publications.PublicationDocument', on_delete=models.CASCADE,
+                                    related_name='fingerprint')
+    minhash = models.BinaryField()
+    phash = models.BigIntegerField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Fingerprint документа {self.document_id}"
+
+
+class LshBucket(models.Model):
+    """
+    LSH-корзина документа: хэш одной полосы MinHash или 16-битного куска pHash. Похожие документы делят корзины,
+    так что кандидаты находятся по индексу key, а не перебором всех документов.
+    """
+    document = models.ForeignKey('publications.PublicationDocument', on_delete=models.CASCADE,
+                                 related_name='lsh_buckets')
+    key = models.BigIntegerField(db_index=True)
@@ -0,0 +1,132 @@
+import hashlib
+import re
+import zlib
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from verification.models import DocumentFingerprint, LshBucket
+
+# MinHash: 128 перестановок = 16 полос по 8 строк. Пара с Jaccard 0.8 попадает в общую полосу с вероятностью ~95%,
+# с Jaccard 0.5 — ~6%: кандидатов мало, точное сходство считается только для них
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 16
+SHINGLE_SIZE = 5  # символьные 5-граммы терпимы к ошибкам OCR в отдельных буквах
+MERSENNE_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # фиксированное зерно: подписи должны совпадать между процессами
+MINHASH_A = _rng.integers(1, MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+MINHASH_B = _rng.integers(0, MERSENNE_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+# pHash (64 бита) делится на 4 куска по 16 бит. Если расстояние Хэмминга не больше 7, хотя бы один кусок
+# отличается не более чем на бит, поэтому при поиске проверяем каждый кусок и все его варианты с одним
+# изменённым битом (multi-index hashing). Поэтому NEAR_DUPLICATE_HAMMING не может быть больше 7
+PHASH_CHUNKS = 4
+PHASH_CHUNK_BITS = 16
+PHASH_MAX_HAMMING = 7
+# Документы одного бланка (удостоверения разных людей) дают близкий pHash, поэтому совпадение изображения
+# засчитывается только вместе с заметным сходством текста
+PHASH_MIN_JACCARD = 0.5
+MAX_CANDIDATES = 50
+UINT64_MASK = (1 << 64) - 1
+
+
+def perceptual_hash(array):
+    """DCT pHash: низкие частоты уменьшенного до 32x32 изображения, бит — выше ли коэффициент медианы."""
+    small = cv2.resize(array, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # постоянную составляющую (яркость) в медиану не берём
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big', signed=True)  # BigIntegerField — знаковый
+
+
+def hamming(a, b):
+    return bin((a ^ b) & UINT64_MASK).count('1')
+
+
+def shingles(text):
+    text = ' '.join(re.sub(r'\W+', ' ', text.lower()).split())
+    if len(text) <= SHINGLE_SIZE:
+        return {text}
+    return {text[i:i + SHINGLE_SIZE] for i in range(len(text) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """Подпись MinHash: для каждой из перестановок (a*x + b) mod p — минимум по хэшам шинглов."""
+    values = np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(text)), dtype=np.uint64)
+    values %= MERSENNE_PRIME
+    return ((MINHASH_A[:, None] * values[None, :] + MINHASH_B[:, None]) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+
+def jaccard(signature, other):
+    return float(np.mean(signature == other))
+
+
+def is_near_duplicate(similarity, distance):
+    if similarity >= settings.NEAR_DUPLICATE_JACCARD:
+        return True
+    max_distance = min(settings.NEAR_DUPLICATE_HAMMING, PHASH_MAX_HAMMING)  # дальше индекс кандидатов не найдёт
+    return distance is not None and distance <= max_distance and similarity >= PHASH_MIN_JACCARD
+
+
+def bucket_key(prefix, payload):
+    return int.from_bytes(hashlib.blake2b(prefix + payload, digest_size=8).digest(), 'big', signed=True)
+
+
+def text_bucket_keys(signature):
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [bucket_key(b't%d' % band, signature[band * rows:(band + 1) * rows].tobytes())
+            for band in range(MINHASH_BANDS)]
+
+
+def phash_chunks(value):
+    value &= UINT64_MASK
+    mask = (1 << PHASH_CHUNK_BITS) - 1
+    return [(value >> (index * PHASH_CHUNK_BITS)) & mask for index in range(PHASH_CHUNKS)]
+
+
+def phash_bucket_keys(value, probe=False):
+    keys = []
+    for index, chunk in enumerate(phash_chunks(value)):
+        variants = [chunk] + ([chunk ^ (1 << bit) for bit in range(PHASH_CHUNK_BITS)] if probe else [])
+        keys.extend(bucket_key(b'p%d' % index, variant.to_bytes(2, 'big')) for variant in variants)
+    return keys
+
+
+def index_document(document, text, phash=None, signature=None):
+    """Записывает подписи документа и его LSH-корзины (заменяя прежние — задача может перезапускаться)."""
+    if signature is None:
+        signature = minhash(text)
+    keys = text_bucket_keys(signature) + (phash_bucket_keys(phash) if phash is not None else [])
+    with transaction.atomic():
+        DocumentFingerprint.objects.update_or_create(
+            document=document, defaults={'minhash': signature.tobytes(), 'phash': phash})
+        LshBucket.objects.filter(document=document).delete()
+        LshBucket.objects.bulk_create([LshBucket(document=document, key=key) for key in keys])
+
+
+def find_near_duplicates(text, phash=None, exclude_id=None, signature=None):
+    """
+    Ищет уже загруженные почти-дубликаты: пересканы, повторные фото и обрезки того же документа.
+    Кандидаты — по индексу корзин (key__in), без просмотра всей таблицы; для них считается сходство.
+    Возвращает [(document_id, jaccard, hamming)] по убыванию сходства текста.
+    """
+    if signature is None:
+        signature = minhash(text)
+    keys = text_bucket_keys(signature)
+    if phash is not None:
+        keys += phash_bucket_keys(phash, probe=True)
+
+    candidates = (
+        LshBucket.objects.filter(key__in=keys).exclude(document_id=exclude_id)
+        .values('document_id').annotate(hits=Count('id')).order_by('-hits')
+        .values_list('document_id', flat=True)[:MAX_CANDIDATES]
+    )
+    duplicates = []
+    for fingerprint in DocumentFingerprint.objects.filter(document_id__in=list(candidates)):
+        similarity = jaccard(signature, np.frombuffer(fingerprint.minhash, dtype=np.uint32))
+        distance = hamming(phash, fingerprint.phash) if phash is not None and fingerprint.phash is not None else None
+        if is_near_duplicate(similarity, distance):
+            duplicates.append((fingerprint.document_id, round(similarity, 3), distance))
+    return sorted(duplicates, key=lambda duplicate: -duplicate[1])
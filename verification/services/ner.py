@@ -1,12 +1,22 @@
-from natasha import Segmenter, MorphVocab, NewsEmbedding, NewsNERTagger, Doc
+from functools import lru_cache
 
-segmenter = Segmenter()
-morph_vocab = MorphVocab()
-embedding = NewsEmbedding()
-ner_tagger = NewsNERTagger(embedding)
+
+@lru_cache(maxsize=None)
+def load_models():
+    """
+    Модели natasha (эмбеддинги и NER, сотни МБ) загружаются при первом распознавании, а не при импорте.
+    Воркеры очереди ocr вызывают её до fork (demeu.celery.preload_ocr_models), чтобы дочерние процессы
+    делили уже загруженные модели.
+    """
+    from natasha import MorphVocab, NewsEmbedding, NewsNERTagger, Segmenter
+
+    return Segmenter(), MorphVocab(), NewsNERTagger(NewsEmbedding())
 
 
 def extract_entities(text):
+    from natasha import Doc
+
+    segmenter, morph_vocab, ner_tagger = load_models()
     doc = Doc(text)
     doc.segment(segmenter)
     doc.tag_ner(ner_tagger)
@@ -1,31 +1,126 @@
-import os
-from PIL import Image
-from pdf2image import convert_from_path
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+
 import cv2
 import numpy as np
 import pytesseract
+from PIL import Image
+from django.conf import settings
+from pdf2image import convert_from_path, pdfinfo_from_path
 
+from verification.services.near_duplicates import perceptual_hash
 
-def extract_text_from_file(file_path: str) -> str:
-    if file_path.lower().endswith('.pdf'):
-        pages = convert_from_path(file_path, dpi=300)
-        image = pages[0]
-    else:
-        image = Image.open(file_path)
-
-    # Preprocessing
-    image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
+OCR_LANGUAGES = 'kaz+rus+eng'
+OCR_TIMEOUT = 120  # секунды на один вызов tesseract
+SHARPEN_KERNEL = np.array([[0, -1, 0],
+                           [-1, 5, -1],
+                           [0, -1, 0]])
+
+
+@contextmanager
+def stage(timings, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[name] = round((time.perf_counter() - started) * 1000, 1)
+
+
+def render_pdf_page(file_path, page):
+    """Растеризует одну страницу PDF сразу в оттенках серого (pdftoppm -gray), остальные не трогает."""
+    return convert_from_path(file_path, dpi=settings.OCR_PDF_DPI, first_page=page, last_page=page,
+                             grayscale=True, poppler_path=settings.POPPLER_PATH or None)[0]
+
+
+def preprocess(image):
+    """Один проход в памяти: оттенки серого, медианный фильтр, адаптивный порог, повышение резкости."""
+    gray = cv2.cvtColor(np.asarray(image.convert('RGB')), cv2.COLOR_RGB2GRAY)
     gray = cv2.medianBlur(gray, 3)
-    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                   cv2.THRESH_BINARY, 31, 10)
-    kernel = np.array([[0, -1, 0], [-1, 5, -1], [0, -1, 0]])
-    sharpened = cv2.filter2D(thresh, -1, kernel)
+    thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 31, 10)
+    return cv2.filter2D(thresh, -1, SHARPEN_KERNEL)
 
-    temp_path = file_path + "_processed.png"
-    cv2.imwrite(temp_path, sharpened)
 
-    text = pytesseract.image_to_string(Image.open(temp_path), lang='kaz+rus+eng')
+def recognize(array):
+    """
+    Передаёт массив tesseract через stdin в виде PGM (без сжатия и без файлов на диске).
+    pytesseract для этого не подходит: он сам сохраняет изображение во временный файл.
+    """
+    ok, encoded = cv2.imencode('.pgm', array)
+    if not ok:
+        raise ValueError("Не удалось подготовить изображение для OCR")
+    try:
+        result = subprocess.run(
+            [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', OCR_LANGUAGES],
+            input=encoded.tobytes(), capture_output=True, timeout=OCR_TIMEOUT,
+        )
+    except FileNotFoundError:
+        raise pytesseract.TesseractNotFoundError()
+    if result.returncode:
+        raise pytesseract.TesseractError(result.returncode, result.stderr.decode(errors='replace'))
+    return result.stdout.decode('utf-8', errors='replace')
 
-    os.remove(temp_path)
+
+def ocr_image(load, timings, features=None):
+    with stage(timings, 'load'):
+        image = load()
+    with stage(timings, 'preprocess'):
+        array = preprocess(image)
+    if features is not None:
+        features['phash'] = perceptual_hash(array)
+    with stage(timings, 'ocr'):
+        text = recognize(array)
     return text.strip()
+
+
+def ocr_pdf_page(file_path, page, features=None):
+    timings = {}
+    return ocr_image(lambda: render_pdf_page(file_path, page), timings, features), timings
+
+
+def extract_text_from_pdf(file_path, timings=None, enough=None, features=None):
+    """
+    Распознаёт страницы PDF по порядку, не больше OCR_WORKERS страниц одновременно: в памяти только они.
+    Растеризация и OCR выполняются процессами pdftoppm и tesseract, поэтому для параллельности хватает потоков.
+    enough(text) -> True после очередной страницы останавливает чтение оставшихся. После последней (с учётом
+    OCR_PDF_MAX_PAGES) страницы enough не вызывается: останавливать нечего, и результат не помечается неполным.
+    В features записывается pHash первой страницы.
+    """
+    page_count = pdfinfo_from_path(file_path, poppler_path=settings.POPPLER_PATH or None)['Pages']
+    pages = iter(range(1, min(page_count, settings.OCR_PDF_MAX_PAGES) + 1))
+    texts = []
+    with ThreadPoolExecutor(max_workers=settings.OCR_WORKERS) as executor:
+        in_flight = deque(executor.submit(ocr_pdf_page, file_path, page, features if page == 1 else None)
+                          for page in islice(pages, settings.OCR_WORKERS))
+        while in_flight:
+            text, page_timings = in_flight.popleft().result()
+            texts.append(text)
+            if timings is not None:
+                for name, ms in page_timings.items():
+                    timings[name] = round(timings.get(name, 0) + ms, 1)
+            page = next(pages, None)
+            if (in_flight or page is not None) and enough is not None and enough('\n\n'.join(texts)):
+                for future in in_flight:
+                    future.cancel()
+                break
+            if page is not None:
+                in_flight.append(executor.submit(ocr_pdf_page, file_path, page))
+
+    if timings is not None:
+        timings['pages'] = len(texts)
+    return '\n\n'.join(text for text in texts if text)
+
+
+def extract_text_from_file(file_path: str, timings=None, enough=None, features=None) -> str:
+    """
+    Распознаёт текст документа. Если передан словарь timings, в него записывается время этапов в мс:
+    load (чтение/растеризация), preprocess, ocr; для PDF — суммы по страницам и число прочитанных страниц.
+    В словарь features записывается phash — перцептивный хэш предобработанного изображения.
+    """
+    if file_path.lower().endswith('.pdf'):
+        return extract_text_from_pdf(file_path, timings, enough, features)
+    return ocr_image(lambda: Image.open(file_path), timings, features)
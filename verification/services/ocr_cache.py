@@ -0,0 +1,19 @@
+from verification.models import OcrResult
+
+# Версия конвейера OCR + NER. Увеличьте при изменении предобработки, языков tesseract, DPI или модели NER:
+# записи прежних версий перестанут находиться и будут удалены при следующем распознавании того же файла
+PIPELINE_VERSION = 2
+
+
+def get_cached_ocr(content_sha256):
+    if not content_sha256:
+        return None
+    return OcrResult.objects.filter(content_sha256=content_sha256, pipeline_version=PIPELINE_VERSION).first()
+
+
+def store_ocr(content_sha256, text, entities, complete=True, phash=None):
+    OcrResult.objects.filter(content_sha256=content_sha256).exclude(pipeline_version=PIPELINE_VERSION).delete()
+    OcrResult.objects.update_or_create(
+        content_sha256=content_sha256, pipeline_version=PIPELINE_VERSION,
+        defaults={'ocr_text': text, 'entities': entities, 'complete': complete, 'phash': phash},
+    )
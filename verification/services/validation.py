@@ -35,6 +35,12 @@ CATEGORY_DOCUMENT_HINTS = {
 }
 
 
+def has_enough_evidence(document_type, category, text):
+    """Найдены ключевые слова и типа документа, и категории: дальше страницы PDF можно не распознавать."""
+    result = validate_document_content(document_type, category, text)
+    return not result["errors"] and not result["warnings"]
+
+
 def validate_document_content(document_type, category, text):
     """
     Проверка текста OCR-документа на наличие обязательных слов по типу и категории
@@ -1,46 +1,18 @@
 from celery import shared_task
 import os
 import hashlib
-import cv2
-import numpy as np
 from django.conf import settings
-from PIL import Image
-from pdf2image import convert_from_path
 from publications.models import PublicationDocument
 from verification.services.ocr import extract_text_from_file
 from verification.services.ner import extract_entities
 from verification.services.classifier import guess_document_type
-from verification.services.validation import validate_document_content
+from verification.services.near_duplicates import find_near_duplicates, index_document, minhash
+from verification.services.ocr_cache import get_cached_ocr, store_ocr
+from verification.services.validation import has_enough_evidence, validate_document_content
+from publications.services.uploads import file_sha256
 from publications.utils import send_email_dynamic
 from notifications.utils import notify_user
 
-def preprocess_image(file_path):
-    if file_path.lower().endswith('.pdf'):
-        pages = convert_from_path(
-            file_path, dpi=300,
-            poppler_path=r'C:\Program Files\poppler-24.08.0\Library\bin'
-        )
-        image = pages[0]
-    else:
-        image = Image.open(file_path)
-
-    image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
-    gray = cv2.cvtColor(image_cv, cv2.COLOR_BGR2GRAY)
-    gray = cv2.medianBlur(gray, 3)
-    thresh = cv2.adaptiveThreshold(
-        gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY, 31, 10
-    )
-    kernel = np.array([[0, -1, 0],
-                       [-1, 5, -1],
-                       [0, -1, 0]])
-    sharpened = cv2.filter2D(thresh, -1, kernel)
-
-    temp_path = file_path + '_processed.png'
-    cv2.imwrite(temp_path, sharpened)
-    return temp_path
-
-
 @shared_task
 def process_document_verification(document_id):
     try:
@@ -51,9 +23,36 @@ def process_document_verification(document_id):
     file_path = os.path.join(settings.MEDIA_ROOT, document.file.name)
 
     try:
-        processed_path = preprocess_image(file_path)
-        text = extract_text_from_file(processed_path)
-        os.remove(processed_path)
+        if not document.content_sha256:  # документы, сохранённые до подсчёта sha256 при приёме
+            document.content_sha256 = file_sha256(file_path)
+        publication_category = document.publication.category
+
+        # Те же байты уже распознавались этой версией конвейера — OCR и NER не запускаем.
+        # Недочитанный PDF годится, только если и для этого документа в нём хватает совпадений
+        timings = {}
+        cached = get_cached_ocr(document.content_sha256)
+        if cached and (cached.complete or has_enough_evidence(
+                document.document_type, publication_category, cached.ocr_text)):
+            text, entities, phash = cached.ocr_text, cached.entities, cached.phash
+            print(f"[🔎] OCR документа {document_id}: готовый результат по sha256 {document.content_sha256[:12]}")
+        else:
+            cached = None
+            stopped_early = []
+
+            def enough(text):
+                if has_enough_evidence(document.document_type, publication_category, text):
+                    stopped_early.append(True)
+                    return True
+                return False
+
+            # Предобработка и OCR в памяти, без промежуточных PNG на диске
+            features = {}
+            text = extract_text_from_file(file_path, timings, enough=enough, features=features)
+            print(f"[🔎] OCR документа {document_id}: " + ', '.join(f"{name} {ms} мс" for name, ms in timings.items()))
+            entities = extract_entities(text) if text.strip() else []
+            phash = features.get('phash')
+            store_ocr(document.content_sha256, text, entities, complete=not stopped_early, phash=phash)
+
         if not text.strip():
             document.verified = False
             document.verification_status = 'rejected'
@@ -61,18 +60,26 @@ def process_document_verification(document_id):
             document.save()
             return
 
-        text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
-        document.text_hash = text_hash
-        if PublicationDocument.objects.filter(text_hash=text_hash).exclude(id=document.id).exists():
+        document.text_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        # Почти-дубликаты (пересканы, повторные фото, обрезки) ищутся по LSH-индексу, а не точным text_hash;
+        # документ попадает в индекс в любом случае, чтобы находились и его будущие копии
+        signature = minhash(text)
+        duplicates = find_near_duplicates(text, phash, exclude_id=document.id, signature=signature)
+        index_document(document, text, phash, signature=signature)
+        if duplicates:
+            duplicate_id, similarity, distance = duplicates[0]
             document.verified = False
             document.verification_status = 'rejected'
-            document.verification_details = {'error': 'Документ уже был загружен ранее.'}
+            document.verification_details = {
+                'error': 'Документ уже был загружен ранее.',
+                'duplicate_of': duplicate_id,
+                'text_similarity': similarity,
+                'image_distance': distance,
+            }
             document.save()
             return
 
         predicted_type = guess_document_type(text)
-        entities = extract_entities(text)
-        publication_category = document.publication.category
 
         validation_result = validate_document_content(
             document_type=document.document_type,
@@ -84,7 +91,9 @@ def process_document_verification(document_id):
             "ocr_text": text,
             "predicted_type": predicted_type,
             "extracted_entities": entities,
-            "validation": validation_result
+            "validation": validation_result,
+            "ocr_timings": timings,
+            "ocr_cached": cached is not None,
         }
 
         if predicted_type != document.document_type or validation_result["errors"]:
@@ -159,22 +168,3 @@ def process_document_verification(document_id):
         document.verification_status = 'rejected'
         document.verification_details = {'error': str(e)}
         document.save()
-
-
-@shared_task
-def check_publication_status():
-    from publications.models import Publication
-    from django.utils import timezone
-    now = timezone.now()
-
-    publications = Publication.objects.filter(status='active')
-    for pub in publications:
-        donated = pub.total_donated()
-        if donated >= pub.amount:
-            pub.status = 'successful'
-            pub.is_archived = True
-            pub.save()
-        elif pub.expires_at and pub.expires_at <= now:
-            pub.status = 'expired'
-            pub.is_archived = True
-            pub.save()
@@ -45,3 +45,217 @@ def test_ocr_on_sample_image():
 
     text = extract_text_from_file(sample_path)
     assert len(text.strip()) > 30  # Должен вернуть осмысленный текст
+
+
+def test_ocr_preprocesses_once_in_memory(monkeypatch, tmp_path):
+    import shutil
+    import subprocess
+
+    import cv2
+    import numpy as np
+
+    from verification.services import ocr
+
+    sample_path = tmp_path / 'sample_id.jpg'
+    shutil.copy(os.path.join(os.path.dirname(__file__), 'sample_id.jpg'), sample_path)
+    calls = []
+
+    def fake_tesseract(cmd, input, **kwargs):
+        calls.append((cmd, input))
+        return subprocess.CompletedProcess(cmd, 0, stdout='Удостоверение личности\n'.encode(), stderr=b'')
+
+    monkeypatch.setattr(ocr.subprocess, 'run', fake_tesseract)
+    timings = {}
+
+    assert ocr.extract_text_from_file(str(sample_path), timings) == 'Удостоверение личности'
+    assert list(timings) == ['load', 'preprocess', 'ocr']
+    # tesseract получает уже бинаризованное изображение через stdin, файлов рядом не появляется
+    (cmd, data), = calls
+    assert cmd[1:3] == ['stdin', 'stdout']
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_UNCHANGED)
+    assert image.ndim == 2 and set(np.unique(image)) <= {0, 255}
+    assert os.listdir(tmp_path) == ['sample_id.jpg']
+
+
+def test_pdf_pages_ocr_lazily_until_enough_evidence(monkeypatch, settings):
+    from PIL import Image
+
+    from verification.services import ocr
+    from verification.services.validation import has_enough_evidence
+
+    settings.OCR_WORKERS = 1
+    settings.OCR_PDF_MAX_PAGES = 4
+    pages = {1: 'Справка', 2: 'Справка о доходах', 3: 'Диагноз, лечение', 4: 'Приложение', 5: 'Приложение'}
+    rendered = []
+
+    def fake_render(file_path, page):
+        rendered.append(page)
+        return Image.new('L', (64, 64))
+
+    monkeypatch.setattr(ocr, 'pdfinfo_from_path', lambda path, poppler_path=None: {'Pages': 5})
+    monkeypatch.setattr(ocr, 'render_pdf_page', fake_render)
+    monkeypatch.setattr(ocr, 'recognize', lambda array: pages[rendered[-1]])
+    timings = {}
+
+    text = ocr.extract_text_from_file('statement.PDF', timings,
+                                      enough=lambda text: has_enough_evidence('income', 'medicine', text))
+
+    # Страницы растеризуются по одной и по порядку, после третьей доказательств достаточно
+    assert rendered == [1, 2, 3]
+    assert text == 'Справка\n\nСправка о доходах\n\nДиагноз, лечение'
+    assert timings['pages'] == 3 and set(timings) == {'load', 'preprocess', 'ocr', 'pages'}
+
+    rendered.clear()
+    ocr.extract_text_from_file('statement.pdf')
+    assert rendered == [1, 2, 3, 4]  # без enough читаем до OCR_PDF_MAX_PAGES
+
+    # После последней страницы enough не спрашивается: задача сохранит результат как полный
+    rendered.clear()
+    checked = []
+    monkeypatch.setattr(ocr, 'pdfinfo_from_path', lambda path, poppler_path=None: {'Pages': 3})
+    ocr.extract_text_from_file('statement.pdf', enough=lambda text: checked.append(text) or False)
+    assert rendered == [1, 2, 3] and len(checked) == 2
+
+
+def test_ocr_result_is_reused_by_file_content(db, settings, tmp_path, monkeypatch):
+    import hashlib
+
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    from rest_framework.test import APIClient
+
+    from accounts.models import User
+    from publications.models import Publication, PublicationDocument
+    from verification import tasks
+    from verification.models import OcrResult
+    from verification.services import ocr_cache
+
+    settings.MEDIA_ROOT = tmp_path
+    author = User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                      password='secret123')
+    content = b'%PDF-1.4 passport scan'
+    client = APIClient()
+    client.force_authenticate(author)
+    response = client.post('/publications/', {
+        'title': 'Сбор на операцию', 'category': 'medicine', 'description': 'Нужна помощь',
+        'bank_details': '4400430012345678', 'amount': 100000, 'contact_name': 'Айгерим',
+        'contact_email': 'author@demeu.kz', 'contact_phone': '+77011234567', 'duration_days': 14,
+        'uploaded_documents': [SimpleUploadedFile('passport.pdf', content, content_type='application/pdf')],
+        'uploaded_document_types': ['identity'],
+    }, format='multipart')
+    assert response.status_code == 201
+    # sha256 посчитан обработчиком загрузки, пока файл принимался
+    document = PublicationDocument.objects.get(publication_id=response.data['id'])
+    assert document.content_sha256 == hashlib.sha256(content).hexdigest()
+
+    ocr_calls = []
+
+    def fake_ocr(file_path, timings=None, enough=None, features=None):
+        ocr_calls.append(file_path)
+        return 'Удостоверение личности, фамилия, иин. Диагноз: лечение'
+
+    monkeypatch.setattr(tasks, 'extract_text_from_file', fake_ocr)
+    monkeypatch.setattr(tasks, 'extract_entities', lambda text: [{'text': 'Айгерим', 'type': 'PER'}])
+    monkeypatch.setattr(tasks, 'notify_user', lambda **kwargs: None)
+
+    tasks.process_document_verification(document.id)
+    document.refresh_from_db()
+    assert document.verification_status == 'approved' and document.extracted_data['ocr_cached'] is False
+
+    # Тот же файл в другой публикации (без sha256 — считается в задаче) распознаётся без OCR
+    other = Publication.objects.create(author=author, title='Другой сбор', category='medicine', description='-',
+                                       bank_details='4400430012345678', amount=1000, contact_name='Айгерим',
+                                       contact_email='author@demeu.kz', contact_phone='+77011234567')
+    copy = PublicationDocument.objects.create(publication=other, document_type='identity',
+                                              file=SimpleUploadedFile('copy.pdf', content))
+    tasks.process_document_verification(copy.id)
+    copy.refresh_from_db()
+    assert len(ocr_calls) == 1
+    assert copy.content_sha256 == document.content_sha256
+    assert copy.verification_details['error'] == 'Документ уже был загружен ранее.'
+    assert copy.verification_details['duplicate_of'] == document.id
+
+    # Новая версия конвейера: старый результат не используется и заменяется
+    monkeypatch.setattr(ocr_cache, 'PIPELINE_VERSION', ocr_cache.PIPELINE_VERSION + 1)
+    tasks.process_document_verification(copy.id)
+    assert len(ocr_calls) == 2
+    assert list(OcrResult.objects.values_list('pipeline_version', flat=True)) == [ocr_cache.PIPELINE_VERSION]
+
+
+def test_near_duplicates_found_by_lsh_buckets(db):
+    import cv2
+    import numpy as np
+    from PIL import Image
+
+    from accounts.models import User
+    from publications.models import Publication, PublicationDocument
+    from verification.services import near_duplicates
+    from verification.services.ocr import preprocess
+
+    author = User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                      password='secret123')
+    publication = Publication.objects.create(author=author, title='Сбор', category='medicine', description='-',
+                                             bank_details='4400430012345678', amount=1000, contact_name='Айгерим',
+                                             contact_email='author@demeu.kz', contact_phone='+77011234567')
+    original = PublicationDocument.objects.create(publication=publication, document_type='identity',
+                                                  file='documents/original.jpg')
+    text = ("Удостоверение личности Республики Казахстан. Фамилия Серикова, имя Айгерим, дата рождения "
+            "12.03.1990, ИИН 900312400123, выдано Министерством внутренних дел 05.06.2015, действительно "
+            "до 04.06.2025. Место рождения город Алматы, национальность казашка.")
+    scan = preprocess(Image.open(os.path.join(os.path.dirname(__file__), 'sample_id.jpg')))
+    near_duplicates.index_document(original, text, near_duplicates.perceptual_hash(scan))
+
+    # Повторный скан со сдвигом, текст с ошибками OCR
+    rephoto = cv2.warpAffine(scan, np.float32([[1, 0, 3], [0, 1, 2]]), scan.shape[::-1], borderValue=255)
+    rephoto_hash = near_duplicates.perceptual_hash(rephoto)
+    assert near_duplicates.hamming(rephoto_hash, near_duplicates.perceptual_hash(scan)) <= 6
+    noisy = text.replace('Серикова', 'Сернкова').replace('900312400123', '9OO3124OO123')
+    (found_id, similarity, distance), = near_duplicates.find_near_duplicates(noisy, rephoto_hash)
+    assert found_id == original.id and similarity >= 0.8 and distance <= 6
+
+    # Обрезка без последней строки находится по тексту, даже без изображения
+    assert near_duplicates.find_near_duplicates(text.rsplit('.', 2)[0])[0][0] == original.id
+
+    # Тот же бланк с другими данными и посторонний текст дубликатами не считаются
+    other_person = ("Удостоверение личности Республики Казахстан. Фамилия Ахметов, имя Нурлан, дата рождения "
+                    "01.11.1985, ИИН 851101300456, выдано Министерством юстиции 17.02.2019.")
+    assert near_duplicates.find_near_duplicates(other_person, rephoto_hash) == []
+    assert near_duplicates.find_near_duplicates('Справка о доходах за 2023 год') == []
+    assert near_duplicates.find_near_duplicates(text, exclude_id=original.id) == []
+
+
+def test_fingerprints_backfilled_and_removed_with_archived_publication(db):
+    from datetime import timedelta
+
+    from django.core.management import call_command
+    from django.db import connection
+    from django.utils import timezone
+
+    from accounts.models import User
+    from publications.models import Publication, PublicationDocument
+    from publications.services.status_sweeper import sweep_publication_statuses
+    from verification.models import DocumentFingerprint, LshBucket
+    from verification.services.near_duplicates import find_near_duplicates
+
+    # FK в Postgres проверяются при коммите, которого в тесте нет: проверяем сразу
+    with connection.cursor() as cursor:
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+    author = User.objects.create_user(email='author@demeu.kz', first_name='Айгерим', last_name='Серикова',
+                                      password='secret123')
+    publication = Publication.objects.create(author=author, title='Сбор', category='medicine', description='-',
+                                             bank_details='4400430012345678', amount=1000, contact_name='Айгерим',
+                                             contact_email='author@demeu.kz', contact_phone='+77011234567')
+    text = "Справка о доходах Серикова Айгерим за 2023 год, зарплата 350 000 тенге в месяц, ТОО Демеу"
+    document = PublicationDocument.objects.create(publication=publication, document_type='income',
+                                                  file='documents/income.pdf', extracted_data={'ocr_text': text})
+    PublicationDocument.objects.create(publication=publication, document_type='identity',
+                                       file='documents/blank.pdf', extracted_data={'ocr_text': ' '})
+
+    # Документы, проверенные до появления индекса, находятся после backfill
+    assert find_near_duplicates(text) == []
+    call_command('backfill_document_fingerprints')
+    assert [duplicate[0] for duplicate in find_near_duplicates(text)] == [document.id]
+
+    Publication.objects.filter(pk=publication.pk).update(status='expired', is_archived=True,
+                                                         updated_at=timezone.now() - timedelta(days=91))
+    assert sweep_publication_statuses()['deleted']['rows'] == 1
+    assert not DocumentFingerprint.objects.exists() and not LshBucket.objects.exists()